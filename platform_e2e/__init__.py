@@ -1,16 +1,12 @@
 import asyncio
-import hashlib
 import logging
-import os
-import re
 import secrets
-import subprocess
 import time
-from collections.abc import AsyncIterator, Callable, Iterator
-from contextlib import asynccontextmanager, contextmanager
-from hashlib import sha1
+from collections.abc import AsyncIterator, Callable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
-from typing import Any
 from uuid import uuid4
 
 import aiohttp
@@ -22,19 +18,130 @@ from apolo_sdk import (
     JobDescription,
     JobStatus,
     Resources,
+    StdStreamError,
     Volume,
     login_with_token,
 )
 from yarl import URL
 
+from .bench import BenchmarkReport, BenchmarkResult, run_benchmark
+from .blocking import LoopLagMonitor, loop_lag_guard, run_blocking
+from .cache import BootstrapCache
+from .checksum import (
+    CHECKSUM_RANGE_SIZE,
+    ChecksumResult,
+    file_checksum,
+    local_checksum,
+    ranged_checksum,
+    stream_checksum,
+)
+from .cleanup import BucketCleaner, CleanupResult
+from .datagen import RandomData
+from .fake import FakeDelays, FakeFaults, FakePlatform
+from .http import HTTPClient, HTTPProbe, HTTPTimings, RetryPolicy
+from .load import LoadProfile, LoadResult, run_load
+from .logs import LogCursor, LogMatcher
+from .oci import (
+    REGISTRY_CONCURRENCY,
+    RegistryClient,
+    RegistryTransfer,
+    SyntheticImage,
+)
+from .ordering import DurationHistory
+from .parallel import SetupCoordinator
+from .pool import ExecResult, JobPool, PooledJob
+from .process import run_shell
+from .profiler import HarnessProfiler
+from .reaper import reap_jobs
+from .retry import FlakyHistory
+from .s3 import read_range, s3_client, s3_credentials
+from .servers import ServerCache, ServerSpec, SharedServer
+from .timeline import JobTimeline, TimelineRecorder
+from .watcher import JobHandle, JobWatcher
+
+__all__ = [
+    "BenchmarkReport",
+    "BenchmarkResult",
+    "BootstrapCache",
+    "BucketCleaner",
+    "ChecksumResult",
+    "CleanupResult",
+    "DurationHistory",
+    "ExecResult",
+    "FakeDelays",
+    "FakeFaults",
+    "FakePlatform",
+    "FlakyHistory",
+    "HTTPClient",
+    "HTTPProbe",
+    "HTTPTimings",
+    "HarnessProfiler",
+    "Helper",
+    "JobHandle",
+    "JobPool",
+    "JobSpec",
+    "JobTimeline",
+    "JobWatcher",
+    "LoadProfile",
+    "LoadResult",
+    "LogCursor",
+    "LogMatcher",
+    "LoopLagMonitor",
+    "PooledJob",
+    "RandomData",
+    "RegistryClient",
+    "RegistryTransfer",
+    "RetryPolicy",
+    "ServerCache",
+    "ServerSpec",
+    "SetupCoordinator",
+    "SharedServer",
+    "SyntheticImage",
+    "TimelineRecorder",
+    "ensure_config",
+    "loop_lag_guard",
+    "reap_jobs",
+    "run_benchmark",
+    "run_blocking",
+    "run_load",
+    "run_shell",
+]
+
 JOB_OUTPUT_TIMEOUT = 60 * 5
 JOB_OUTPUT_SLEEP_SECONDS = 2
+# Every job of the harness has this tag and the tag of its run
+RUN_TAG = "e2e-run"
+# Older jobs of other runs are left over by crashed sessions
+SWEEP_AGE = 6 * 3600
 
 log = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class JobSpec:
+    image: str
+    command: str | None = None
+    description: str | None = None
+    wait_state: JobStatus = JobStatus.RUNNING
+    http: HTTPPort | None = None
+    resources: Resources | None = None
+    name: str | None = None
+    volumes: list[Volume] | None = None
+    schedule_timeout: float | None = None
+    wait_timeout: int = 180
+    tags: tuple[str, ...] = ()
+
+
 class Helper:
-    def __init__(self, client: Client, tmp_path: Path, config_path: Path) -> None:
+    def __init__(
+        self,
+        client: Client,
+        tmp_path: Path,
+        config_path: Path,
+        *,
+        timeline: TimelineRecorder | None = None,
+        run_id: str | None = None,
+    ) -> None:
         self._client = client
         self._tmp_path = tmp_path
         self._config_path = config_path
@@ -44,11 +151,25 @@ class Helper:
             path=f"/{client.config.project_name_or_raise}/{str(uuid4())}/",
         )
         self._has_root_storage = False
+        self._timeline = timeline if timeline is not None else TimelineRecorder()
+        self._run_id = run_id or secrets.token_hex(6)
+        self._watcher = JobWatcher(
+            client, on_update=self._timeline.observe, tags=[self.run_tag]
+        )
+        self._http = HTTPClient()
 
     @property
     def client(self) -> Client:
         return self._client
 
+    @property
+    def run_id(self) -> str:
+        return self._run_id
+
+    @property
+    def run_tag(self) -> str:
+        return f"{RUN_TAG}:{self._run_id}"
+
     @property
     def tmpstorage(self) -> URL:
         return self._tmpstorage
@@ -73,9 +194,27 @@ class Helper:
     def config_path(self) -> Path:
         return self._config_path
 
+    @property
+    def watcher(self) -> JobWatcher:
+        return self._watcher
+
+    @property
+    def timeline(self) -> TimelineRecorder:
+        return self._timeline
+
     async def close(self) -> None:
+        try:
+            # Terminal states and platform history of jobs nobody waited for
+            await self._watcher.refresh(self._timeline.unfinished())
+        except Exception as ex:
+            log.warning("Cannot refresh job timelines: %s", ex)
+        await self._watcher.close()
+        await self._http.close()
         if self._has_root_storage:
-            await self.rm("")
+            try:
+                await self._client.storage.rm(self.tmpstorage, recursive=True)
+            except Exception as ex:
+                log.warning("Cannot remove %s: %s", self.tmpstorage, ex)
             self._has_root_storage = False
         await self._client.close()
 
@@ -92,103 +231,209 @@ class Helper:
         volumes: list[Volume] | None = None,
         schedule_timeout: float | None = None,
         wait_timeout: int = 180,
+        tags: Sequence[str] = (),
     ) -> JobDescription:
+        spec = JobSpec(
+            image,
+            command,
+            description=description,
+            wait_state=wait_state,
+            http=http,
+            resources=resources,
+            name=name,
+            volumes=volumes,
+            schedule_timeout=schedule_timeout,
+            wait_timeout=wait_timeout,
+            tags=tuple(tags),
+        )
+        job = await self._submit_job(spec)
+        return await self._wait_job_state(job, spec.wait_state, spec.wait_timeout)
+
+    async def run_jobs(
+        self,
+        specs: Sequence[JobSpec],
+        *,
+        concurrency: int = 8,
+        on_submit: Callable[[str], None] | None = None,
+    ) -> list[JobDescription]:
+        """
+        Submit all jobs concurrently and wait for them together.
+
+        Results are returned in the order of specs. Failures of separate jobs
+        are collected into an ExceptionGroup after every job is settled.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _run(spec: JobSpec) -> JobDescription:
+            async with sem:
+                job = await self._submit_job(spec)
+            if on_submit is not None:
+                on_submit(job.id)
+            return await self._wait_job_state(job, spec.wait_state, spec.wait_timeout)
+
+        results = await asyncio.gather(
+            *(_run(spec) for spec in specs), return_exceptions=True
+        )
+        jobs = []
+        errors = []
+        for i, (spec, result) in enumerate(zip(specs, results)):
+            if isinstance(result, Exception):
+                result.add_note(f"Job #{i} from {spec.image} failed")
+                errors.append(result)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                jobs.append(result)
+        if errors:
+            raise ExceptionGroup(f"{len(errors)} of {len(specs)} jobs failed", errors)
+        return jobs
+
+    async def _submit_job(self, spec: JobSpec) -> JobDescription:
+        resources = spec.resources
         if resources is None:
             resources = Resources(
                 cpu=0.1,
                 memory=128 * 10**6,
             )
+        volumes = spec.volumes
         if volumes is None:
             volumes = []
         log.info("Submit job")
-        remote_image = self.client.parse.remote_image(image)
+        remote_image = self.client.parse.remote_image(spec.image)
         container = Container(
             image=remote_image,
-            command=command,
+            command=spec.command,
             resources=resources,
             volumes=volumes,
-            http=http,
+            http=spec.http,
         )
+        submitted_at = datetime.now(UTC)
         job = await self.client.jobs.run(
             container=container,
             scheduler_enabled=False,
-            description=description,
-            name=name,
-            schedule_timeout=schedule_timeout,
+            description=spec.description,
+            name=spec.name,
+            schedule_timeout=spec.schedule_timeout,
+            tags=[*spec.tags, RUN_TAG, self.run_tag],
         )
-        return await self._wait_job_state(job, wait_state, wait_timeout)
+        self._timeline.submitted(job, spec.image, submitted_at)
+        return job
 
     async def _wait_job_state(
         self, job: JobDescription, wait_state: JobStatus, timeout: int = 180
     ) -> JobDescription:
-        for i in range(timeout):
-            log.info("Wait state %s: %s -> %s", wait_state, job.id, job.status)
-            if job.status == wait_state:
-                break
-            if (wait_state != JobStatus.FAILED and job.status == JobStatus.FAILED) or (
-                wait_state == JobStatus.FAILED and job.status == JobStatus.SUCCEEDED
-            ):
-                raise AssertionError(f"Wait for {wait_state} is failed: {job.status}")
-            if wait_state == JobStatus.PENDING and job.status in (
-                JobStatus.RUNNING,
-                JobStatus.SUCCEEDED,
-                JobStatus.FAILED,
-            ):
-                break
-            await asyncio.sleep(1)
-            job = await self.client.jobs.status(job.id)
-        else:
-            raise AssertionError(f"Cannot start job to {wait_state}: {job.status}")
-        return job
+        log.info("Wait state %s: %s -> %s", wait_state, job.id, job.status)
+        return await self.watch_job(job).wait(wait_state, timeout)
+
+    def watch_job(self, job: JobDescription) -> JobHandle:
+        return self._watcher.track(job)
+
+    async def reap_run_jobs(self) -> int:
+        """
+        Kill the jobs of this run still active and wait until they finish.
+        """
+        return await reap_jobs(self, self.run_tag)
+
+    async def sweep_jobs(self, age: float = SWEEP_AGE) -> int:
+        """
+        Kill the jobs of other runs created more than age seconds ago.
+
+        Other sessions cannot be told apart from crashed ones, a run is
+        assumed to finish within age.
+        """
+        until = datetime.now(UTC) - timedelta(seconds=age)
+        return await reap_jobs(self, RUN_TAG, until=until, keep_tags=[self.run_tag])
+
+    async def kill_job(self, job_id: str) -> None:
+        self._timeline.kill_requested(job_id)
+        await self.client.jobs.kill(job_id)
+        self._timeline.killed(job_id)
 
     async def wait_job_state(
         self, job_id: str, wait_state: JobStatus
     ) -> JobDescription:
-        job = await self.client.jobs.status(job_id)
-        return await self._wait_job_state(job, wait_state)
+        handle = self._watcher.get(job_id)
+        if handle is None:
+            job = await self.client.jobs.status(job_id)
+            handle = self._watcher.track(job)
+        return await handle.wait(wait_state)
+
+    async def exec(self, job_id: str, cmd: str, *, timeout: float = 60) -> ExecResult:
+        """
+        Run command inside a running job and collect its output.
+        """
+        log.info("Exec in %s: %s", job_id, cmd)
+        stdout = []
+        stderr = []
+        async with asyncio.timeout(timeout):
+            async with self.client.jobs.exec(
+                job_id, cmd, stdout=True, stderr=True
+            ) as stream:
+                try:
+                    while (msg := await stream.read_out()) is not None:
+                        if msg.fileno == 2:
+                            stderr.append(msg.data)
+                        else:
+                            stdout.append(msg.data)
+                except StdStreamError as exc:
+                    exit_code = exc.exit_code
+                else:
+                    raise RuntimeError(f"Exec in {job_id} closed without exit code")
+        return ExecResult(
+            exit_code=exit_code,
+            stdout=b"".join(stdout).decode(errors="replace"),
+            stderr=b"".join(stderr).decode(errors="replace"),
+        )
 
-    async def http_get(self, url: URL) -> str:
+    async def http_get(
+        self, url: URL | str, *, policy: RetryPolicy | None = None
+    ) -> str:
         """
         Try to fetch given url few times.
         """
-        async with aiohttp.ClientSession() as session:
-            for i in range(3):
-                log.info("Probe %s", url)
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        return await resp.text()
-                await asyncio.sleep(5)
-            else:
-                raise aiohttp.ClientResponseError(
-                    status=resp.status,
-                    message=f"Server return {resp.status}",
-                    history=tuple(),
-                    request_info=resp.request_info,
-                )
+        probe = await self.http_probe(url, policy=policy)
+        return probe.body
+
+    async def http_probe(
+        self, url: URL | str, *, policy: RetryPolicy | None = None
+    ) -> HTTPProbe:
+        """
+        Fetch given url with retries, return the body with request timings.
+        """
+        return await self._http.get(url, policy=policy)
 
     async def check_job_output(
-        self, job_id: str, expected: str, *, re_flags: int = 0
+        self, job_id: str, expected: str | Sequence[str], *, re_flags: int = 0
     ) -> None:
         """
-        Wait until job output satisfies given regexp
+        Wait until job output satisfies given regexp(s)
         """
-        started_at = time.monotonic()
-        while time.monotonic() - started_at < JOB_OUTPUT_TIMEOUT:
-            log.info("Monitor %s", job_id)
-            chunks = []
-            async with self.client.jobs.monitor(job_id) as it:
-                async for chunk in it:
-                    if not chunk:
-                        break
-                    chunks.append(chunk.decode())
-                    if re.search(expected, "".join(chunks), re_flags):
+        patterns = [expected] if isinstance(expected, str) else list(expected)
+        matcher = LogMatcher(patterns, re_flags=re_flags)
+        cursor = LogCursor()
+        try:
+            async with asyncio.timeout(JOB_OUTPUT_TIMEOUT):
+                while True:
+                    log.info("Monitor %s since %s", job_id, cursor.since)
+                    # Resumed streams start at the last seen timestamp
+                    cursor.resume()
+                    async with self.client.jobs.monitor(
+                        job_id, since=cursor.since, timestamps=True
+                    ) as it:
+                        async for chunk in it:
+                            if not chunk:
+                                break
+                            if matcher.feed(cursor.feed(chunk)):
+                                return
+                    if matcher.feed(cursor.flush()):
                         return
-                    if time.monotonic() - started_at > JOB_OUTPUT_TIMEOUT:
-                        break
                     await asyncio.sleep(JOB_OUTPUT_SLEEP_SECONDS)
+        except TimeoutError:
+            pass
 
         raise AssertionError(
-            f"Output of job {job_id} does not satisfy to expected regexp: {expected}"
+            f"Output of job {job_id} does not satisfy to expected regexp: "
+            f"{', '.join(matcher.pending)}"
         )
 
     async def mkdir(self, path: str) -> None:
@@ -197,58 +442,117 @@ class Helper:
             self.tmpstorage / path, parents=True, exist_ok=True
         )
 
-    async def rm(self, path: str) -> None:
-        await self._client.storage.rm(self.tmpstorage / path)
+    async def rm(self, path: str, *, recursive: bool = False) -> None:
+        await self._client.storage.rm(self.tmpstorage / path, recursive=recursive)
 
     async def ensure_root_storage(self) -> None:
         if not self._has_root_storage:
             self._has_root_storage = True
             await self.mkdir("")
 
-    async def gen_random_file(self, path: Path, size: int) -> str:
-        hasher = hashlib.sha1()
-        with path.open("wb") as file:
-            generated = 0
-            while generated < size:
-                length = min(1024 * 1024, size - generated)
-                data = os.urandom(length)
-                file.write(data)
-                hasher.update(data)
-                generated += len(data)
-        return hasher.hexdigest()
+    async def gen_random_file(
+        self, path: Path, size: int, *, seed: int | None = None
+    ) -> str:
+        """
+        Write generated content to a local file, return its checksum.
+        """
+        if seed is None:
+            seed = secrets.randbits(32)
+        return await RandomData(size, seed).write_to(path)
+
+    async def upload_random(
+        self, path: str, size: int, *, seed: int | None = None
+    ) -> str:
+        """
+        Stream generated content straight to tmpstorage, return its checksum.
+
+        The checksum is taken while the content is streamed. Without a seed
+        the content is random; pass one to be able to reproduce it later.
+        """
+        if seed is None:
+            seed = secrets.randbits(32)
+        data = RandomData(size, seed)
+        await self._client.storage.create(self.tmpstorage / path, data.chunks())
+        return await data.get_checksum()
+
+    async def upload_random_blob(
+        self, bucket_name: str, key: str, size: int, *, seed: int | None = None
+    ) -> str:
+        """
+        Stream generated content straight to a blob, return its checksum.
+
+        The checksum is taken while the content is streamed. Without a seed
+        the content is random; pass one to be able to reproduce it later.
+        """
+        if seed is None:
+            seed = secrets.randbits(32)
+        data = RandomData(size, seed)
+        await self.client.buckets.put_blob(bucket_name, key, data.chunks())
+        return await data.get_checksum()
 
     async def calc_storage_checksum(self, path: str) -> str:
-        tmp_file = self._tmp_path / (str(uuid4()) + ".tmp")
-        await self._client.storage.download_file(
-            self.tmpstorage / path, URL(tmp_file.as_uri())
+        result = await self.storage_checksum(path)
+        return result.hexdigest
+
+    async def storage_checksum(
+        self, path: str, *, parallel: int = 1, range_size: int = CHECKSUM_RANGE_SIZE
+    ) -> ChecksumResult:
+        """
+        Hash a storage file while it is streamed, optionally by parallel ranges.
+        """
+        uri = self.tmpstorage / path
+        if parallel > 1:
+            stat = await self._client.storage.stat(uri)
+            result = await ranged_checksum(
+                lambda offset, size: self._client.storage.open(uri, offset, size),
+                stat.size,
+                parallel=parallel,
+                range_size=range_size,
+            )
+        else:
+            result = await stream_checksum(lambda: self._client.storage.open(uri))
+        log.info(
+            "Checksum of %s: %d bytes at %.1f MB/s",
+            uri,
+            result.size,
+            result.throughput / 10**6,
         )
-        return await self.calc_local_checksum(tmp_file)
+        return result
 
     async def calc_local_checksum(self, path: Path) -> str:
-        hasher = hashlib.sha1()
-        with path.open("rb") as file:
-            chunk = file.read(1024 * 1024)
-            while chunk:
-                hasher.update(chunk)
-                chunk = file.read(1024 * 1024)
-        return hasher.hexdigest()
-
-    @contextmanager
-    def docker_context(self, monkeypatch: Any) -> Iterator[None]:
-        with monkeypatch.context() as context:
-            # docker support
-            context.setenv("DOCKER_CONFIG", f"{self._tmp_path}")
-
-            # podman support
-            docker_config = self._tmp_path / "config.json"
-            monkeypatch.setenv("REGISTRY_AUTH_FILE", f"{docker_config}")
+        return await local_checksum(path)
 
-            monkeypatch.setenv(CONFIG_ENV_NAME, f"{self.config_path}")
-            shell("neuro config docker")
-
-            yield
+    @asynccontextmanager
+    async def registry_client(
+        self, *, concurrency: int = REGISTRY_CONCURRENCY
+    ) -> AsyncIterator[RegistryClient]:
+        # The registry takes the platform token as the password of the user
+        token = await self._client.config.token()
+        auth = aiohttp.BasicAuth(self.username, token).encode()
+        client = RegistryClient(self.registry, auth=auth, concurrency=concurrency)
+        try:
+            yield client
+        finally:
+            await client.close()
 
-            docker_config.unlink()
+    @asynccontextmanager
+    async def docker_context(self) -> AsyncIterator[dict[str, str]]:
+        """
+        Configure docker and podman for the registry, yield env for run_shell.
+        """
+        docker_config = self._tmp_path / "config.json"
+        env = {
+            # docker support
+            "DOCKER_CONFIG": f"{self._tmp_path}",
+            # podman support
+            "REGISTRY_AUTH_FILE": f"{docker_config}",
+            CONFIG_ENV_NAME: f"{self.config_path}",
+        }
+        await run_shell("neuro config docker", env=env)
+        try:
+            yield env
+        finally:
+            docker_config.unlink(missing_ok=True)
 
     async def create_bucket(self, name: str, *, wait: bool = False) -> None:
         await self.client.buckets.create(name)
@@ -271,21 +575,21 @@ class Helper:
     async def delete_bucket(self, bucket_name_or_id: str) -> None:
         await self.client.buckets.rm(bucket_name_or_id)
 
-    async def cleanup_bucket(self, bucket_name_or_id: str) -> None:
+    async def cleanup_bucket(
+        self, bucket_name_or_id: str, *, batch: bool = True
+    ) -> CleanupResult:
         # Each test needs a clean bucket state and we can't delete bucket until it's
         # cleaned
-        async with self.client.buckets.list_blobs(
-            URL(f"blob:{bucket_name_or_id}"), recursive=True
-        ) as blobs_it:
-            # XXX: We do assume we will not have tests that run 10000 of objects.
-            # If we do, please add a semaphore here.
-            tasks = []
-            async for blob in blobs_it:
-                log.info("Removing %s %s", bucket_name_or_id, blob.key)
-                tasks.append(
-                    self.client.buckets.delete_blob(bucket_name_or_id, key=blob.key)
-                )
-        await asyncio.gather(*tasks)
+        result = await BucketCleaner(self.client, batch=batch).cleanup(
+            bucket_name_or_id
+        )
+        if result.failed:
+            key, error = next(iter(result.failed.items()))
+            raise RuntimeError(
+                f"Cannot delete {len(result.failed)} objects "
+                f"from {bucket_name_or_id}, e.g. {key}: {error}"
+            )
+        return result
 
     @asynccontextmanager
     async def create_tmp_bucket(self) -> AsyncIterator[str]:
@@ -305,21 +609,65 @@ class Helper:
         assert blob.size == size
 
     async def check_blob_checksum(
-        self, bucket_name: str, key: str, checksum: str, tmp_path: Path
+        self, bucket_name: str, key: str, checksum: str
     ) -> None:
-        await self.client.buckets.download_file(
-            URL(f"blob:{bucket_name}/{key}"),
-            URL("file:" + str(tmp_path)),
+        result = await self.blob_checksum(bucket_name, key)
+        assert (
+            result.hexdigest == checksum
+        ), f"checksum test failed for blob:{bucket_name}/{key}"
+
+    async def blob_checksum(
+        self,
+        bucket_name: str,
+        key: str,
+        *,
+        parallel: int = 1,
+        range_size: int = CHECKSUM_RANGE_SIZE,
+    ) -> ChecksumResult:
+        """
+        Hash a blob while it is streamed, optionally by parallel ranges.
+
+        Ranges are end-bounded S3 requests with temporary credentials, blobs
+        of other providers are hashed as a single stream.
+        """
+        buckets = self._client.buckets
+        credentials = None
+        if parallel > 1:
+            try:
+                credentials = await s3_credentials(self._client, bucket_name)
+            except Exception as exc:
+                log.warning(
+                    "Cannot get credentials of %s, hashing a single stream: %s",
+                    bucket_name,
+                    exc,
+                )
+        if credentials is None:
+            # fetch_blob has no end offset, every range would stream the tail
+            result = await stream_checksum(lambda: buckets.fetch_blob(bucket_name, key))
+        else:
+            blob = await buckets.head_blob(bucket_name, key)
+            s3_bucket = credentials["bucket_name"]
+            async with s3_client(credentials, max_connections=parallel) as s3:
+                result = await ranged_checksum(
+                    lambda offset, size: read_range(s3, s3_bucket, key, offset, size),
+                    blob.size,
+                    parallel=parallel,
+                    range_size=range_size,
+                )
+        log.info(
+            "Checksum of blob:%s/%s: %d bytes at %.1f MB/s",
+            bucket_name,
+            key,
+            result.size,
+            result.throughput / 10**6,
         )
-        assert self.hash_hex(tmp_path) == checksum, "checksum test failed for {url}"
+        return result
 
     def hash_hex(self, file: str | Path) -> str:
-        _hash = sha1()
-        with open(file, "rb") as f:
-            for block in iter(lambda: f.read(16 * 1024 * 1024), b""):
-                _hash.update(block)
-
-        return _hash.hexdigest()
+        """
+        Blocking SHA-1 of a local file, use calc_local_checksum in coroutines.
+        """
+        return file_checksum(file)
 
 
 async def ensure_config(
@@ -333,25 +681,3 @@ async def ensure_config(
         return config_path
     else:
         return None
-
-
-def shell(cmd: str, timeout: float = 300) -> str:
-    log.info(f"Run {cmd}")
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        timeout=timeout,
-        capture_output=True,
-    )
-    if result.returncode != os.EX_OK:
-        raise SystemError(
-            f"Command `{cmd}` exits with code {result.returncode}, "
-            f"Stderr: {result.stderr.decode('utf-8')},"
-            f"Stdout: {result.stdout.decode('utf-8')}"
-        )
-    if result.stderr:
-        log.warning(
-            f"Command {cmd} write something to stderr: "
-            f"{result.stderr.decode('utf-8')}"
-        )
-    return result.stdout.decode("utf-8")
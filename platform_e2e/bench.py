@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Percentile with linear interpolation between closest ranks, q in [0, 100].
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def format_size(size: int) -> str:
+    for unit, scale in (("G", GB), ("M", MB), ("K", KB)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return str(size)
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: dict[str, Any]
+    elapsed: float
+    latencies: list[float] = field(default_factory=list)
+    bytes: int = 0
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def ops(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / MB / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def ops_per_s(self) -> float:
+        return self.ops / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "params": self.params,
+            "ops": self.ops,
+            "bytes": self.bytes,
+            "elapsed": self.elapsed,
+            "mb_per_s": self.mb_per_s,
+            "ops_per_s": self.ops_per_s,
+            **{
+                f"p{q}": percentile(self.latencies, q) if self.latencies else None
+                for q in (50, 95, 99)
+            },
+            **self.extra,
+        }
+
+
+async def run_benchmark(
+    name: str,
+    params: dict[str, Any],
+    ops: Sequence[Callable[[], Awaitable[int]]],
+    *,
+    concurrency: int = 1,
+) -> BenchmarkResult:
+    """
+    Run ops with bounded concurrency; every op returns bytes it moved.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    result = BenchmarkResult(name, params, elapsed=0.0)
+
+    async def _run(op: Callable[[], Awaitable[int]]) -> None:
+        async with sem:
+            started_at = time.monotonic()
+            moved = await op()
+            result.bytes += moved
+            result.latencies.append(time.monotonic() - started_at)
+
+    started_at = time.monotonic()
+    await asyncio.gather(*(_run(op) for op in ops))
+    result.elapsed = time.monotonic() - started_at
+    return result
+
+
+class BenchmarkReport:
+    """
+    Collects benchmark cells of a session into one machine-readable file.
+    """
+
+    def __init__(self) -> None:
+        self._results: list[BenchmarkResult] = []
+        self._meta: dict[str, Any] = {
+            "started_at": datetime.now(UTC).isoformat(),
+            "host": platform.node(),
+            "worker": os.environ.get("PYTEST_XDIST_WORKER", "master"),
+        }
+
+    @property
+    def results(self) -> list[BenchmarkResult]:
+        return self._results
+
+    def set_meta(self, **kwargs: Any) -> None:
+        self._meta.update(kwargs)
+
+    def add(self, result: BenchmarkResult) -> None:
+        log.info(
+            "Benchmark %s %s: %.1f MB/s, %.1f ops/s, p50 %.3fs, p99 %.3fs",
+            result.name,
+            result.params,
+            result.mb_per_s,
+            result.ops_per_s,
+            percentile(result.latencies, 50),
+            percentile(result.latencies, 99),
+        )
+        self._results.append(result)
+
+    def write(self, path: Path) -> None:
+        data = {
+            "meta": self._meta,
+            "results": [result.as_dict() for result in self._results],
+        }
+        path.write_text(json.dumps(data, indent=2))
@@ -0,0 +1,90 @@
+import asyncio
+import functools
+import logging
+import os
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from typing import TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Hashing and file IO release the GIL, threads scale up to the disk
+BLOCKING_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+LOOP_LAG_INTERVAL = 0.01
+LOOP_LAG_LIMIT = 0.1
+
+
+@functools.cache
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(BLOCKING_WORKERS, thread_name_prefix="e2e-blocking")
+
+
+async def run_blocking(func: Callable[..., T], *args: object) -> T:
+    """
+    Run blocking file or CPU work in the bounded harness thread pool.
+
+    Unlike the default executor the pool is not shared with the SDK, so a
+    few multi-GB hashes cannot starve DNS lookups or file uploads.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), func, *args)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a periodic timer.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL) -> None:
+        self._interval = interval
+        self._deadline = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self.lags: list[float] = []
+
+    @property
+    def max_lag(self) -> float:
+        return max(self.lags, default=0.0)
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        # The loop may have been blocked right before the exit
+        late = asyncio.get_running_loop().time() - self._deadline
+        if late > 0:
+            self.lags.append(late)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._deadline = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            self.lags.append(max(loop.time() - self._deadline, 0.0))
+
+
+@asynccontextmanager
+async def loop_lag_guard(
+    max_lag: float = LOOP_LAG_LIMIT, *, interval: float = LOOP_LAG_INTERVAL
+) -> AsyncIterator[LoopLagMonitor]:
+    """
+    Fail if the event loop lagged more than max_lag seconds in the block.
+    """
+    async with LoopLagMonitor(interval) as monitor:
+        yield monitor
+    log.info(
+        "Event loop lag: max %.3fs over %d ticks", monitor.max_lag, len(monitor.lags)
+    )
+    if monitor.max_lag > max_lag:
+        raise AssertionError(
+            f"Event loop lagged {monitor.max_lag:.3f}s, more than {max_lag}s"
+        )
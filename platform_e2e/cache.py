@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+from filelock import FileLock
+from yarl import URL
+
+log = logging.getLogger(__name__)
+
+TOKEN_TTL = 12 * 60 * 60
+EXISTS_TTL = 7 * 24 * 60 * 60
+CONFIG_TTL = 12 * 60 * 60
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()[:16]
+
+
+class BootstrapCache:
+    """
+    On-disk cache of session bootstrap results shared by runs and workers.
+
+    Entries are grouped into scopes keyed by API URL, cluster and user and
+    expire after their TTL. Scopes used by this process can be dropped at
+    once, e.g. after the platform rejected a cached token.
+
+    The cache holds raw user tokens and client configs with them, so the
+    root is only accessible by its owner.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._root = root
+        self._root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # The root may have been created by pytest with default permissions
+        self._root.chmod(0o700)
+        self._index = root / "index.json"
+        self._lock = FileLock(root / "index.lock", mode=0o600)
+        self._used: set[str] = set()
+
+    @staticmethod
+    def scope(api_url: URL, cluster_name: str, user_name: str) -> str:
+        return f"{api_url}|{cluster_name}|{user_name}"
+
+    def get(self, scope: str, name: str) -> Any | None:
+        self._used.add(scope)
+        with self._lock:
+            entry = self._read().get(scope, {}).get(name)
+        if entry is None or entry["expires_at"] < time.time():
+            return None
+        return entry["value"]
+
+    def set(self, scope: str, name: str, value: Any, ttl: float) -> None:
+        self._used.add(scope)
+        with self._update() as data:
+            data.setdefault(scope, {})[name] = {
+                "value": value,
+                "expires_at": time.time() + ttl,
+            }
+
+    def get_config(self, scope: str, token: str, dst: Path) -> Path | None:
+        """
+        Copy a cached client config made for given token into dst.
+        """
+        with self._lock:
+            entry = self.get(scope, "config")
+            if entry is None or entry["token"] != _digest(token):
+                return None
+            src = self._root / entry["path"]
+            if not src.exists():
+                return None
+            _copy(src, dst)
+        return dst
+
+    def set_config(self, scope: str, token: str, src: Path) -> None:
+        name = f"config-{_digest(scope)}"
+        tmp = self._root / f"{name}.{uuid4().hex}.tmp"
+        _copy(src, tmp)
+        _make_private(tmp)
+        with self._update() as data:
+            dst = self._root / name
+            if dst.is_dir():
+                shutil.rmtree(dst)
+            os.replace(tmp, dst)
+            data.setdefault(scope, {})["config"] = {
+                "value": {"path": name, "token": _digest(token)},
+                "expires_at": time.time() + CONFIG_TTL,
+            }
+        self._used.add(scope)
+
+    def invalidate(self, scope: str | None = None) -> None:
+        """
+        Drop given scope or every scope used by this process.
+        """
+        scopes = {scope} if scope is not None else set(self._used)
+        if not scopes:
+            return
+        log.info("Invalidate bootstrap cache for %s", ", ".join(sorted(scopes)))
+        with self._update() as data:
+            for item in scopes:
+                data.pop(item, None)
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            return json.loads(self._index.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @contextmanager
+    def _update(self) -> Iterator[dict[str, Any]]:
+        with self._lock:
+            data = self._read()
+            yield data
+            tmp = self._index.with_suffix(f".{uuid4().hex}.tmp")
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with open(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self._index)
+
+
+def _copy(src: Path, dst: Path) -> None:
+    if src.is_dir():
+        shutil.copytree(src, dst, dirs_exist_ok=True)
+    else:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dst)
+
+
+def _make_private(path: Path) -> None:
+    if not path.is_dir():
+        path.chmod(0o600)
+        return
+    path.chmod(0o700)
+    for parent, dirs, files in path.walk():
+        for name in dirs:
+            (parent / name).chmod(0o700)
+        for name in files:
+            (parent / name).chmod(0o600)
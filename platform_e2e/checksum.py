@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from pathlib import Path
+
+from .blocking import run_blocking
+
+log = logging.getLogger(__name__)
+
+CHECKSUM_RANGE_SIZE = 64 * 1024 * 1024
+FILE_HASH_CHUNK_SIZE = 16 * 1024 * 1024
+
+RangeReader = Callable[[int, int], AbstractAsyncContextManager[AsyncIterator[bytes]]]
+
+
+@dataclass(frozen=True)
+class ChecksumResult:
+    hexdigest: str
+    size: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second."""
+        return self.size / self.elapsed if self.elapsed else 0.0
+
+
+async def stream_checksum(
+    open_stream: Callable[[], AbstractAsyncContextManager[AsyncIterator[bytes]]],
+) -> ChecksumResult:
+    """
+    SHA-1 of a byte stream hashed as chunks arrive.
+    """
+    started_at = time.monotonic()
+    hasher = hashlib.sha1()
+    size = 0
+    async with open_stream() as it:
+        async for chunk in it:
+            hasher.update(chunk)
+            size += len(chunk)
+    return ChecksumResult(hasher.hexdigest(), size, time.monotonic() - started_at)
+
+
+async def ranged_checksum(
+    read_range: RangeReader,
+    size: int,
+    *,
+    parallel: int = 4,
+    range_size: int = CHECKSUM_RANGE_SIZE,
+) -> ChecksumResult:
+    """
+    SHA-1 of an object fetched by byte ranges concurrently.
+
+    Up to parallel ranges are downloaded ahead while the hasher consumes them
+    in order, so memory is bounded by parallel * range_size.
+    """
+    started_at = time.monotonic()
+    hasher = hashlib.sha1()
+    ranges = iter(range(0, size, range_size))
+
+    async def _fetch(offset: int) -> list[bytes]:
+        length = min(range_size, size - offset)
+        chunks = []
+        received = 0
+        async with read_range(offset, length) as it:
+            async for chunk in it:
+                rest = length - received
+                chunk = chunk[:rest]
+                chunks.append(chunk)
+                received += len(chunk)
+                if received >= length:
+                    break
+        if received != length:
+            raise RuntimeError(
+                f"Range {offset}+{length} is truncated to {received} bytes"
+            )
+        return chunks
+
+    pending: deque[asyncio.Task[list[bytes]]] = deque()
+    try:
+        for offset in ranges:
+            pending.append(asyncio.create_task(_fetch(offset)))
+            if len(pending) >= parallel:
+                break
+        while pending:
+            for chunk in await pending.popleft():
+                hasher.update(chunk)
+            offset = next(ranges, -1)
+            if offset >= 0:
+                pending.append(asyncio.create_task(_fetch(offset)))
+    finally:
+        for task in pending:
+            task.cancel()
+        # Let cancelled fetches close their streams before returning
+        await asyncio.gather(*pending, return_exceptions=True)
+    return ChecksumResult(hasher.hexdigest(), size, time.monotonic() - started_at)
+
+
+def file_checksum(path: str | Path, *, chunk_size: int = FILE_HASH_CHUNK_SIZE) -> str:
+    """
+    SHA-1 of a local file hashed from a memory map, without copying chunks.
+
+    Blocks, coroutines should use local_checksum.
+    """
+    hasher = hashlib.sha1()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if not size:
+            # Empty files cannot be mapped
+            return hasher.hexdigest()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mapped) as view:
+                for offset in range(0, size, chunk_size):
+                    end = offset + chunk_size
+                    hasher.update(view[offset:end])
+    return hasher.hexdigest()
+
+
+async def local_checksum(
+    path: str | Path, *, chunk_size: int = FILE_HASH_CHUNK_SIZE
+) -> str:
+    """
+    SHA-1 of a local file hashed in the blocking pool.
+    """
+    return await run_blocking(
+        functools.partial(file_checksum, path, chunk_size=chunk_size)
+    )
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from apolo_sdk import Client, ResourceNotFound
+from yarl import URL
+
+from .http import RetryPolicy
+from .s3 import s3_client, s3_credentials
+
+log = logging.getLogger(__name__)
+
+CLEANUP_CONCURRENCY = 8
+CLEANUP_BLOB_CONCURRENCY = 32
+CLEANUP_PAGE_SIZE = 100
+CLEANUP_S3_PAGE_SIZE = 1000
+CLEANUP_PROGRESS_INTERVAL = 5.0
+CLEANUP_RETRY = RetryPolicy(attempts=5, base_delay=0.5, max_delay=5.0)
+
+
+@dataclass
+class CleanupResult:
+    bucket: str
+    deleted: int = 0
+    elapsed: float = 0.0
+    batched: bool = False
+    failed: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def keys_per_s(self) -> float:
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+
+class _Backend(Protocol):
+    def pages(self, start_after: str = "") -> AsyncIterator[list[str]]:
+        """List keys in pages in key order, after start_after."""
+        ...
+
+    async def delete(self, keys: list[str]) -> dict[str, str]:
+        """Delete keys, return errors of keys that were not deleted."""
+        ...
+
+
+class _SDKBackend:
+    """
+    Lists through the SDK and deletes object by object, for any provider.
+    """
+
+    def __init__(self, client: Client, bucket: str, *, concurrency: int) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._sem = asyncio.Semaphore(concurrency)
+
+    async def pages(self, start_after: str = "") -> AsyncIterator[list[str]]:
+        page: list[str] = []
+        async with self._client.buckets.list_blobs(
+            URL(f"blob:{self._bucket}"), recursive=True
+        ) as it:
+            async for blob in it:
+                # The SDK cannot start a listing after a key, skip up to it
+                if blob.key <= start_after:
+                    continue
+                page.append(blob.key)
+                if len(page) >= CLEANUP_PAGE_SIZE:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    async def delete(self, keys: list[str]) -> dict[str, str]:
+        async def _delete(key: str) -> None:
+            async with self._sem:
+                try:
+                    await self._client.buckets.delete_blob(self._bucket, key=key)
+                except ResourceNotFound:
+                    pass
+
+        results = await asyncio.gather(
+            *(_delete(key) for key in keys), return_exceptions=True
+        )
+        return {
+            key: repr(result)
+            for key, result in zip(keys, results)
+            if isinstance(result, Exception)
+        }
+
+
+class _S3Backend:
+    """
+    Lists and deletes with S3 DeleteObjects, up to 1000 keys per request.
+    """
+
+    def __init__(self, s3: Any, bucket_name: str) -> None:
+        self._s3 = s3
+        self._bucket_name = bucket_name
+
+    @classmethod
+    @asynccontextmanager
+    async def create(cls, credentials: dict[str, str]) -> AsyncIterator["_S3Backend"]:
+        async with s3_client(
+            credentials, max_connections=CLEANUP_CONCURRENCY * 2
+        ) as s3:
+            yield cls(s3, credentials["bucket_name"])
+
+    async def pages(self, start_after: str = "") -> AsyncIterator[list[str]]:
+        paginator = self._s3.get_paginator("list_objects_v2")
+        params = {"StartAfter": start_after} if start_after else {}
+        async for result in paginator.paginate(
+            Bucket=self._bucket_name,
+            PaginationConfig={"PageSize": CLEANUP_S3_PAGE_SIZE},
+            **params,
+        ):
+            keys = [obj["Key"] for obj in result.get("Contents", [])]
+            if keys:
+                yield keys
+
+    async def delete(self, keys: list[str]) -> dict[str, str]:
+        resp = await self._s3.delete_objects(
+            Bucket=self._bucket_name,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+        return {
+            error["Key"]: f"{error.get('Code')}: {error.get('Message')}"
+            for error in resp.get("Errors", [])
+        }
+
+
+class BucketCleaner:
+    """
+    Deletes every object of a bucket while it is still being listed.
+
+    Listed pages go through a bounded queue to a fixed number of workers, so
+    memory and the number of requests in flight stay constant regardless of
+    the bucket size. S3-compatible buckets are cleaned with batched
+    DeleteObjects requests using temporary credentials, other providers fall
+    back to deleting blobs one by one. Keys that fail are retried with
+    backoff within their batch, a failed listing is resumed after the last
+    listed key.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        *,
+        concurrency: int = CLEANUP_CONCURRENCY,
+        blob_concurrency: int = CLEANUP_BLOB_CONCURRENCY,
+        retry: RetryPolicy = CLEANUP_RETRY,
+        batch: bool = True,
+    ) -> None:
+        self._client = client
+        self._concurrency = concurrency
+        self._blob_concurrency = blob_concurrency
+        self._retry = retry
+        self._batch = batch
+
+    async def cleanup(self, bucket_name_or_id: str) -> CleanupResult:
+        result = CleanupResult(bucket_name_or_id)
+        started_at = time.monotonic()
+        async with self._backend(bucket_name_or_id, result) as backend:
+            await self._run(backend, result, started_at)
+        result.elapsed = time.monotonic() - started_at
+        log.info(
+            "Cleaned %s: %d objects in %.1fs (%.0f keys/s), %d failed",
+            bucket_name_or_id,
+            result.deleted,
+            result.elapsed,
+            result.keys_per_s,
+            len(result.failed),
+        )
+        return result
+
+    @asynccontextmanager
+    async def _backend(
+        self, bucket_name_or_id: str, result: CleanupResult
+    ) -> AsyncIterator[_Backend]:
+        credentials = await self._s3_credentials(bucket_name_or_id)
+        if credentials is None:
+            yield _SDKBackend(
+                self._client, bucket_name_or_id, concurrency=self._blob_concurrency
+            )
+            return
+        result.batched = True
+        async with _S3Backend.create(credentials) as backend:
+            yield backend
+
+    async def _s3_credentials(self, bucket_name_or_id: str) -> dict[str, str] | None:
+        if not self._batch:
+            return None
+        try:
+            return await s3_credentials(self._client, bucket_name_or_id)
+        except Exception as exc:
+            log.warning(
+                "Cannot get credentials of %s, deleting one by one: %s",
+                bucket_name_or_id,
+                exc,
+            )
+            return None
+
+    async def _run(
+        self, backend: _Backend, result: CleanupResult, started_at: float
+    ) -> None:
+        queue: asyncio.Queue[list[str] | None] = asyncio.Queue(self._concurrency)
+        reported_at = started_at
+
+        async def _worker() -> None:
+            nonlocal reported_at
+            while (keys := await queue.get()) is not None:
+                await self._delete(backend, keys, result)
+                now = time.monotonic()
+                if now - reported_at >= CLEANUP_PROGRESS_INTERVAL:
+                    reported_at = now
+                    log.info(
+                        "Cleaning %s: %d deleted, %d failed, %.0f keys/s",
+                        result.bucket,
+                        result.deleted,
+                        len(result.failed),
+                        result.deleted / (now - started_at),
+                    )
+
+        async def _list() -> None:
+            last = ""
+            attempt = 0
+            while True:
+                try:
+                    async for keys in backend.pages(last):
+                        await queue.put(keys)
+                        last = keys[-1]
+                        attempt = 0
+                    break
+                except Exception as exc:
+                    attempt += 1
+                    if attempt >= self._retry.attempts:
+                        raise
+                    log.info("Retry listing %s after %r: %s", result.bucket, last, exc)
+                    await asyncio.sleep(self._retry.delay(attempt))
+            # Workers are cancelled by the task group if the listing fails
+            for _ in range(self._concurrency):
+                await queue.put(None)
+
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(self._concurrency):
+                tg.create_task(_worker())
+            tg.create_task(_list())
+
+    async def _delete(
+        self, backend: _Backend, keys: list[str], result: CleanupResult
+    ) -> None:
+        attempt = 0
+        while True:
+            try:
+                errors = await backend.delete(keys)
+            except Exception as exc:
+                errors = dict.fromkeys(keys, repr(exc))
+            result.deleted += len(keys) - len(errors)
+            attempt += 1
+            if not errors or attempt >= self._retry.attempts:
+                result.failed.update(errors)
+                return
+            log.info("Retry %d of %d keys in %s", len(errors), len(keys), result.bucket)
+            keys = list(errors)
+            await asyncio.sleep(self._retry.delay(attempt))
@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import random
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+from .blocking import run_blocking
+
+DATA_BLOCK_SIZE = 1024 * 1024
+DATA_POOL_SIZE = 16 * 1024 * 1024
+CHECKSUM_CACHE_SIZE = 64
+
+_checksums: OrderedDict[tuple[int, int, int], str] = OrderedDict()
+
+
+@functools.lru_cache(maxsize=4)
+def _pool(seed: int) -> memoryview:
+    data = random.Random(seed).randbytes(DATA_POOL_SIZE)
+    # Doubled so that any window of a block size is a contiguous slice
+    return memoryview(data + data)
+
+
+class RandomData:
+    """
+    Reproducible pseudo-random content of a given size.
+
+    Blocks are windows at seeded offsets into a random pool plus a block
+    header, so generation is a memory copy and any block can be produced
+    independently. The SHA-1 comes from one hashing pass while the blocks are
+    generated, so it is known once the content was streamed or written out.
+    The last few checksums are kept per seed and size; asking for one that is
+    not known generates the whole content again just to hash it, so callers
+    that verify the same content later should keep the checksum or pass the
+    same seed.
+    """
+
+    def __init__(
+        self, size: int, seed: int = 0, *, block_size: int = DATA_BLOCK_SIZE
+    ) -> None:
+        if block_size > DATA_POOL_SIZE:
+            raise ValueError(f"Block size is larger than {DATA_POOL_SIZE}")
+        self._size = size
+        self._seed = seed
+        self._block_size = block_size
+        self._checksum: str | None = None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @property
+    def checksum(self) -> str | None:
+        """SHA-1 of the content if it is already known."""
+        if self._checksum is None:
+            self._checksum = _checksums.get(self._key)
+            if self._checksum is not None:
+                _checksums.move_to_end(self._key)
+        return self._checksum
+
+    @property
+    def _key(self) -> tuple[int, int, int]:
+        return (self._seed, self._size, self._block_size)
+
+    def block(self, index: int) -> bytes:
+        start = index * self._block_size
+        length = min(self._block_size, self._size - start)
+        if length <= 0:
+            raise IndexError(index)
+        header = f"{self._seed}:{index}:".encode()
+        offset = random.Random((self._seed << 32) | index).randrange(DATA_POOL_SIZE)
+        end = offset + max(length - len(header), 0)
+        data = b"".join((header, _pool(self._seed)[offset:end]))
+        return data[:length] if len(data) > length else data
+
+    def blocks(self) -> Iterator[bytes]:
+        hasher = hashlib.sha1() if self.checksum is None else None
+        for index in range(-(-self._size // self._block_size)):
+            data = self.block(index)
+            if hasher is not None:
+                hasher.update(data)
+            yield data
+        if hasher is not None:
+            self._checksum = hasher.hexdigest()
+            _checksums[self._key] = self._checksum
+            if len(_checksums) > CHECKSUM_CACHE_SIZE:
+                _checksums.popitem(last=False)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """
+        Stream the content without blocking the event loop.
+        """
+        it = self.blocks()
+        while True:
+            data = await run_blocking(next, it, None)
+            if data is None:
+                return
+            yield data
+
+    async def get_checksum(self) -> str:
+        checksum = self.checksum
+        if checksum is None:
+            await run_blocking(self._drain)
+            checksum = self.checksum
+            assert checksum is not None
+        return checksum
+
+    async def write_to(self, path: Path) -> str:
+        await run_blocking(self._write_to, path)
+        return await self.get_checksum()
+
+    def _drain(self) -> None:
+        for _ in self.blocks():
+            pass
+
+    def _write_to(self, path: Path) -> None:
+        with path.open("wb") as file:
+            for data in self.blocks():
+                file.write(data)
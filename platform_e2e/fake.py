@@ -0,0 +1,1448 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import shlex
+import time
+import xml.etree.ElementTree as ET
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import formatdate
+from typing import Any
+from uuid import uuid4
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+from jose import jwt
+from yarl import URL
+
+from .load import UNSCHEDULABLE_REASON
+
+log = logging.getLogger(__name__)
+
+FAKE_CLUSTER = "default"
+FAKE_ORG = "e2e-org"
+FAKE_SIGNING_KEY = "fake-platform"
+USER_CLAIM = "https://platform.neuromation.io/user"
+
+FOREVER = float("inf")
+# Exit code of a command killed together with its job
+KILLED_EXIT_CODE = 137
+CANNOT_RUN_REASON = "ContainerCannotRun"
+S3_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL = frozenset({SUCCEEDED, FAILED, CANCELLED})
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+@dataclass
+class FakeDelays:
+    """
+    Seconds a fake job spends in every pending phase, and extra latency.
+
+    run is added to the runtime of every command that finishes on its own,
+    sleeps in commands are multiplied by time_scale.
+    """
+
+    scheduling: float = 0.0
+    pulling: float = 0.0
+    creating: float = 0.0
+    run: float = 0.0
+    killing: float = 0.0
+    request: float = 0.0
+    time_scale: float = 1.0
+
+
+@dataclass
+class FakeFaults:
+    """
+    Injected failures: a share of API requests to paths matching routes
+    answered with error_status, shares of jobs that never get scheduled or
+    fail to start, and job log streams closed after log_stream_lifetime
+    seconds.
+    """
+
+    error_rate: float = 0.0
+    error_status: int = 503
+    routes: str = ""
+    unschedulable_rate: float = 0.0
+    failure_rate: float = 0.0
+    log_stream_lifetime: float = 0.0
+
+
+@dataclass(frozen=True)
+class Script:
+    """
+    What a command prints and when, how long it runs and how it exits.
+    """
+
+    output: tuple[tuple[float, bytes], ...] = ()
+    duration: float = 0.0
+    exit_code: int = 0
+
+    @property
+    def finite(self) -> bool:
+        return self.duration != FOREVER
+
+
+_SHELLS = frozenset({"sh", "bash", "/bin/sh", "/bin/bash"})
+_SEPARATORS = frozenset({";", "&&", "||", "&", "|"})
+_DURATION = re.compile(r"^(\d+(?:\.\d+)?)([smhd]?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _seconds(value: str) -> float:
+    if value in ("inf", "infinity"):
+        return FOREVER
+    match = _DURATION.match(value)
+    if match is None:
+        raise ValueError(f"Invalid duration {value!r}")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def _statements(command: str) -> Iterator[tuple[str, list[str]]]:
+    lexer = shlex.shlex(command.replace("\n", ";"), posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    separator = ";"
+    tokens: list[str] = []
+    for token in lexer:
+        if token in _SEPARATORS:
+            if tokens:
+                yield separator, tokens
+            separator, tokens = token, []
+        else:
+            tokens.append(token)
+    if tokens:
+        yield separator, tokens
+
+
+def parse_script(command: str | None, *, time_scale: float = 1.0) -> Script:
+    """
+    Simulate a command in the tiny subset of shell the fake understands.
+
+    echo, printf, sleep, exit, true, false and timeout joined by ;, && and
+    || are simulated, output redirected to a file is dropped and sh -c
+    scripts are unwrapped. Anything else, and a job without a command, is
+    a server running until it is killed.
+    """
+    if not command:
+        return Script(duration=FOREVER)
+    try:
+        statements = list(_statements(command))
+    except ValueError:
+        return Script(duration=FOREVER)
+    output: list[tuple[float, bytes]] = []
+    clock = 0.0
+    code = 0
+    for separator, tokens in statements:
+        if (separator == "&&" and code) or (separator == "||" and not code):
+            continue
+        redirect = next(
+            (i for i, token in enumerate(tokens) if token[:1] in "<>"), None
+        )
+        args = tokens[:redirect]
+        if not args:
+            continue
+        result = _simulate(args, time_scale)
+        if result is None:
+            return Script(tuple(output), FOREVER, code)
+        if redirect is None:
+            output += [(clock + offset, data) for offset, data in result.output]
+        clock += result.duration
+        code = result.exit_code
+        if args[0] == "exit" or not result.finite:
+            break
+    return Script(tuple(output), clock, code)
+
+
+def _simulate(args: list[str], time_scale: float) -> Script | None:
+    name, *rest = args
+    try:
+        if name in _SHELLS and rest[:1] == ["-c"] and len(rest) > 1:
+            return parse_script(rest[1], time_scale=time_scale)
+        if name == "echo":
+            newline = "\n"
+            if rest[:1] == ["-n"]:
+                newline, rest = "", rest[1:]
+            return Script(((0.0, (" ".join(rest) + newline).encode()),))
+        if name == "printf" and len(rest) == 1:
+            return Script(((0.0, rest[0].replace("\\n", "\n").encode()),))
+        if name == "sleep" and len(rest) == 1:
+            return Script(duration=_seconds(rest[0]) * time_scale)
+        if name == "exit":
+            return Script(exit_code=int(rest[0]) if rest else 0)
+        if name in ("true", ":"):
+            return Script()
+        if name == "false":
+            return Script(exit_code=1)
+        if name == "timeout" and len(rest) > 1:
+            limit = _seconds(rest[0]) * time_scale
+            inner = _simulate(rest[1:], time_scale) or Script(duration=FOREVER)
+            if inner.duration <= limit:
+                return inner
+            output = tuple(item for item in inner.output if item[0] <= limit)
+            return Script(output, limit, 124)
+    except ValueError:
+        pass
+    return None
+
+
+@dataclass(frozen=True)
+class _Transition:
+    at: float
+    status: str
+    reason: str = ""
+    description: str = ""
+    exit_code: int | None = None
+
+
+@dataclass
+class FakeJob:
+    id: str
+    owner: str
+    payload: dict[str, Any]
+    script: Script
+    transitions: list[_Transition]
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def name(self) -> str | None:
+        return self.payload.get("name")
+
+    @property
+    def created(self) -> float:
+        return self.transitions[0].at
+
+    def state(self, now: float) -> _Transition:
+        current = self.transitions[0]
+        for transition in self.transitions:
+            if transition.at > now:
+                break
+            current = transition
+        return current
+
+    def started(self, now: float) -> float | None:
+        for transition in self.transitions:
+            if transition.at > now:
+                break
+            if transition.status == RUNNING:
+                return transition.at
+        return None
+
+    def finished(self, now: float) -> float | None:
+        state = self.state(now)
+        return state.at if state.status in TERMINAL else None
+
+    def next_change(self, now: float) -> float:
+        """
+        When the state or the output changes next if nobody kills the job.
+        """
+        times = [t.at for t in self.transitions if t.at > now]
+        started = self.started(now)
+        if started is not None:
+            times += [
+                started + offset
+                for offset, _ in self.script.output
+                if started + offset > now
+            ]
+        return min(times, default=FOREVER)
+
+    def output(self, now: float) -> list[tuple[float, bytes]]:
+        """
+        Printed chunks with the time they were printed at.
+        """
+        started = self.started(now)
+        if started is None:
+            return []
+        state = self.state(now)
+        if state.status in (SUCCEEDED, FAILED):
+            # Exited on its own, everything is printed
+            return [(started + offset, data) for offset, data in self.script.output]
+        elapsed = (state.at if state.status == CANCELLED else now) - started
+        return [
+            (started + offset, data)
+            for offset, data in self.script.output
+            if offset <= elapsed
+        ]
+
+    def kill(self, now: float, delay: float) -> None:
+        if self.state(now).status in TERMINAL:
+            return
+        self.transitions = [t for t in self.transitions if t.at <= now]
+        started = self.started(now) is not None
+        self.transitions.append(
+            _Transition(
+                now + delay,
+                CANCELLED,
+                exit_code=KILLED_EXIT_CODE if started else None,
+            )
+        )
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def wait(self, now: float, clock: Callable[[], float]) -> None:
+        """
+        Sleep until the next change of state or output, or a kill.
+        """
+        timeout = self.next_change(now) - clock()
+        if timeout <= 0:
+            return
+        changed = self.changed
+        try:
+            await asyncio.wait_for(
+                changed.wait(), None if timeout == FOREVER else timeout
+            )
+        except TimeoutError:
+            pass
+
+
+@dataclass
+class _Node:
+    mtime: int
+    data: bytearray | None = None
+
+    @property
+    def is_dir(self) -> bool:
+        return self.data is None
+
+
+class _Storage:
+    """
+    In-memory file tree with an index of children by directory.
+    """
+
+    def __init__(self) -> None:
+        now = int(time.time())
+        self._nodes: dict[str, _Node] = {"": _Node(now)}
+        self._children: dict[str, dict[str, None]] = {"": {}}
+
+    @staticmethod
+    def parent(path: str) -> str:
+        return path.rpartition("/")[0]
+
+    def get(self, path: str) -> _Node:
+        node = self._nodes.get(path)
+        if node is None:
+            raise _error(web.HTTPNotFound, f"No such file or directory: /{path}")
+        return node
+
+    def status(self, path: str, *, name: str | None = None) -> dict[str, Any]:
+        node = self.get(path)
+        return {
+            "path": f"/{path}" if name is None else name,
+            "type": "DIRECTORY" if node.is_dir else "FILE",
+            "length": 0 if node.data is None else len(node.data),
+            "modificationTime": node.mtime,
+            "permission": "manage",
+        }
+
+    def listdir(self, path: str) -> Iterator[dict[str, Any]]:
+        if not self.get(path).is_dir:
+            raise _error(web.HTTPBadRequest, f"Not a directory: /{path}", "ENOTDIR")
+        prefix = f"{path}/" if path else ""
+        for name in list(self._children[path]):
+            yield self.status(f"{prefix}{name}", name=name)
+
+    def mkdirs(self, path: str) -> None:
+        if not path:
+            return
+        node = self._nodes.get(path)
+        if node is not None:
+            if not node.is_dir:
+                raise _error(web.HTTPBadRequest, f"File exists: /{path}", "EEXIST")
+            return
+        self.mkdirs(self.parent(path))
+        if not self._nodes[self.parent(path)].is_dir:
+            raise _error(web.HTTPBadRequest, f"Not a directory: /{path}", "ENOTDIR")
+        self._add(path, _Node(int(time.time())))
+        self._children[path] = {}
+
+    def create(self, path: str, data: bytes) -> None:
+        node = self._nodes.get(path)
+        if node is not None and node.is_dir:
+            raise _error(web.HTTPBadRequest, f"Is a directory: /{path}", "EISDIR")
+        self.mkdirs(self.parent(path))
+        self._add(path, _Node(int(time.time()), bytearray(data)))
+
+    def write(self, path: str, offset: int, data: bytes) -> None:
+        node = self.get(path)
+        if node.data is None:
+            raise _error(web.HTTPBadRequest, f"Is a directory: /{path}", "EISDIR")
+        if len(node.data) < offset:
+            node.data.extend(bytes(offset - len(node.data)))
+        end = offset + len(data)
+        node.data[offset:end] = data
+        node.mtime = int(time.time())
+
+    def delete(self, path: str, *, recursive: bool) -> list[tuple[str, bool]]:
+        node = self.get(path)
+        if node.is_dir and not recursive:
+            raise _error(web.HTTPBadRequest, f"Is a directory: /{path}", "EISDIR")
+        if not path:
+            raise _error(web.HTTPBadRequest, "Cannot delete the root", "EPERM")
+        deleted: list[tuple[str, bool]] = []
+        self._delete(path, deleted)
+        del self._children[self.parent(path)][path.rpartition("/")[2]]
+        return deleted
+
+    def rename(self, src: str, dst: str) -> None:
+        node = self.get(src)
+        if dst in self._nodes:
+            raise _error(web.HTTPBadRequest, f"File exists: /{dst}", "EEXIST")
+        self.mkdirs(self.parent(dst))
+        moved: list[tuple[str, bool]] = []
+        self._delete(src, moved, keep=True)
+        del self._children[self.parent(src)][src.rpartition("/")[2]]
+        self._add(dst, node)
+        for old, _ in reversed(moved):
+            new = dst + old.removeprefix(src)
+            self._nodes[new] = self._nodes.pop(old)
+            if old in self._children:
+                self._children[new] = self._children.pop(old)
+
+    def _add(self, path: str, node: _Node) -> None:
+        self._nodes[path] = node
+        self._children[self.parent(path)][path.rpartition("/")[2]] = None
+
+    def _delete(
+        self, path: str, deleted: list[tuple[str, bool]], *, keep: bool = False
+    ) -> None:
+        # Iterative post-order walk, deep trees must not hit the recursion limit
+        stack = [(path, False)]
+        while stack:
+            current, expanded = stack.pop()
+            children = self._children.get(current)
+            if children is not None and not expanded:
+                stack.append((current, True))
+                stack += [(f"{current}/{name}", False) for name in children]
+                continue
+            node = self._nodes[current] if keep else self._nodes.pop(current)
+            if not keep:
+                self._children.pop(current, None)
+            deleted.append((current, node.is_dir))
+
+
+@dataclass
+class _Blob:
+    data: bytes
+    mtime: float
+
+    @property
+    def etag(self) -> str:
+        return f'"{hashlib.md5(self.data).hexdigest()}"'
+
+
+@dataclass
+class _Bucket:
+    id: str
+    name: str | None
+    owner: str
+    org_name: str
+    project_name: str
+    created_at: datetime
+    blobs: dict[str, _Blob] = field(default_factory=dict)
+    uploads: dict[str, dict[int, bytes]] = field(default_factory=dict)
+    _keys: list[str] | None = None
+
+    def keys(self) -> list[str]:
+        if self._keys is None:
+            self._keys = sorted(self.blobs)
+        return self._keys
+
+    def put(self, key: str, data: bytes) -> _Blob:
+        blob = self.blobs[key] = _Blob(data, time.time())
+        self._keys = None
+        return blob
+
+    def delete(self, key: str) -> None:
+        if self.blobs.pop(key, None) is not None:
+            self._keys = None
+
+    def payload(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "owner": self.owner,
+            "org_name": self.org_name,
+            "project_name": self.project_name,
+            "created_at": self.created_at.isoformat(),
+            "provider": "minio",
+            "imported": False,
+            "public": False,
+        }
+
+
+def _error(
+    cls: type[web.HTTPException], message: str, errno: str | None = None
+) -> web.HTTPException:
+    payload: dict[str, Any] = {"error": message}
+    if errno is not None:
+        payload["errno"] = errno
+    return cls(text=json.dumps(payload), content_type="application/json")
+
+
+def _iso(timestamp: float | None) -> str | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, UTC).isoformat()
+
+
+def _decode_aws_chunked(data: bytes) -> bytes:
+    # Streaming signed uploads frame the payload into signed chunks
+    result = bytearray()
+    pos = 0
+    while pos < len(data):
+        end = data.index(b"\r\n", pos)
+        size = int(data[pos:end].split(b";")[0], 16)
+        if size == 0:
+            break
+        start = end + 2
+        stop = start + size
+        result += data[start:stop]
+        pos = stop + 2
+    return bytes(result)
+
+
+def _s3_xml(root: str, body: str = "") -> web.Response:
+    text = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<{root} xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{body}</{root}>'
+    )
+    return web.Response(text=text, content_type="application/xml")
+
+
+def _s3_error(
+    cls: type[web.HTTPException], code: str, message: str
+) -> web.HTTPException:
+    return cls(
+        text=(
+            '<?xml version="1.0" encoding="UTF-8"?><Error>'
+            f"<Code>{code}</Code><Message>{escape(message)}</Message></Error>"
+        ),
+        content_type="application/xml",
+    )
+
+
+class FakePlatform:
+    """
+    In-process stand-in for the platform API, for offline harness runs.
+
+    Serves the config, jobs with log streaming and exec, storage, buckets
+    with a minimal S3 endpoint for their blobs, and the admin and auth calls
+    of the user bootstrap, all kept in memory. Job states are derived from
+    the clock when asked for, so thousands of simulated jobs cost nothing
+    between requests.
+    """
+
+    def __init__(
+        self,
+        *,
+        cluster_name: str = FAKE_CLUSTER,
+        org_name: str = FAKE_ORG,
+        delays: FakeDelays | None = None,
+        faults: FakeFaults | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self.cluster_name = cluster_name
+        self.org_name = org_name
+        self.delays = delays if delays is not None else FakeDelays()
+        self.faults = faults if faults is not None else FakeFaults()
+        # Requests served by route, to compare what harness features cost
+        self.requests: Counter[str] = Counter()
+        # Response bytes by route, to check that ranged reads stop at their end
+        self.sent: Counter[str] = Counter()
+        self._random = random.Random(seed)
+        self._users: dict[str, dict[str, Any]] = {}
+        self._cluster_users: dict[str, dict[str, Any]] = {}
+        self._projects: dict[tuple[str, str], dict[str, Any]] = {}
+        self._jobs: dict[str, FakeJob] = {}
+        self._storage = _Storage()
+        self._buckets: dict[str, _Bucket] = {}
+        self._runner: web.AppRunner | None = None
+        self._url: URL | None = None
+
+    @property
+    def url(self) -> URL:
+        if self._url is None:
+            raise RuntimeError("Fake platform is not started")
+        return self._url
+
+    @property
+    def api_url(self) -> URL:
+        return self.url / "api/v1"
+
+    @property
+    def admin_url(self) -> URL:
+        return self.url / "apis/admin/v1"
+
+    @property
+    def jobs(self) -> list[FakeJob]:
+        return list(self._jobs.values())
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> URL:
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        sockets = self._runner.addresses
+        self._url = URL.build(scheme="http", host=host, port=sockets[0][1])
+        log.info("Fake platform listens on %s", self._url)
+        return self._url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakePlatform":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.close()
+
+    def token(self, user_name: str) -> str:
+        return jwt.encode(
+            {USER_CLAIM: user_name, "identity": user_name},
+            FAKE_SIGNING_KEY,
+            algorithm="HS256",
+        )
+
+    def add_user(self, name: str, *, project: str | None = None) -> str:
+        """
+        Register a cluster user with a project, bypassing the admin API,
+        and return the user token.
+        """
+        self._users.setdefault(name, {"name": name, "email": f"{name}@fake"})
+        self._cluster_users.setdefault(name, {"user_name": name, "role": "user"})
+        project = project or f"{name}-default"
+        self._projects.setdefault(
+            (self.org_name, project), self._project(project, name)
+        )
+        return self.token(name)
+
+    def put_blob(self, bucket_name_or_id: str, key: str, data: bytes = b"") -> None:
+        """
+        Store a blob bypassing the API, to fill large buckets cheaply.
+        """
+        self._bucket(bucket_name_or_id).put(key, data)
+
+    def _app(self) -> web.Application:
+        app = web.Application(
+            middlewares=[self._chaos, self._auth], client_max_size=1024**3
+        )
+        api = "/api/v1"
+        admin = "/apis/admin/v1"
+        add = app.router.add_route
+        add("GET", f"{api}/config", self._config)
+        add("POST", f"{api}/users/{{name}}/token", self._user_token)
+        add("POST", f"{api}/jobs", self._run_job)
+        add("GET", f"{api}/jobs", self._list_jobs)
+        add("GET", f"{api}/jobs/{{id}}", self._job_status)
+        add("DELETE", f"{api}/jobs/{{id}}", self._kill_job)
+        add("GET", f"{api}/jobs/{{id}}/log_ws", self._job_logs)
+        add("GET", f"{api}/jobs/{{id}}/exec", self._job_exec)
+        add("*", f"{api}/storage/{{path:.*}}", self._storage_op)
+        add("GET", f"{api}/buckets", self._list_buckets)
+        add("POST", f"{api}/buckets", self._create_bucket)
+        add("GET", f"{api}/buckets/find/by_path", self._find_bucket)
+        add("GET", f"{api}/buckets/{{bucket}}", self._get_bucket)
+        add("DELETE", f"{api}/buckets/{{bucket}}", self._delete_bucket)
+        add("POST", f"{api}/buckets/{{bucket}}/make_tmp_credentials", self._creds)
+        add("POST", f"{admin}/users", self._create_user)
+        add("GET", f"{admin}/users/{{name}}", self._get_user)
+        add("POST", f"{admin}/clusters/{{cluster}}/users", self._create_cluster_user)
+        add("GET", f"{admin}/clusters/{{cluster}}/users/{{name}}", self._cluster_user)
+        for prefix in ("clusters/{cluster}", "clusters/{cluster}/orgs/{org}"):
+            add("POST", f"{admin}/{prefix}/projects", self._create_project)
+            add("GET", f"{admin}/{prefix}/projects/{{name}}", self._get_project)
+        add("*", "/s3/{bucket}", self._s3_bucket)
+        add("*", "/s3/{bucket}/{key:.+}", self._s3_object)
+        return app
+
+    # Middlewares
+
+    @web.middleware
+    async def _chaos(
+        self, request: web.Request, handler: Handler
+    ) -> web.StreamResponse:
+        route = request.match_info.route.resource
+        key = f"{request.method} {route.canonical if route else '?'}"
+        self.requests[key] += 1
+        if self.delays.request:
+            await asyncio.sleep(self.delays.request)
+        faults = self.faults
+        if (
+            faults.error_rate
+            and (not faults.routes or re.search(faults.routes, request.path))
+            and self._random.random() < faults.error_rate
+        ):
+            return web.json_response(
+                {"error": "Injected failure"}, status=faults.error_status
+            )
+        response = await handler(request)
+        self.sent[key] += response.content_length or 0
+        return response
+
+    @web.middleware
+    async def _auth(self, request: web.Request, handler: Handler) -> web.StreamResponse:
+        header = request.headers.get("Authorization", "")
+        if header.startswith("Bearer "):
+            try:
+                claims = jwt.decode(header[7:], FAKE_SIGNING_KEY, algorithms=["HS256"])
+            except Exception:
+                raise _error(web.HTTPUnauthorized, "Invalid token")
+            request["user"] = claims.get(USER_CLAIM) or claims["identity"]
+        # The bootstrap and S3 calls use service credentials
+        public = request.path.startswith(("/apis/admin/", "/s3/")) or (
+            request.path.endswith("/token") or request.path.endswith("/config")
+        )
+        if "user" not in request and not public:
+            raise _error(web.HTTPUnauthorized, "Not authenticated")
+        return await handler(request)
+
+    def _now(self) -> float:
+        return time.time()
+
+    def _user(self, request: web.Request) -> str:
+        return request["user"]
+
+    # Config and bootstrap
+
+    def _project(self, name: str, owner: str | None) -> dict[str, Any]:
+        return {
+            "name": name,
+            "cluster_name": self.cluster_name,
+            "org_name": self.org_name,
+            "is_default": False,
+            "default_role": "writer",
+            "owner": owner,
+        }
+
+    async def _config(self, request: web.Request) -> web.Response:
+        url = self.url
+        payload: dict[str, Any] = {
+            "auth_url": str(url / "authorize"),
+            "token_url": str(url / "oauth/token"),
+            "logout_url": str(url / "v2/logout"),
+            "client_id": "fake",
+            "audience": str(url),
+            "headless_callback_url": str(url / "oauth/show-code"),
+            "admin_url": str(self.admin_url),
+        }
+        user = request.get("user")
+        if user in self._cluster_users:
+            payload["authorized"] = True
+            payload["clusters"] = [self._cluster_config()]
+            payload["projects"] = [
+                {
+                    "name": project["name"],
+                    "cluster_name": self.cluster_name,
+                    "org_name": project["org_name"],
+                    "role": "admin" if project["owner"] == user else "writer",
+                }
+                for project in self._projects.values()
+            ]
+        elif user is not None:
+            payload["authorized"] = True
+        return web.json_response(payload)
+
+    def _cluster_config(self) -> dict[str, Any]:
+        api = self.api_url
+        return {
+            "name": self.cluster_name,
+            "orgs": [self.org_name],
+            "registry_url": str(self.url / "registry"),
+            "storage_url": str(api / "storage"),
+            "users_url": str(api),
+            "monitoring_url": str(api / "jobs"),
+            "secrets_url": str(api / "secrets"),
+            "disks_url": str(api / "disk"),
+            "buckets_url": str(api),
+            "resource_pool_types": [
+                {
+                    "name": "cpu",
+                    "min_size": 0,
+                    "max_size": 1000,
+                    "cpu": 64.0,
+                    "memory": 256 * 2**30,
+                    "disk_size": 2**40,
+                }
+            ],
+            "resource_presets": [
+                {
+                    "name": "cpu-small",
+                    "credits_per_hour": "0",
+                    "cpu": 0.1,
+                    "memory": 128 * 10**6,
+                    "resource_pool_names": ["cpu"],
+                }
+            ],
+        }
+
+    async def _user_token(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name not in self._users:
+            raise _error(web.HTTPNotFound, f"User {name} not found")
+        return web.json_response({"access_token": self.token(name)})
+
+    async def _create_user(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        name = payload["name"]
+        if name in self._users:
+            raise _error(web.HTTPBadRequest, f"User {name} already exists")
+        user = self._users[name] = {"name": name, "email": payload["email"]}
+        return web.json_response(user, status=201)
+
+    async def _get_user(self, request: web.Request) -> web.Response:
+        user = self._users.get(request.match_info["name"])
+        if user is None:
+            raise _error(web.HTTPNotFound, "User not found")
+        return web.json_response(user)
+
+    def _check_cluster(self, request: web.Request) -> None:
+        if request.match_info["cluster"] != self.cluster_name:
+            raise _error(web.HTTPNotFound, "Cluster not found")
+
+    async def _create_cluster_user(self, request: web.Request) -> web.Response:
+        self._check_cluster(request)
+        payload = await request.json()
+        name = payload["user_name"]
+        if name not in self._users:
+            raise _error(web.HTTPBadRequest, f"User {name} not found")
+        if name in self._cluster_users:
+            raise _error(web.HTTPBadRequest, f"Cluster user {name} already exists")
+        user = {"user_name": name, "role": payload["role"]}
+        self._cluster_users[name] = user
+        return web.json_response(user, status=201)
+
+    async def _cluster_user(self, request: web.Request) -> web.Response:
+        self._check_cluster(request)
+        user = self._cluster_users.get(request.match_info["name"])
+        if user is None:
+            raise _error(web.HTTPNotFound, "Cluster user not found")
+        return web.json_response(user)
+
+    async def _create_project(self, request: web.Request) -> web.Response:
+        self._check_cluster(request)
+        payload = await request.json()
+        # Projects without an org land in the single org of the fake
+        key = (request.match_info.get("org", self.org_name), payload["name"])
+        if key in self._projects:
+            raise _error(web.HTTPBadRequest, f"Project {key[1]} already exists")
+        project = self._project(payload["name"], request.get("user"))
+        project["org_name"] = key[0]
+        project["is_default"] = payload.get("is_default", False)
+        project["default_role"] = payload.get("default_role", "writer")
+        self._projects[key] = project
+        return web.json_response(project, status=201)
+
+    async def _get_project(self, request: web.Request) -> web.Response:
+        self._check_cluster(request)
+        key = (request.match_info.get("org", self.org_name), request.match_info["name"])
+        project = self._projects.get(key)
+        if project is None:
+            raise _error(web.HTTPNotFound, "Project not found")
+        return web.json_response(project)
+
+    # Jobs
+
+    def _plan(self, payload: dict[str, Any]) -> tuple[Script, list[_Transition]]:
+        delays = self.delays
+        script = parse_script(
+            payload["container"].get("command"), time_scale=delays.time_scale
+        )
+        now = self._now()
+        transitions = [
+            _Transition(now, PENDING, "Creating"),
+            _Transition(now, PENDING, "Scheduling"),
+        ]
+        roll = self._random.random()
+        if roll < self.faults.unschedulable_rate:
+            timeout = payload.get("schedule_timeout") or delays.scheduling
+            transitions.append(
+                _Transition(
+                    now + timeout,
+                    FAILED,
+                    UNSCHEDULABLE_REASON,
+                    "Cluster doesn't have resources to fulfill request.",
+                )
+            )
+            return script, transitions
+        at = now + delays.scheduling
+        transitions.append(_Transition(at, PENDING, "PullingImage"))
+        at += delays.pulling
+        transitions.append(_Transition(at, PENDING, "ContainerCreating"))
+        at += delays.creating
+        if roll < self.faults.unschedulable_rate + self.faults.failure_rate:
+            transitions.append(
+                _Transition(at, FAILED, CANNOT_RUN_REASON, exit_code=128)
+            )
+            return script, transitions
+        transitions.append(_Transition(at, RUNNING))
+        if script.finite:
+            at += script.duration + delays.run
+            if script.exit_code:
+                transitions.append(
+                    _Transition(at, FAILED, "Error", exit_code=script.exit_code)
+                )
+            else:
+                transitions.append(_Transition(at, SUCCEEDED, exit_code=0))
+        return script, transitions
+
+    def _job_payload(self, job: FakeJob, now: float) -> dict[str, Any]:
+        state = job.state(now)
+        payload = job.payload
+        org_name = payload.get("org_name") or self.org_name
+        project_name = payload.get("project_name") or job.owner
+        container = payload["container"]
+        result: dict[str, Any] = {
+            "id": job.id,
+            "owner": job.owner,
+            "cluster_name": self.cluster_name,
+            "org_name": org_name,
+            "project_name": project_name,
+            "namespace": "",
+            "status": state.status,
+            "statuses": [
+                {
+                    "status": t.status,
+                    "transition_time": _iso(t.at),
+                    "reason": t.reason,
+                    "description": t.description,
+                    "exit_code": t.exit_code,
+                }
+                for t in job.transitions
+                if t.at <= now
+            ],
+            "history": {
+                "status": state.status,
+                "reason": state.reason,
+                "description": state.description,
+                "created_at": _iso(job.created),
+                "started_at": _iso(job.started(now)),
+                "finished_at": _iso(job.finished(now)),
+                "exit_code": state.exit_code,
+                "restarts": 0,
+            },
+            "container": container,
+            "scheduler_enabled": payload.get("scheduler_enabled", False),
+            "pass_config": payload.get("pass_config", False),
+            "uri": f"job://{self.cluster_name}/{org_name}/{project_name}/{job.id}",
+            "total_price_credits": "0",
+            "price_credits_per_hour": "0",
+            "internal_hostname": f"{job.id}.platform-jobs",
+            "tags": payload.get("tags", []),
+        }
+        for key in ("name", "description", "schedule_timeout"):
+            if payload.get(key) is not None:
+                result[key] = payload[key]
+        if job.name:
+            result["internal_hostname_named"] = f"{job.name}--{job.owner}.platform-jobs"
+        if "http" in container:
+            host = job.name or job.id
+            result["http_url"] = f"http://{host}--{job.owner}.jobs.fake"
+        return result
+
+    def _job(self, request: web.Request) -> FakeJob:
+        job = self._jobs.get(request.match_info["id"])
+        if job is None:
+            raise _error(web.HTTPNotFound, "no such job")
+        return job
+
+    async def _run_job(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        owner = self._user(request)
+        now = self._now()
+        name = payload.get("name")
+        if name:
+            for other in self._jobs.values():
+                if (
+                    other.name == name
+                    and other.owner == owner
+                    and other.state(now).status not in TERMINAL
+                ):
+                    raise _error(
+                        web.HTTPBadRequest,
+                        f"job with name '{name}' and owner '{owner}' "
+                        f"already exists: '{other.id}'",
+                    )
+        script, transitions = self._plan(payload)
+        job = FakeJob(f"job-{uuid4()}", owner, payload, script, transitions)
+        self._jobs[job.id] = job
+        return web.json_response(self._job_payload(job, now), status=202)
+
+    async def _job_status(self, request: web.Request) -> web.Response:
+        return web.json_response(self._job_payload(self._job(request), self._now()))
+
+    async def _list_jobs(self, request: web.Request) -> web.StreamResponse:
+        query = request.query
+        statuses = set(query.getall("status", []))
+        tags = set(query.getall("tag", []))
+        owners = set(query.getall("owner", []))
+        projects = set(query.getall("project_name", []))
+        name = query.get("name")
+        since = datetime.fromisoformat(query["since"]) if "since" in query else None
+        until = datetime.fromisoformat(query["until"]) if "until" in query else None
+        limit = int(query.get("limit", 0)) or None
+        now = self._now()
+        jobs = sorted(self._jobs.values(), key=lambda job: job.created)
+        if "reverse" in query:
+            jobs.reverse()
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        count = 0
+        for job in jobs:
+            payload = job.payload
+            created = datetime.fromtimestamp(job.created, UTC)
+            if (
+                (statuses and job.state(now).status not in statuses)
+                or not tags <= set(payload.get("tags", []))
+                or (owners and job.owner not in owners)
+                or (projects and payload.get("project_name") not in projects)
+                or (name and job.name != name)
+                or (since and created < since)
+                or (until and created > until)
+            ):
+                continue
+            line = json.dumps(self._job_payload(job, now)) + "\n"
+            await response.write(line.encode())
+            count += 1
+            if count == limit:
+                break
+        await response.write_eof()
+        return response
+
+    async def _kill_job(self, request: web.Request) -> web.Response:
+        self._job(request).kill(self._now(), self.delays.killing)
+        return web.Response(status=204)
+
+    async def _job_logs(self, request: web.Request) -> web.WebSocketResponse:
+        job = self._job(request)
+        query = request.query
+        since = datetime.fromisoformat(query["since"]) if "since" in query else None
+        timestamps = query.get("timestamps") == "true"
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        closing = asyncio.ensure_future(ws.receive())
+        lifetime = self.faults.log_stream_lifetime
+        if lifetime:
+            asyncio.get_running_loop().call_later(lifetime, closing.cancel)
+        sent = 0
+        try:
+            while True:
+                now = self._now()
+                chunks = job.output(now)
+                for at, chunk in chunks[sent:]:
+                    printed = datetime.fromtimestamp(at, UTC)
+                    # Resumed streams include the since timestamp
+                    if since is not None and printed < since:
+                        continue
+                    if timestamps:
+                        prefix = printed.strftime("%Y-%m-%dT%H:%M:%S.%fZ ").encode()
+                        lines = chunk.splitlines(keepends=True)
+                        chunk = b"".join(prefix + line for line in lines)
+                    await ws.send_bytes(chunk)
+                sent = len(chunks)
+                if job.finished(now) is not None:
+                    break
+                if not await self._wait_job(job, now, closing):
+                    break
+        finally:
+            closing.cancel()
+        await ws.close()
+        return ws
+
+    async def _wait_job(
+        self, job: FakeJob, now: float, closing: "asyncio.Future[Any]"
+    ) -> bool:
+        """
+        Wait for the next change of job, False if the client went away.
+        """
+        waiter = asyncio.ensure_future(job.wait(now, self._now))
+        await asyncio.wait([waiter, closing], return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        return not closing.done()
+
+    async def _job_exec(self, request: web.Request) -> web.WebSocketResponse:
+        job = self._job(request)
+        if job.state(self._now()).status != RUNNING:
+            raise _error(web.HTTPBadRequest, f"Job {job.id} is not running")
+        script = parse_script(
+            request.query.get("cmd"), time_scale=self.delays.time_scale
+        )
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        started = self._now()
+        for offset, data in script.output:
+            await asyncio.sleep(max(started + offset - self._now(), 0))
+            await ws.send_bytes(b"\x01" + data)
+        exit_code = script.exit_code
+        if script.finite:
+            await asyncio.sleep(max(started + script.duration - self._now(), 0))
+        else:
+            # Runs as long as the job does
+            closing = asyncio.ensure_future(ws.receive())
+            try:
+                while job.finished(now := self._now()) is None:
+                    if not await self._wait_job(job, now, closing):
+                        return ws
+            finally:
+                closing.cancel()
+            exit_code = KILLED_EXIT_CODE
+        await ws.send_bytes(b"\x03" + json.dumps({"exit_code": exit_code}).encode())
+        await ws.close()
+        return ws
+
+    # Storage
+
+    async def _storage_op(self, request: web.Request) -> web.StreamResponse:
+        path = request.match_info["path"].strip("/")
+        op = request.query.get("op", "")
+        storage = self._storage
+        if request.method == "GET" and op == "GETFILESTATUS":
+            return web.json_response({"FileStatus": storage.status(path)})
+        if request.method == "GET" and op == "LISTSTATUS":
+            return await self._ndjson(
+                request, ({"FileStatus": status} for status in storage.listdir(path))
+            )
+        if request.method == "GET" and op == "OPEN":
+            return await self._storage_open(request, path)
+        if request.method == "PUT" and op == "MKDIRS":
+            storage.mkdirs(path)
+            return web.Response(status=201)
+        if request.method == "PUT" and op == "CREATE":
+            storage.create(path, await request.read())
+            return web.Response(status=201)
+        if request.method == "PATCH" and op == "WRITE":
+            match = re.match(r"bytes (\d+)-", request.headers["Content-Range"])
+            if match is None:
+                raise _error(web.HTTPBadRequest, "Invalid Content-Range")
+            storage.write(path, int(match.group(1)), await request.read())
+            return web.Response()
+        if request.method == "DELETE" and op == "DELETE":
+            recursive = request.query.get("recursive") == "true"
+            deleted = storage.delete(path, recursive=recursive)
+            return await self._ndjson(
+                request,
+                ({"path": f"/{item}", "is_dir": is_dir} for item, is_dir in deleted),
+            )
+        if request.method == "POST" and op == "RENAME":
+            storage.rename(path, request.query["destination"].strip("/"))
+            return web.Response(status=204)
+        raise _error(web.HTTPBadRequest, f"Unsupported operation {op}")
+
+    async def _storage_open(
+        self, request: web.Request, path: str
+    ) -> web.StreamResponse:
+        data = self._storage.get(path).data
+        if data is None:
+            raise _error(web.HTTPBadRequest, f"Is a directory: /{path}", "EISDIR")
+        start, end, status = 0, len(data), 200
+        match = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+        headers = {"Content-Type": "application/octet-stream"}
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) + 1 if match.group(2) else end, end)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(data)}"
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = max(end - start, 0)
+        await response.prepare(request)
+        view = memoryview(data)
+        for pos in range(start, end, STREAM_CHUNK_SIZE):
+            stop = min(pos + STREAM_CHUNK_SIZE, end)
+            await response.write(view[pos:stop])
+        await response.write_eof()
+        return response
+
+    async def _ndjson(
+        self, request: web.Request, items: Iterator[dict[str, Any]]
+    ) -> web.StreamResponse:
+        # Items are produced before the response starts, so errors stay HTTP
+        lines = [json.dumps(item) + "\n" for item in items]
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        await response.write("".join(lines).encode())
+        await response.write_eof()
+        return response
+
+    # Buckets
+
+    def _bucket(self, id_or_name: str, project: str | None = None) -> _Bucket:
+        bucket = self._buckets.get(id_or_name)
+        if bucket is not None:
+            return bucket
+        for bucket in self._buckets.values():
+            if bucket.name == id_or_name and project in (None, bucket.project_name):
+                return bucket
+        raise _error(web.HTTPNotFound, f"Bucket {id_or_name} not found")
+
+    def _request_bucket(self, request: web.Request) -> _Bucket:
+        return self._bucket(
+            request.match_info["bucket"], request.query.get("project_name")
+        )
+
+    async def _list_buckets(self, request: web.Request) -> web.StreamResponse:
+        project = request.query.get("project_name")
+        return await self._ndjson(
+            request,
+            (
+                bucket.payload()
+                for bucket in self._buckets.values()
+                if project in (None, bucket.project_name)
+            ),
+        )
+
+    async def _create_bucket(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        name = payload.get("name")
+        project = payload["project_name"]
+        if name and any(
+            b.name == name and b.project_name == project for b in self._buckets.values()
+        ):
+            raise _error(web.HTTPBadRequest, f"Bucket {name} already exists")
+        bucket = _Bucket(
+            id=f"bucket-{uuid4()}",
+            name=name,
+            owner=self._user(request),
+            org_name=payload.get("org_name") or self.org_name,
+            project_name=project,
+            created_at=datetime.now(UTC),
+        )
+        self._buckets[bucket.id] = bucket
+        return web.json_response(bucket.payload(), status=201)
+
+    async def _find_bucket(self, request: web.Request) -> web.Response:
+        path = request.query["path"].strip("/")
+        for bucket in self._buckets.values():
+            for ref in filter(None, (bucket.name, bucket.id)):
+                prefix = f"{bucket.org_name}/{bucket.project_name}/{ref}"
+                if path == prefix or path.startswith(f"{prefix}/"):
+                    return web.json_response(bucket.payload())
+        raise _error(web.HTTPNotFound, f"No bucket for {path}")
+
+    async def _get_bucket(self, request: web.Request) -> web.Response:
+        bucket = self._request_bucket(request)
+        return web.json_response(bucket.payload())
+
+    async def _delete_bucket(self, request: web.Request) -> web.Response:
+        bucket = self._request_bucket(request)
+        del self._buckets[bucket.id]
+        return web.Response(status=204)
+
+    async def _creds(self, request: web.Request) -> web.Response:
+        bucket = self._request_bucket(request)
+        return web.json_response(
+            {
+                "bucket_id": bucket.id,
+                "provider": "minio",
+                "credentials": {
+                    "bucket_name": bucket.id,
+                    "endpoint_url": str(self.url / "s3"),
+                    "region_name": "us-east-1",
+                    "access_key_id": "fake",
+                    "secret_access_key": "fake",
+                },
+            }
+        )
+
+    # S3 subset used by the SDK blob calls and the bucket cleaner
+
+    def _s3_bucket_of(self, request: web.Request) -> _Bucket:
+        bucket = self._buckets.get(request.match_info["bucket"])
+        if bucket is None:
+            raise _s3_error(web.HTTPNotFound, "NoSuchBucket", "No such bucket")
+        return bucket
+
+    async def _s3_body(self, request: web.Request) -> bytes:
+        data = await request.read()
+        sha = request.headers.get("x-amz-content-sha256", "")
+        if sha.startswith("STREAMING-") or "aws-chunked" in request.headers.get(
+            "Content-Encoding", ""
+        ):
+            data = _decode_aws_chunked(data)
+        return data
+
+    async def _s3_bucket(self, request: web.Request) -> web.StreamResponse:
+        bucket = self._s3_bucket_of(request)
+        if request.method == "GET":
+            return self._s3_list(bucket, request.query)
+        if request.method == "POST" and "delete" in request.query:
+            root = ET.fromstring(await self._s3_body(request))
+            deleted = []
+            for key in root.iter():
+                if key.tag.rpartition("}")[2] == "Key" and key.text is not None:
+                    bucket.delete(key.text)
+                    deleted.append(f"<Deleted><Key>{escape(key.text)}</Key></Deleted>")
+            return _s3_xml("DeleteResult", "".join(deleted))
+        if request.method == "HEAD":
+            return web.Response()
+        raise _s3_error(web.HTTPBadRequest, "NotImplemented", "Unsupported request")
+
+    def _s3_list(self, bucket: _Bucket, query: Any) -> web.Response:
+        prefix = query.get("prefix", "")
+        delimiter = query.get("delimiter", "")
+        start = query.get("continuation-token") or query.get("start-after", "")
+        max_keys = int(query.get("max-keys", S3_PAGE_SIZE))
+        keys = bucket.keys()
+        index = bisect_right(keys, start) if start else bisect_left(keys, prefix)
+        contents: list[str] = []
+        prefixes: list[str] = []
+        last = ""
+        truncated = False
+        while index < len(keys) and keys[index].startswith(prefix):
+            if len(contents) + len(prefixes) == max_keys:
+                truncated = True
+                break
+            key = keys[index]
+            cut = key.find(delimiter, len(prefix)) if delimiter else -1
+            if cut >= 0:
+                common = key[: cut + len(delimiter)]
+                prefixes.append(f"<CommonPrefixes><Prefix>{escape(common)}</Prefix>")
+                prefixes[-1] += "</CommonPrefixes>"
+                # Skip the rest of the common prefix, continue after it
+                last = common + "\U0010ffff"
+                index = bisect_right(keys, last)
+                continue
+            blob = bucket.blobs[key]
+            contents.append(
+                f"<Contents><Key>{escape(key)}</Key>"
+                f"<LastModified>{_iso_z(blob.mtime)}</LastModified>"
+                f"<ETag>{escape(blob.etag)}</ETag><Size>{len(blob.data)}</Size>"
+                "<StorageClass>STANDARD</StorageClass></Contents>"
+            )
+            last = key
+            index += 1
+        body = (
+            f"<Name>{bucket.id}</Name><Prefix>{escape(prefix)}</Prefix>"
+            f"<KeyCount>{len(contents) + len(prefixes)}</KeyCount>"
+            f"<MaxKeys>{max_keys}</MaxKeys>"
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+        )
+        if delimiter:
+            body += f"<Delimiter>{escape(delimiter)}</Delimiter>"
+        if truncated:
+            token = escape(last)
+            body += f"<NextContinuationToken>{token}</NextContinuationToken>"
+        return _s3_xml("ListBucketResult", body + "".join(contents + prefixes))
+
+    async def _s3_object(self, request: web.Request) -> web.StreamResponse:
+        bucket = self._s3_bucket_of(request)
+        key = request.match_info["key"]
+        query = request.query
+        if "uploadId" in query:
+            return await self._s3_multipart(request, bucket, key)
+        if request.method == "POST" and "uploads" in query:
+            upload_id = uuid4().hex
+            bucket.uploads[upload_id] = {}
+            return _s3_xml(
+                "InitiateMultipartUploadResult",
+                f"<Bucket>{bucket.id}</Bucket><Key>{escape(key)}</Key>"
+                f"<UploadId>{upload_id}</UploadId>",
+            )
+        if request.method == "PUT":
+            put = bucket.put(key, await self._s3_body(request))
+            return web.Response(headers={"ETag": put.etag})
+        if request.method == "DELETE":
+            bucket.delete(key)
+            return web.Response(status=204)
+        blob = bucket.blobs.get(key)
+        if blob is None:
+            if request.method == "HEAD":
+                return web.Response(status=404)
+            raise _s3_error(web.HTTPNotFound, "NoSuchKey", "No such key")
+        headers = {
+            "ETag": blob.etag,
+            "Last-Modified": formatdate(blob.mtime, usegmt=True),
+            "Content-Type": "application/octet-stream",
+        }
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(blob.data))
+            return web.Response(headers=headers)
+        data = blob.data
+        match = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else len(data)
+            end = min(end, len(data))
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(data)}"
+            return web.Response(body=data[start:end], status=206, headers=headers)
+        return web.Response(body=data, headers=headers)
+
+    async def _s3_multipart(
+        self, request: web.Request, bucket: _Bucket, key: str
+    ) -> web.StreamResponse:
+        parts = bucket.uploads.get(request.query["uploadId"])
+        if parts is None:
+            raise _s3_error(web.HTTPNotFound, "NoSuchUpload", "No such upload")
+        if request.method == "PUT":
+            data = await self._s3_body(request)
+            parts[int(request.query["partNumber"])] = data
+            return web.Response(headers={"ETag": _Blob(data, 0).etag})
+        del bucket.uploads[request.query["uploadId"]]
+        if request.method == "DELETE":
+            return web.Response(status=204)
+        blob = bucket.put(key, b"".join(parts[number] for number in sorted(parts)))
+        return _s3_xml(
+            "CompleteMultipartUploadResult",
+            f"<Bucket>{bucket.id}</Bucket><Key>{escape(key)}</Key>"
+            f"<ETag>{escape(blob.etag)}</ETag>",
+        )
+
+
+def _iso_z(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, UTC).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    fake = FakePlatform(
+        cluster_name=args.cluster,
+        delays=FakeDelays(
+            scheduling=args.scheduling, pulling=args.pulling, creating=args.creating
+        ),
+        faults=FakeFaults(error_rate=args.error_rate),
+    )
+    url = await fake.start(args.host, args.port)
+    token = fake.add_user(args.user)
+    print(f"CLIENT_TEST_E2E_URI={url}")
+    print(f"CLUSTER_NAME={fake.cluster_name}")
+    print(f"CLIENT_TEST_E2E_USER_TOKEN={token}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake platform API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cluster", default=FAKE_CLUSTER)
+    parser.add_argument("--user", default="e2e-user")
+    parser.add_argument("--scheduling", type=float, default=1.0)
+    parser.add_argument("--pulling", type=float, default=1.0)
+    parser.add_argument("--creating", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+from yarl import URL
+
+log = logging.getLogger(__name__)
+
+
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 10
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    deadline: float = 60.0
+    retry_statuses: frozenset[int] = RETRY_STATUSES
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, capped exponential backoff]
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+# Ingress answers 404 until the route of a just started job is set up
+INGRESS_RETRY = RetryPolicy(retry_statuses=RETRY_STATUSES | {404})
+
+
+@dataclass(frozen=True)
+class HTTPTimings:
+    """
+    Request phases in seconds.
+
+    connect covers TCP and TLS handshakes together and is None when a pooled
+    connection was reused. ttfb is measured up to received response headers.
+    """
+
+    total: float
+    ttfb: float | None = None
+    dns: float | None = None
+    connect: float | None = None
+
+
+@dataclass(frozen=True)
+class HTTPProbe:
+    url: URL
+    status: int
+    body: str
+    timings: HTTPTimings
+    attempts: int
+    history: list[HTTPTimings] = field(default_factory=list)
+
+
+class HTTPClient:
+    """
+    Pooled keep-alive HTTP session with retries and per-request timings.
+    """
+
+    def __init__(self, *, limit: int = 100, dns_ttl: int = 300) -> None:
+        self._limit = limit
+        self._dns_ttl = dns_ttl
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_dns_resolvehost_start.append(_on_dns_start)
+            trace_config.on_dns_resolvehost_end.append(_on_dns_end)
+            trace_config.on_connection_create_start.append(_on_connect_start)
+            trace_config.on_connection_create_end.append(_on_connect_end)
+            trace_config.on_request_end.append(_on_request_end)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._limit, ttl_dns_cache=self._dns_ttl
+                ),
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get(
+        self, url: URL | str, *, policy: RetryPolicy | None = None
+    ) -> HTTPProbe:
+        """
+        GET url until it answers 200 or the policy gives up.
+        """
+        url = URL(url)
+        if policy is None:
+            policy = RetryPolicy()
+        deadline = time.monotonic() + policy.deadline
+        history: list[HTTPTimings] = []
+        attempt = 0
+        while True:
+            log.info("Probe %s", url)
+            ctx = SimpleNamespace(started=time.monotonic())
+            status: int | None = None
+            error: Exception | None = None
+            # No attempt may outlive the deadline of the whole probe
+            timeout = aiohttp.ClientTimeout(total=max(deadline - ctx.started, 0.1))
+            try:
+                async with self.session.get(
+                    url, timeout=timeout, trace_request_ctx=ctx
+                ) as resp:
+                    body = await resp.text()
+                    status = resp.status
+                    request_info = resp.request_info
+            except (aiohttp.ClientConnectionError, TimeoutError) as exc:
+                error = exc
+            timings = HTTPTimings(
+                total=time.monotonic() - ctx.started,
+                ttfb=getattr(ctx, "ttfb", None),
+                dns=getattr(ctx, "dns", None),
+                connect=getattr(ctx, "connect", None),
+            )
+            history.append(timings)
+            attempt += 1
+            log.info("Probe %s: %s, %s", url, status or error, timings)
+            if status == 200:
+                return HTTPProbe(url, status, body, timings, attempt, history)
+            retryable = error is not None or status in policy.retry_statuses
+            delay = policy.delay(attempt)
+            if (
+                not retryable
+                or attempt >= policy.attempts
+                or time.monotonic() + delay > deadline
+            ):
+                break
+            await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        assert status is not None
+        raise aiohttp.ClientResponseError(
+            status=status,
+            message=f"Server return {status}",
+            history=tuple(),
+            request_info=request_info,
+        )
+
+
+async def _on_dns_start(
+    session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+) -> None:
+    ctx.dns_started = time.monotonic()
+
+
+async def _on_dns_end(
+    session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+) -> None:
+    ctx.trace_request_ctx.dns = time.monotonic() - ctx.dns_started
+
+
+async def _on_connect_start(
+    session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+) -> None:
+    ctx.connect_started = time.monotonic()
+
+
+async def _on_connect_end(
+    session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+) -> None:
+    ctx.trace_request_ctx.connect = time.monotonic() - ctx.connect_started
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+) -> None:
+    ctx.trace_request_ctx.ttfb = time.monotonic() - ctx.trace_request_ctx.started
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import secrets
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from apolo_sdk import JobStatus, Resources
+
+from .bench import BenchmarkResult, percentile
+from .reaper import reap_jobs
+
+if TYPE_CHECKING:
+    from . import Helper
+
+log = logging.getLogger(__name__)
+
+LOAD_IMAGE = "ghcr.io/neuro-inc/alpine:latest"
+# Jobs keep their resources until reaped, so load accumulates over the ramp
+LOAD_COMMAND = "sleep 3600"
+LOAD_SCHEDULE_TIMEOUT = 120
+LOAD_RUNNING_TIMEOUT = 600
+LOAD_SUBMIT_CONCURRENCY = 32
+LOAD_DEFAULT_PROFILES = ("burst:10", "rate:0.5:60", "step:0.1:0.2:30:5")
+
+UNSCHEDULABLE_REASON = "Job cannot be scheduled"
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    """
+    Submission offsets in seconds from the start of a load run.
+    """
+
+    name: str
+    offsets: tuple[float, ...]
+
+    @classmethod
+    def burst(cls, count: int) -> "LoadProfile":
+        return cls(f"burst:{count}", (0.0,) * count)
+
+    @classmethod
+    def rate(cls, rate: float, duration: float) -> "LoadProfile":
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive: {rate}")
+        count = int(rate * duration)
+        return cls(f"rate:{rate:g}:{duration:g}", tuple(i / rate for i in range(count)))
+
+    @classmethod
+    def step(
+        cls, start: float, step: float, step_duration: float, steps: int
+    ) -> "LoadProfile":
+        if start <= 0 or step < 0:
+            raise ValueError(f"Invalid ramp from {start} by {step}")
+        offsets: list[float] = []
+        for k in range(steps):
+            rate = start + k * step
+            begin = k * step_duration
+            count = int(rate * step_duration)
+            offsets += [begin + i / rate for i in range(count)]
+        return cls(f"step:{start:g}:{step:g}:{step_duration:g}:{steps}", tuple(offsets))
+
+    @classmethod
+    def parse(cls, spec: str) -> "LoadProfile":
+        """
+        Parse burst:COUNT, rate:PER_SECOND:SECONDS or
+        step:START_RATE:RATE_STEP:STEP_SECONDS:STEPS.
+        """
+        kind, *args = spec.split(":")
+        try:
+            if kind == "burst" and len(args) == 1:
+                return cls.burst(int(args[0]))
+            if kind == "rate" and len(args) == 2:
+                return cls.rate(float(args[0]), float(args[1]))
+            if kind == "step" and len(args) == 4:
+                return cls.step(
+                    float(args[0]), float(args[1]), float(args[2]), int(args[3])
+                )
+        except ValueError as exc:
+            raise ValueError(f"Invalid load profile {spec!r}: {exc}")
+        raise ValueError(f"Invalid load profile {spec!r}")
+
+    @property
+    def duration(self) -> float:
+        return max(self.offsets, default=0.0)
+
+
+@dataclass
+class LoadResult:
+    profile: str
+    elapsed: float = 0.0
+    submitted: int = 0
+    running: int = 0
+    unschedulable: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    submit_errors: int = 0
+    reaped: int = 0
+    peak_pending: int = 0
+    time_to_running: list[float] = field(default_factory=list)
+    platform_pending: list[float] = field(default_factory=list)
+    submit_lag: list[float] = field(default_factory=list)
+    # (submit offset, outcome, time to running) per job, to plot saturation
+    samples: list[tuple[float, str, float | None]] = field(default_factory=list)
+
+    def as_benchmark(self) -> BenchmarkResult:
+        extra: dict[str, Any] = {
+            name: getattr(self, name)
+            for name in (
+                "submitted",
+                "running",
+                "unschedulable",
+                "failed",
+                "timed_out",
+                "submit_errors",
+                "reaped",
+                "peak_pending",
+            )
+        }
+        extra["max_submit_lag"] = max(self.submit_lag, default=0.0)
+        extra["platform_pending_p95"] = (
+            percentile(self.platform_pending, 95) if self.platform_pending else None
+        )
+        extra["samples"] = self.samples
+        return BenchmarkResult(
+            "jobs.scheduling",
+            {"profile": self.profile, "jobs": self.submitted + self.submit_errors},
+            elapsed=self.elapsed,
+            latencies=self.time_to_running,
+            extra=extra,
+        )
+
+
+async def run_load(
+    helper: "Helper",
+    profile: LoadProfile,
+    *,
+    image: str = LOAD_IMAGE,
+    command: str = LOAD_COMMAND,
+    resources: Resources | None = None,
+    schedule_timeout: float | None = LOAD_SCHEDULE_TIMEOUT,
+    running_timeout: float = LOAD_RUNNING_TIMEOUT,
+    concurrency: int = LOAD_SUBMIT_CONCURRENCY,
+) -> LoadResult:
+    """
+    Submit jobs following profile and measure how fast they start running.
+
+    Every job gets a tag unique to the run; all of them are killed at the
+    end, including jobs whose submission was interrupted.
+    """
+    tag = f"e2e-load-{secrets.token_hex(6)}"
+    result = LoadResult(profile.name)
+    sem = asyncio.Semaphore(concurrency)
+    pending = 0
+    started_at = time.monotonic()
+
+    async def _one(offset: float) -> None:
+        nonlocal pending
+        await asyncio.sleep(max(started_at + offset - time.monotonic(), 0))
+        async with sem:
+            result.submit_lag.append(time.monotonic() - started_at - offset)
+            try:
+                job = await helper.run_job(
+                    image,
+                    command,
+                    description=f"e2e tests: scheduling load {profile.name}",
+                    wait_state=JobStatus.PENDING,
+                    resources=resources,
+                    schedule_timeout=schedule_timeout,
+                    tags=[tag],
+                )
+            except Exception as exc:
+                log.warning("Load job submission failed: %s", exc)
+                result.submit_errors += 1
+                result.samples.append((offset, "submit_error", None))
+                return
+        result.submitted += 1
+        pending += 1
+        result.peak_pending = max(result.peak_pending, pending)
+        try:
+            job = await helper.watch_job(job).wait_for(
+                lambda job: job.status != JobStatus.PENDING,
+                running_timeout,
+                "Load job is still pending",
+            )
+        except AssertionError:
+            result.timed_out += 1
+            result.samples.append((offset, "timed_out", None))
+            return
+        finally:
+            pending -= 1
+        if (
+            job.status == JobStatus.FAILED
+            and job.history.reason == UNSCHEDULABLE_REASON
+        ):
+            result.unschedulable += 1
+            result.samples.append((offset, "unschedulable", None))
+            return
+        if job.status not in (JobStatus.RUNNING, JobStatus.SUCCEEDED):
+            result.failed += 1
+            result.samples.append((offset, str(job.status), None))
+            return
+        result.running += 1
+        timeline = helper.timeline.get(job.id)
+        timings = timeline.phases() if timeline is not None else {}
+        to_running = timings.get("to_running")
+        if to_running is not None:
+            result.time_to_running.append(to_running)
+        if "pending" in timings:
+            result.platform_pending.append(timings["pending"])
+        result.samples.append((offset, "running", to_running))
+
+    log.info(
+        "Load %s: %d jobs over %.0fs, tag %s",
+        profile.name,
+        len(profile.offsets),
+        profile.duration,
+        tag,
+    )
+    try:
+        await asyncio.gather(*(_one(offset) for offset in profile.offsets))
+        result.elapsed = time.monotonic() - started_at
+    finally:
+        result.reaped = await reap_jobs(helper, tag)
+    log.info(
+        "Load %s: %d running, %d unschedulable, %d failed, %d timed out, "
+        "peak pending %d",
+        profile.name,
+        result.running,
+        result.unschedulable,
+        result.failed,
+        result.timed_out,
+        result.peak_pending,
+    )
+    return result
@@ -0,0 +1,213 @@
+import codecs
+import re
+from collections.abc import Iterable
+from datetime import datetime
+
+LOG_MATCH_WINDOW = 8 * 1024
+
+_REGEX_SPECIAL = frozenset(".^$*+?{}[]|()")
+
+
+def literal_pattern(pattern: str) -> str | None:
+    """
+    Return the text matched by pattern if it has no regexp constructs.
+
+    Backslash-escaped punctuation (as produced by re.escape) is unescaped.
+    """
+    chars = []
+    it = iter(pattern)
+    for char in it:
+        if char == "\\":
+            escaped = next(it, None)
+            if escaped is None or escaped.isalnum():
+                return None
+            chars.append(escaped)
+        elif char in _REGEX_SPECIAL:
+            return None
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+class LogMatcher:
+    """
+    Incremental matcher of job output against a set of patterns.
+
+    Bytes are decoded incrementally, so multibyte UTF-8 sequences split across
+    chunks are handled. Only the last `window` characters are kept, which
+    bounds memory and per-chunk work; a match must fit into the window.
+    Patterns without regexp constructs are looked up with str.find.
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str],
+        *,
+        re_flags: int = 0,
+        window: int = LOG_MATCH_WINDOW,
+    ) -> None:
+        self._patterns = list(patterns)
+        self._pending: dict[str, str | re.Pattern[str]] = {}
+        for pattern in self._patterns:
+            literal = literal_pattern(pattern) if not re_flags else None
+            if literal is not None:
+                if len(literal) > window:
+                    raise ValueError(f"Pattern is longer than window: {pattern}")
+                self._pending[pattern] = literal
+            else:
+                self._pending[pattern] = re.compile(pattern, re_flags)
+        self._window = window
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        self._consumed = 0
+
+    @property
+    def consumed(self) -> int:
+        """Number of bytes fed so far."""
+        return self._consumed
+
+    @property
+    def pending(self) -> list[str]:
+        return list(self._pending)
+
+    @property
+    def matched(self) -> bool:
+        return not self._pending
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Consume next chunk of output, return True once all patterns matched.
+        """
+        self._consumed += len(chunk)
+        text = self._decoder.decode(chunk)
+        if not text or not self._pending:
+            return not self._pending
+        prev_len = len(self._buffer)
+        self._buffer += text
+        for pattern, matcher in list(self._pending.items()):
+            if isinstance(matcher, str):
+                # Only the tail that could overlap with a new text is rescanned
+                start = max(0, prev_len - len(matcher) + 1)
+                found = self._buffer.find(matcher, start) >= 0
+            else:
+                found = matcher.search(self._buffer) is not None
+            if found:
+                del self._pending[pattern]
+        if len(self._buffer) > self._window:
+            tail = len(self._buffer) - self._window
+            self._buffer = self._buffer[tail:]
+        return not self._pending
+
+
+class LogCursor:
+    """
+    Position in a job log streamed with timestamps, to resume the stream from.
+
+    Timestamp prefixes are stripped from the fed lines. A stream resumed
+    since the last timestamp starts with lines already seen, earlier ones of
+    the same second or the same lines at that timestamp, which are skipped.
+
+    Text of an unterminated line is returned as it arrives, so prompts and
+    progress output can be matched before the line ends. It is not counted
+    as seen until the line is complete; if the stream is resumed before
+    that, the part already returned is dropped from the resent line.
+    """
+
+    def __init__(self) -> None:
+        self._partial = b""
+        self._last: datetime | None = None
+        # Lines seen with the last timestamp
+        self._seen = 0
+        self._resume_at: datetime | None = None
+        self._skip = 0
+        # Timestamp, novelty and returned bytes of the line being received
+        self._current: tuple[datetime | None, bool, int] | None = None
+        # Timestamp and returned bytes of a line cut by the previous stream
+        self._resent: tuple[datetime, int] | None = None
+
+    @property
+    def since(self) -> datetime | None:
+        return self._last
+
+    def resume(self) -> None:
+        """
+        Start a new stream since the last timestamp.
+        """
+        self._resent = None
+        if self._current is not None:
+            at, new, returned = self._current
+            if at is not None and new and returned:
+                self._resent = (at, returned)
+        self._partial = b""
+        self._current = None
+        self._resume_at = self._last
+        self._skip = self._seen
+
+    def feed(self, chunk: bytes) -> bytes:
+        """
+        Consume next chunk of the stream, return the output of new lines.
+        """
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        output = [self._line(line + b"\n", complete=True) for line in lines]
+        if self._partial:
+            output.append(self._line(self._partial, complete=False))
+        return b"".join(output)
+
+    def flush(self) -> bytes:
+        """
+        Return the rest of the unterminated last line of an ended stream.
+        """
+        partial, self._partial = self._partial, b""
+        return self._line(partial, complete=True) if partial else b""
+
+    def _line(self, line: bytes, *, complete: bool) -> bytes:
+        prefix, sep, text = line.partition(b" ")
+        if self._current is None:
+            if not sep and not complete:
+                # Wait for the whole timestamp
+                return b""
+            at = _timestamp(prefix) if sep else None
+            new = at is None or self._is_new(at)
+            returned = 0
+            if at is not None and new and self._resent is not None:
+                if at == self._resent[0]:
+                    returned = self._resent[1]
+                self._resent = None
+            self._current = (at, new, returned)
+        at, new, returned = self._current
+        if at is None:
+            text = line
+        output = text[returned:] if new else b""
+        if not complete:
+            self._current = (at, new, max(returned, len(text)))
+            return output
+        self._current = None
+        if at is not None:
+            self._seen_line(at, new)
+        return output
+
+    def _is_new(self, at: datetime) -> bool:
+        if self._resume_at is None:
+            return True
+        if at < self._resume_at:
+            return False
+        return not (at == self._resume_at and self._skip)
+
+    def _seen_line(self, at: datetime, new: bool) -> None:
+        if not new:
+            if at == self._resume_at:
+                self._skip -= 1
+            return
+        self._resume_at = None
+        if at == self._last:
+            self._seen += 1
+        elif self._last is None or at > self._last:
+            self._last, self._seen = at, 1
+
+
+def _timestamp(prefix: bytes) -> datetime | None:
+    try:
+        return datetime.fromisoformat(prefix.decode())
+    except ValueError:
+        return None
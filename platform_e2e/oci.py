@@ -0,0 +1,511 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import tarfile
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+import aiohttp
+from yarl import URL
+
+from .datagen import RandomData
+
+log = logging.getLogger(__name__)
+
+OCI_MANIFEST = "application/vnd.oci.image.manifest.v1+json"
+OCI_CONFIG = "application/vnd.oci.image.config.v1+json"
+OCI_LAYER = "application/vnd.oci.image.layer.v1.tar"
+DOCKER_MANIFEST = "application/vnd.docker.distribution.manifest.v2+json"
+TAR_BLOCK = 512
+REGISTRY_CONCURRENCY = 4
+# Token lifetime when the token server does not say, as in the token spec
+TOKEN_DEFAULT_EXPIRY = 60
+# Streamed bodies cannot be replayed, their tokens are renewed this early
+TOKEN_REFRESH_MARGIN = 30
+
+_digests: dict[tuple[int, int, int], str] = {}
+
+
+@dataclass(frozen=True)
+class Descriptor:
+    media_type: str
+    digest: str
+    size: int
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"mediaType": self.media_type, "digest": self.digest, "size": self.size}
+
+
+def sha256_digest(data: bytes) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+class SyntheticLayer:
+    """
+    Uncompressed tar layer with a single file of reproducible random content.
+
+    The digest is computed while the layer is streamed the first time and
+    memoized for the same index, size and seed.
+    """
+
+    def __init__(self, index: int, file_size: int, seed: int = 0) -> None:
+        self._index = index
+        self._data = RandomData(file_size, seed=(seed << 16) | index)
+        info = tarfile.TarInfo(f"layer-{index}.bin")
+        info.size = file_size
+        info.mode = 0o644
+        self._header = info.tobuf(format=tarfile.GNU_FORMAT)
+        self._padding = -file_size % TAR_BLOCK
+        self._size = len(self._header) + file_size + self._padding + 2 * TAR_BLOCK
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def digest(self) -> str | None:
+        return _digests.get(self._key)
+
+    @property
+    def descriptor(self) -> Descriptor:
+        digest = self.digest
+        if digest is None:
+            raise RuntimeError(f"Digest of layer {self._index} is not computed yet")
+        return Descriptor(OCI_LAYER, digest, self._size)
+
+    @property
+    def _key(self) -> tuple[int, int, int]:
+        return (self._index, self._data.size, self._data.seed)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        hasher = hashlib.sha256() if self.digest is None else None
+
+        async def _parts() -> AsyncIterator[bytes]:
+            yield self._header
+            async for chunk in self._data.chunks():
+                yield chunk
+            yield bytes(self._padding + 2 * TAR_BLOCK)
+
+        async for chunk in _parts():
+            if hasher is not None:
+                hasher.update(chunk)
+            yield chunk
+        if hasher is not None:
+            _digests[self._key] = "sha256:" + hasher.hexdigest()
+
+    async def get_digest(self) -> str:
+        if self.digest is None:
+            async for _ in self.chunks():
+                pass
+        digest = self.digest
+        assert digest is not None
+        return digest
+
+
+class SyntheticImage:
+    """
+    OCI image of layers of the given size, generated without a docker daemon.
+    """
+
+    def __init__(self, layers: int, layer_size: int, *, seed: int = 0) -> None:
+        self._layers = [SyntheticLayer(i, layer_size, seed) for i in range(layers)]
+
+    @property
+    def layers(self) -> list[SyntheticLayer]:
+        return self._layers
+
+    @property
+    def size(self) -> int:
+        return sum(layer.size for layer in self._layers)
+
+    def config(self) -> bytes:
+        diff_ids = [layer.descriptor.digest for layer in self._layers]
+        data = {
+            "architecture": "amd64",
+            "os": "linux",
+            "config": {},
+            "rootfs": {"type": "layers", "diff_ids": diff_ids},
+        }
+        return json.dumps(data, sort_keys=True).encode()
+
+    def manifest(self) -> bytes:
+        config = self.config()
+        data = {
+            "schemaVersion": 2,
+            "mediaType": OCI_MANIFEST,
+            "config": Descriptor(
+                OCI_CONFIG, sha256_digest(config), len(config)
+            ).as_dict(),
+            "layers": [layer.descriptor.as_dict() for layer in self._layers],
+        }
+        return json.dumps(data, sort_keys=True).encode()
+
+
+@dataclass(frozen=True)
+class LayerTransfer:
+    digest: str
+    size: int
+    elapsed: float
+    # upload, download, exists or mount
+    mode: str
+
+    @property
+    def transferred(self) -> int:
+        return self.size if self.mode in ("upload", "download") else 0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second."""
+        return self.transferred / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class RegistryTransfer:
+    repo: str
+    reference: str
+    elapsed: float = 0.0
+    manifest_digest: str | None = None
+    layers: list[LayerTransfer] = field(default_factory=list)
+
+    @property
+    def transferred(self) -> int:
+        return sum(layer.transferred for layer in self.layers)
+
+    @property
+    def throughput(self) -> float:
+        """Aggregate bytes per second over all layers."""
+        return self.transferred / self.elapsed if self.elapsed else 0.0
+
+
+class RegistryError(Exception):
+    pass
+
+
+# Repository and the repository to mount blobs from
+_Scope = tuple[str, str | None]
+
+
+@dataclass(frozen=True)
+class _Token:
+    value: str
+    expires_at: float
+
+    def expires_soon(self) -> bool:
+        return self.expires_at - time.monotonic() < TOKEN_REFRESH_MARGIN
+
+
+class RegistryClient:
+    """
+    Minimal client of the registry HTTP API for pushing and pulling images.
+
+    Blobs are transferred concurrently and streamed without buffering whole
+    layers. Basic auth is sent as is; a bearer challenge is answered by
+    fetching a token from its realm with the same credentials. Tokens are
+    kept per repository scope and renewed before a streamed upload when they
+    are about to expire.
+    """
+
+    def __init__(
+        self,
+        url: URL,
+        *,
+        auth: str | None = None,
+        concurrency: int = REGISTRY_CONCURRENCY,
+    ) -> None:
+        self._url = url
+        self._auth = auth
+        self._realm: dict[str, str] | None = None
+        self._tokens: dict[_Scope, _Token] = {}
+        self._sem = asyncio.Semaphore(concurrency)
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=300)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def push(
+        self,
+        repo: str,
+        tag: str,
+        image: SyntheticImage,
+        *,
+        mount_from: str | None = None,
+    ) -> RegistryTransfer:
+        """
+        Push image layers concurrently, then its config and manifest.
+
+        Layers already present in repo are skipped, layers of mount_from are
+        cross-mounted when the registry allows it.
+        """
+        result = RegistryTransfer(repo, tag)
+        started_at = time.monotonic()
+
+        async def _push_layer(layer: SyntheticLayer) -> LayerTransfer:
+            async with self._sem:
+                return await self._push_layer(repo, layer, mount_from)
+
+        result.layers = list(
+            await asyncio.gather(*(_push_layer(layer) for layer in image.layers))
+        )
+        config = image.config()
+        await self._push_bytes(repo, config)
+        manifest = image.manifest()
+        result.manifest_digest = await self.put_manifest(repo, tag, manifest)
+        result.elapsed = time.monotonic() - started_at
+        return result
+
+    async def pull(self, repo: str, reference: str) -> RegistryTransfer:
+        """
+        Fetch manifest and all its blobs concurrently, verifying digests.
+        """
+        result = RegistryTransfer(repo, reference)
+        started_at = time.monotonic()
+        manifest, result.manifest_digest = await self.get_manifest(repo, reference)
+        descriptors = [manifest["config"], *manifest["layers"]]
+
+        async def _pull_blob(descriptor: dict[str, Any]) -> LayerTransfer:
+            async with self._sem:
+                return await self._pull_blob(repo, descriptor["digest"])
+
+        transfers = await asyncio.gather(*(_pull_blob(d) for d in descriptors))
+        result.layers = list(transfers[1:])
+        result.elapsed = time.monotonic() - started_at
+        return result
+
+    async def blob_exists(self, repo: str, digest: str) -> bool:
+        url = self._api(repo, "blobs", digest)
+        async with self._request("HEAD", url, repo) as resp:
+            if resp.status == 404:
+                return False
+            self._check(resp, url)
+            return True
+
+    async def mount_blob(self, repo: str, digest: str, source: str) -> URL | None:
+        """
+        Cross-mount a blob, return an upload location if it is not mounted.
+        """
+        url = self._api(repo, "blobs", "uploads/").with_query(
+            mount=digest, **{"from": source}
+        )
+        async with self._request("POST", url, repo, pull_from=source) as resp:
+            self._check(resp, url)
+            if resp.status == 201:
+                return None
+            return self._location(resp)
+
+    async def upload_blob(
+        self,
+        repo: str,
+        chunks: AsyncIterator[bytes],
+        size: int,
+        *,
+        digest: str | None = None,
+        location: URL | None = None,
+    ) -> str:
+        """
+        Stream a blob in one PATCH and commit it, return its digest.
+        """
+        if location is None:
+            location = await self._start_upload(repo)
+        hasher = hashlib.sha256()
+
+        async def _data() -> AsyncIterator[bytes]:
+            async for chunk in chunks:
+                hasher.update(chunk)
+                yield chunk
+
+        headers = {"Content-Type": "application/octet-stream"}
+        headers["Content-Length"] = str(size)
+        async with self._request(
+            "PATCH", location, repo, data=_data(), headers=headers
+        ) as resp:
+            self._check(resp, location)
+            location = self._location(resp)
+        computed = "sha256:" + hasher.hexdigest()
+        if digest is not None and digest != computed:
+            raise RegistryError(f"Blob digest mismatch {computed} != {digest}")
+        url = location.update_query(digest=computed)
+        async with self._request("PUT", url, repo) as resp:
+            self._check(resp, url)
+        return computed
+
+    async def put_manifest(self, repo: str, reference: str, manifest: bytes) -> str:
+        url = self._api(repo, "manifests", reference)
+        headers = {"Content-Type": OCI_MANIFEST}
+        async with self._request(
+            "PUT", url, repo, data=manifest, headers=headers
+        ) as resp:
+            self._check(resp, url)
+            return resp.headers.get("Docker-Content-Digest") or sha256_digest(manifest)
+
+    async def get_manifest(self, repo: str, reference: str) -> tuple[Any, str]:
+        url = self._api(repo, "manifests", reference)
+        headers = {"Accept": f"{OCI_MANIFEST}, {DOCKER_MANIFEST}"}
+        async with self._request("GET", url, repo, headers=headers) as resp:
+            self._check(resp, url)
+            body = await resp.read()
+        return json.loads(body), sha256_digest(body)
+
+    async def delete_manifest(self, repo: str, digest: str) -> None:
+        url = self._api(repo, "manifests", digest)
+        async with self._request("DELETE", url, repo) as resp:
+            if resp.status != 404:
+                self._check(resp, url)
+
+    async def _push_layer(
+        self, repo: str, layer: SyntheticLayer, mount_from: str | None
+    ) -> LayerTransfer:
+        started_at = time.monotonic()
+        digest = layer.digest
+        location: URL | None = None
+        if digest is not None:
+            if await self.blob_exists(repo, digest):
+                return LayerTransfer(
+                    digest, layer.size, time.monotonic() - started_at, "exists"
+                )
+            if mount_from is not None:
+                location = await self.mount_blob(repo, digest, mount_from)
+                if location is None:
+                    return LayerTransfer(
+                        digest, layer.size, time.monotonic() - started_at, "mount"
+                    )
+        digest = await self.upload_blob(
+            repo, layer.chunks(), layer.size, digest=digest, location=location
+        )
+        elapsed = time.monotonic() - started_at
+        log.info(
+            "Pushed %s to %s: %.1f MB/s", digest, repo, layer.size / elapsed / 2**20
+        )
+        return LayerTransfer(digest, layer.size, elapsed, "upload")
+
+    async def _push_bytes(self, repo: str, data: bytes) -> None:
+        digest = sha256_digest(data)
+        if await self.blob_exists(repo, digest):
+            return
+
+        async def _chunks() -> AsyncIterator[bytes]:
+            yield data
+
+        await self.upload_blob(repo, _chunks(), len(data), digest=digest)
+
+    async def _pull_blob(self, repo: str, digest: str) -> LayerTransfer:
+        started_at = time.monotonic()
+        url = self._api(repo, "blobs", digest)
+        hasher = hashlib.sha256()
+        size = 0
+        async with self._request("GET", url, repo) as resp:
+            self._check(resp, url)
+            async for chunk in resp.content.iter_any():
+                hasher.update(chunk)
+                size += len(chunk)
+        if "sha256:" + hasher.hexdigest() != digest:
+            raise RegistryError(f"Blob {digest} of {repo} is corrupted")
+        return LayerTransfer(digest, size, time.monotonic() - started_at, "download")
+
+    async def _start_upload(self, repo: str) -> URL:
+        url = self._api(repo, "blobs", "uploads/")
+        async with self._request("POST", url, repo) as resp:
+            self._check(resp, url)
+            return self._location(resp)
+
+    def _api(self, repo: str, kind: str, reference: str) -> URL:
+        return self._url.with_path(f"/v2/{repo}/{kind}/{reference}", encoded=True)
+
+    def _location(self, resp: aiohttp.ClientResponse) -> URL:
+        location = resp.headers.get("Location")
+        if not location:
+            raise RegistryError(f"No upload location from {resp.url}")
+        return resp.url.join(URL(location, encoded=True))
+
+    def _check(self, resp: aiohttp.ClientResponse, url: URL) -> None:
+        if resp.status >= 400:
+            raise RegistryError(f"{resp.method} {url} failed with {resp.status}")
+
+    def _headers(self, scope: _Scope) -> dict[str, str]:
+        token = self._tokens.get(scope)
+        if token is not None:
+            return {"Authorization": f"Bearer {token.value}"}
+        if self._auth is not None:
+            return {"Authorization": self._auth}
+        return {}
+
+    @asynccontextmanager
+    async def _request(
+        self,
+        method: str,
+        url: URL,
+        repo: str,
+        *,
+        pull_from: str | None = None,
+        headers: dict[str, str] | None = None,
+        data: Any = None,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        scope = (repo, pull_from)
+        # Streamed bodies cannot be sent twice, a 401 of them is final
+        streamed = isinstance(data, AsyncIterator)
+        if streamed:
+            token = self._tokens.get(scope)
+            if token is not None and token.expires_soon():
+                await self._fetch_token(scope)
+        for attempt in range(2):
+            async with self.session.request(
+                method,
+                url,
+                headers={**self._headers(scope), **(headers or {})},
+                data=data,
+            ) as resp:
+                challenge = resp.headers.get("WWW-Authenticate")
+                if (
+                    resp.status == 401
+                    and attempt == 0
+                    and challenge
+                    and not streamed
+                    and await self._authenticate(challenge, scope)
+                ):
+                    continue
+                yield resp
+                return
+
+    async def _authenticate(self, challenge: str, scope: _Scope) -> bool:
+        scheme, _, params = challenge.partition(" ")
+        if scheme.lower() != "bearer":
+            return False
+        self._realm = dict(re.findall(r'(\w+)="([^"]*)"', params))
+        return await self._fetch_token(scope)
+
+    async def _fetch_token(self, scope: _Scope) -> bool:
+        assert self._realm is not None
+        repo, pull_from = scope
+        scopes = [f"repository:{repo}:pull,push"]
+        if pull_from is not None:
+            scopes.append(f"repository:{pull_from}:pull")
+        query: list[tuple[str, str]] = [("scope", item) for item in scopes]
+        if "service" in self._realm:
+            query.append(("service", self._realm["service"]))
+        headers = {"Authorization": self._auth} if self._auth is not None else {}
+        async with self.session.get(
+            URL(self._realm["realm"]).with_query(query), headers=headers
+        ) as resp:
+            if resp.status != 200:
+                return False
+            payload = await resp.json()
+        value = payload.get("token") or payload.get("access_token")
+        if value is None:
+            return False
+        expires_in = payload.get("expires_in") or TOKEN_DEFAULT_EXPIRY
+        self._tokens[scope] = _Token(value, time.monotonic() + expires_in)
+        return True
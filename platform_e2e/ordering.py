@@ -0,0 +1,303 @@
+import heapq
+import json
+import logging
+import os
+import re
+import statistics
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from filelock import FileLock
+
+log = logging.getLogger(__name__)
+
+HISTORY_SIZE = 10
+# Floor of the cost in failfast scores, so that trivially fast tests with
+# no failures do not outrank slow but often failing ones
+MIN_COST = 1.0
+
+ORDER_MODES = ("auto", "none", "duration", "failfast")
+# workerinput key of the history snapshot the controller passes to workers
+WORKER_HISTORY = "e2e_durations"
+
+# pytest-xdist --dist loadgroup appends @group to node ids
+_GROUP_SUFFIX = re.compile(r"@([^\[\]@/:]+)$")
+
+
+def history_key(nodeid: str) -> str:
+    """
+    Node id without the xdist group suffix, the same for serial and
+    parallel runs.
+    """
+    return _GROUP_SUFFIX.sub("", nodeid)
+
+
+def _group(nodeid: str) -> str | None:
+    match = _GROUP_SUFFIX.search(nodeid)
+    return match.group(1) if match else None
+
+
+@dataclass(frozen=True)
+class Prediction:
+    total: float
+    wall: float
+    workers: int
+    known: int
+    unknown: int
+
+    def __str__(self) -> str:
+        text = f"predicted runtime {_format(self.total)}"
+        if self.workers > 1:
+            text += f", {_format(self.wall)} on {self.workers} workers"
+        text += f" ({self.known} tests with history"
+        if self.unknown:
+            text += f", {self.unknown} without"
+        return text + ")"
+
+
+def _format(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class DurationHistory:
+    """
+    Recent durations and outcomes of every test, kept on disk between runs.
+
+    A duration covers all phases and attempts of a test, which is what the
+    test costs the run. Outcomes are P for passed and F for failed. A
+    snapshot of another instance replaces the file as the recent history.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        size: int = HISTORY_SIZE,
+        snapshot: dict[str, Any] | None = None,
+    ) -> None:
+        self._root = root
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._path = root / "history.json"
+        self._lock = FileLock(root / "history.lock")
+        self._size = size
+        self._tests = self._read() if snapshot is None else snapshot
+        self._pending: dict[str, tuple[float, bool]] = {}
+        self._default = statistics.median(
+            [self.duration(key) or 0.0 for key in self._tests] or [0.0]
+        )
+
+    def duration(self, nodeid: str) -> float | None:
+        """
+        Median of recent durations, None for a test without history.
+        """
+        durations = self._tests.get(history_key(nodeid), {}).get("durations")
+        return statistics.median(durations) if durations else None
+
+    def expected_duration(self, nodeid: str) -> float:
+        duration = self.duration(nodeid)
+        return self._default if duration is None else duration
+
+    def fail_rate(self, nodeid: str) -> float:
+        # Laplace smoothed, so a new test is as likely to fail as to pass
+        outcomes = self._tests.get(history_key(nodeid), {}).get("outcomes", "")
+        return (outcomes.count("F") + 1) / (len(outcomes) + 2)
+
+    def record(self, nodeid: str, duration: float, failed: bool) -> None:
+        self._pending[history_key(nodeid)] = (duration, failed)
+
+    def save(self) -> None:
+        if not self._pending:
+            return
+        with self._lock:
+            tests = self._read()
+            for key, (duration, failed) in self._pending.items():
+                entry = tests.setdefault(key, {"durations": [], "outcomes": ""})
+                durations = [*entry["durations"], round(duration, 3)]
+                outcomes = entry["outcomes"] + ("F" if failed else "P")
+                start = max(len(durations) - self._size, 0)
+                entry["durations"] = durations[start:]
+                entry["outcomes"] = outcomes[start:]
+            tmp = self._path.with_suffix(f".{uuid4().hex}.tmp")
+            tmp.write_text(json.dumps(tests, indent=2, sort_keys=True))
+            os.replace(tmp, self._path)
+        self._tests = tests
+        self._pending = {}
+
+    def snapshot(self) -> dict[str, Any]:
+        return self._tests
+
+    def predict(self, nodeids: Sequence[str], workers: int = 1) -> Prediction:
+        """
+        Serial runtime and, for several workers, the makespan of greedy
+        dispatch in the given order with xdist groups kept on one worker.
+        """
+        units = _units(_group(nodeid) for nodeid in nodeids)
+        costs = [
+            sum(self.expected_duration(nodeids[i]) for i in unit) for unit in units
+        ]
+        loads = [0.0] * max(workers, 1)
+        for cost in costs:
+            heapq.heapreplace(loads, loads[0] + cost)
+        known = sum(self.duration(nodeid) is not None for nodeid in nodeids)
+        return Prediction(
+            total=sum(costs),
+            wall=max(loads),
+            workers=max(workers, 1),
+            known=known,
+            unknown=len(nodeids) - known,
+        )
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            return json.loads(self._path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+def _item_group(item: pytest.Item) -> str | None:
+    names = sorted(
+        str(mark.args[0] if mark.args else mark.kwargs.get("name", "default"))
+        for mark in item.iter_markers("xdist_group")
+    )
+    if names:
+        return "_".join(names)
+    if item.get_closest_marker("dependency") is not None:
+        # Dependent tests must keep their order, keep the module together
+        return item.nodeid.split("::")[0]
+    return None
+
+
+def _units(groups: Iterable[str | None]) -> list[list[int]]:
+    """
+    Split indexes into units which are moved as a whole, in order of first
+    appearance. Members of a unit keep their relative order.
+    """
+    units: list[list[int]] = []
+    by_group: dict[str, list[int]] = {}
+    for index, group in enumerate(groups):
+        if group is None:
+            units.append([index])
+        elif group in by_group:
+            by_group[group].append(index)
+        else:
+            by_group[group] = [index]
+            units.append(by_group[group])
+    return units
+
+
+def order_items(
+    items: list[pytest.Item], history: DurationHistory, mode: str
+) -> list[pytest.Item]:
+    """
+    Longest first for duration, so parallel workers finish together, or
+    most failures per second first for failfast, to stop early on -x.
+    """
+    units = _units(_item_group(item) for item in items)
+
+    def cost(unit: list[int]) -> float:
+        return sum(history.expected_duration(items[i].nodeid) for i in unit)
+
+    if mode == "duration":
+        units.sort(key=cost, reverse=True)
+    elif mode == "failfast":
+
+        def score(unit: list[int]) -> float:
+            survive = 1.0
+            for i in unit:
+                survive *= 1 - history.fail_rate(items[i].nodeid)
+            return (1 - survive) / max(cost(unit), MIN_COST)
+
+        units.sort(key=score, reverse=True)
+    return [items[i] for unit in units for i in unit]
+
+
+class OrderingPlugin:
+    """
+    Records test durations and orders collection by their history.
+    """
+
+    def __init__(self, history: DurationHistory, mode: str = "auto") -> None:
+        self.history = history
+        self._mode = mode
+        self._durations: dict[str, float] = {}
+        self._failed: set[str] = set()
+        self._skipped: set[str] = set()
+        self._predicted = False
+
+    def resolve_mode(self, config: pytest.Config) -> str:
+        if self._mode != "auto":
+            return self._mode
+        if config.getoption("stepwise", False):
+            # Stepwise resumes by position, the order must not change
+            return "none"
+        if getattr(config.option, "numprocesses", None):
+            return "duration"
+        if config.option.maxfail == 1:
+            return "failfast"
+        return "none"
+
+    def pytest_collection_modifyitems(
+        self, config: pytest.Config, items: list[pytest.Item]
+    ) -> None:
+        mode = self.resolve_mode(config)
+        if mode != "none":
+            items[:] = order_items(items, self.history, mode)
+
+    def pytest_report_collectionfinish(
+        self, config: pytest.Config, items: Sequence[pytest.Item]
+    ) -> str | None:
+        if not items:
+            return None
+        self._predicted = True
+        mode = self.resolve_mode(config)
+        prediction = self.history.predict([item.nodeid for item in items])
+        return f"e2e: {prediction}, order {mode}"
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node: Any) -> None:
+        # Workers must collect the same order, so they all get the history
+        # read once by the controller instead of reading the file on their own
+        node.workerinput[WORKER_HISTORY] = self.history.snapshot()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node: Any, ids: list[str]) -> None:
+        # The controller does not collect, predict from the first worker ids
+        if self._predicted or not ids:
+            return
+        self._predicted = True
+        config = node.config
+        workers = len(getattr(config.option, "tx", None) or []) or int(
+            config.option.numprocesses or 1
+        )
+        prediction = self.history.predict(ids, workers)
+        reporter = config.pluginmanager.get_plugin("terminalreporter")
+        if reporter is not None:
+            mode = self.resolve_mode(config)
+            reporter.write_line(f"e2e: {prediction}, order {mode}")
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        key = report.nodeid
+        self._durations[key] = self._durations.get(key, 0.0) + report.duration
+        if report.failed:
+            self._failed.add(key)
+        elif report.skipped:
+            self._skipped.add(key)
+        if report.when != "teardown" or getattr(report, "e2e_retried", False):
+            return
+        duration = self._durations.pop(key)
+        failed = key in self._failed
+        skipped = key in self._skipped
+        self._failed.discard(key)
+        self._skipped.discard(key)
+        # Skipped and xfailed tests tell nothing about their cost
+        if not skipped:
+            self.history.record(key, duration, failed)
+
+    def pytest_sessionfinish(self, session: pytest.Session) -> None:
+        # The controller sees reports of all xdist workers and saves for them
+        if not hasattr(session.config, "workerinput"):
+            self.history.save()
@@ -0,0 +1,39 @@
+import hashlib
+import logging
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from filelock import AsyncFileLock
+
+log = logging.getLogger(__name__)
+
+
+class SetupCoordinator:
+    """
+    Run one-time setup steps once per test run across pytest-xdist workers.
+
+    The first worker reaching a step runs it under a file lock and leaves a
+    marker, other workers wait for the lock and skip the step.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self._root = root
+        self._root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    async def once(self, key: str, func: Callable[[], Awaitable[None]]) -> bool:
+        """
+        Run func unless some worker has done it already, return True if ran.
+        """
+        name = hashlib.sha1(key.encode()).hexdigest()[:16]
+        marker = self._root / f"{name}.done"
+        async with AsyncFileLock(self._root / f"{name}.lock"):
+            if marker.exists():
+                log.info("Setup step %s is done by another worker", key)
+                return False
+            await func()
+            marker.write_text(key)
+        return True
@@ -0,0 +1,267 @@
+import secrets
+from collections.abc import Generator, Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from apolo_sdk import AuthError
+
+from . import SWEEP_AGE
+from .bench import GB, BenchmarkReport
+from .cache import BootstrapCache
+from .load import LOAD_DEFAULT_PROFILES, LoadProfile
+from .ordering import ORDER_MODES, WORKER_HISTORY, DurationHistory, OrderingPlugin
+from .parallel import SetupCoordinator
+from .profiler import HarnessProfiler
+from .retry import FlakyHistory, RetryPlugin
+from .timeline import TimelineRecorder
+
+bootstrap_cache_key = pytest.StashKey[BootstrapCache]()
+timeline_key = pytest.StashKey[TimelineRecorder]()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("e2e")
+    group.addoption(
+        "--e2e-no-bootstrap-cache",
+        action="store_true",
+        default=False,
+        help="Do not reuse users, projects and configs bootstrapped by "
+        "previous runs.",
+    )
+    group.addoption(
+        "--e2e-benchmark",
+        action="store_true",
+        default=False,
+        help="Run tests marked as benchmark.",
+    )
+    group.addoption(
+        "--e2e-benchmark-report",
+        default=None,
+        help="Write the JSON benchmark report to this path, xdist workers add "
+        "a suffix. Not written by default.",
+    )
+    group.addoption(
+        "--e2e-benchmark-max-size",
+        type=int,
+        default=GB,
+        help="Skip benchmark cells with objects larger than this many bytes.",
+    )
+    group.addoption(
+        "--e2e-load-profile",
+        action="append",
+        default=[],
+        help="Scheduling load profile: burst:COUNT, rate:PER_SECOND:SECONDS or "
+        "step:START_RATE:RATE_STEP:STEP_SECONDS:STEPS. Can be repeated.",
+    )
+    group.addoption(
+        "--e2e-job-timings",
+        default=None,
+        help="Write job lifecycle timings to this path prefix as .json and "
+        ".prom, xdist workers add a suffix. Not written by default.",
+    )
+    group.addoption(
+        "--e2e-retries",
+        type=int,
+        default=0,
+        help="Retry a failed test up to this many times in the same session, "
+        "reusing module and session fixtures. Mark a test with retries(N) "
+        "to override.",
+    )
+    group.addoption(
+        "--e2e-retry-delay",
+        type=float,
+        default=5.0,
+        help="Base delay in seconds of the jittered exponential backoff "
+        "between retries.",
+    )
+    group.addoption(
+        "--e2e-quarantine",
+        action="store_true",
+        default=False,
+        help="Run tests that often needed a retry to pass as non-strict xfail.",
+    )
+    group.addoption(
+        "--e2e-flaky-first",
+        action="store_true",
+        default=False,
+        help="Run tests that often needed a retry to pass first.",
+    )
+    group.addoption(
+        "--e2e-order",
+        choices=ORDER_MODES,
+        default="auto",
+        help="Order tests by their duration history: duration runs the longest "
+        "first to balance xdist workers, failfast runs the likeliest failures "
+        "per second first. auto picks duration with xdist, failfast with "
+        "--exitfirst and keeps the order with --stepwise.",
+    )
+    group.addoption(
+        "--e2e-sweep-age",
+        type=float,
+        default=0,
+        help="Kill jobs of other runs created more than this many seconds "
+        "ago when the session starts, left over by crashed runs. Disabled by "
+        "default, a concurrent session cannot be told apart from a crashed "
+        f"one; keep it above the longest run, e.g. {SWEEP_AGE}.",
+    )
+    group.addoption(
+        "--e2e-profile",
+        default="",
+        help="Profile the harness overhead: fixtures, Helper calls, blocking "
+        "calls and event loop lag, written per test to PREFIX.json and as "
+        "flamegraph collapsed stacks to PREFIX.collapsed. xdist workers add "
+        "a suffix.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.stash[timeline_key] = TimelineRecorder()
+    workerinput = getattr(config, "workerinput", None)
+    if hasattr(config, "cache"):
+        mode = config.getoption("e2e_order")
+        snapshot = None
+        if workerinput is not None:
+            snapshot = workerinput.get(WORKER_HISTORY)
+            if snapshot is None:
+                # Workers reading the file on their own could order differently
+                mode = "none"
+        ordering = OrderingPlugin(
+            DurationHistory(config.cache.mkdir("e2e-durations"), snapshot=snapshot),
+            mode,
+        )
+        config.pluginmanager.register(ordering, "e2e-ordering")
+        retry = RetryPlugin(
+            FlakyHistory(config.cache.mkdir("e2e-flaky")),
+            retries=config.getoption("e2e_retries"),
+            base_delay=config.getoption("e2e_retry_delay"),
+            quarantine=config.getoption("e2e_quarantine"),
+            flaky_first=config.getoption("e2e_flaky_first"),
+        )
+        config.pluginmanager.register(retry, "e2e-retry")
+    prefix = config.getoption("e2e_profile")
+    if prefix:
+        if workerinput is not None:
+            prefix = f"{prefix}.{workerinput['workerid']}"
+        profiler = HarnessProfiler(Path(prefix))
+        profiler.install()
+        config.pluginmanager.register(profiler, "e2e-profiler")
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    if "load_profile" in metafunc.fixturenames:
+        specs = metafunc.config.getoption("e2e_load_profile") or LOAD_DEFAULT_PROFILES
+        try:
+            profiles = [LoadProfile.parse(spec) for spec in specs]
+        except ValueError as exc:
+            raise pytest.UsageError(str(exc))
+        metafunc.parametrize("load_profile", profiles, ids=[p.name for p in profiles])
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    if config.getoption("e2e_benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --e2e-benchmark only")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_protocol(item: pytest.Item) -> Generator[None, object, object]:
+    timeline = item.config.stash[timeline_key]
+    timeline.current_test = item.nodeid
+    try:
+        return (yield)
+    finally:
+        timeline.current_test = None
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo[None]
+) -> Iterator[None]:
+    report = yield
+    cache = item.config.stash.get(bootstrap_cache_key, None)
+    if cache is not None and call.excinfo and call.excinfo.errisinstance(AuthError):
+        cache.invalidate()
+    return report
+
+
+@pytest.fixture(scope="session")
+def benchmark_report(
+    pytestconfig: pytest.Config, worker_id: str
+) -> Iterator[BenchmarkReport]:
+    report = BenchmarkReport()
+    yield report
+    option = pytestconfig.getoption("e2e_benchmark_report")
+    if not option or not report.results:
+        return
+    path = Path(option)
+    if worker_id != "master":
+        path = path.with_name(f"{path.stem}.{worker_id}{path.suffix}")
+    report.write(path)
+
+
+@pytest.fixture(scope="session")
+def job_timeline(
+    pytestconfig: pytest.Config, worker_id: str
+) -> Iterator[TimelineRecorder]:
+    timeline = pytestconfig.stash[timeline_key]
+    yield timeline
+    prefix = pytestconfig.getoption("e2e_job_timings")
+    if not prefix or not timeline.timelines:
+        return
+    if worker_id != "master":
+        prefix = f"{prefix}.{worker_id}"
+    timeline.write_json(Path(f"{prefix}.json"))
+    timeline.write_prometheus(Path(f"{prefix}.prom"))
+
+
+@pytest.fixture(scope="session")
+def run_id(pytestconfig: pytest.Config, worker_id: str) -> str:
+    """
+    Tagged on every job of the run, per xdist worker, so that each worker
+    reaps its own jobs only.
+    """
+    workerinput = getattr(pytestconfig, "workerinput", None)
+    if workerinput is None:
+        return secrets.token_hex(6)
+    return f"{workerinput['testrunuid'][:12]}-{worker_id}"
+
+
+@pytest.fixture(scope="session")
+def sweep_age(pytestconfig: pytest.Config) -> float:
+    return pytestconfig.getoption("e2e_sweep_age")
+
+
+@pytest.fixture(scope="session")
+def benchmark_max_size(pytestconfig: pytest.Config) -> int:
+    return pytestconfig.getoption("e2e_benchmark_max_size")
+
+
+@pytest.fixture(scope="session")
+def setup_coordinator(tmp_path_factory: Any, worker_id: str) -> SetupCoordinator:
+    root = tmp_path_factory.getbasetemp()
+    if worker_id != "master":
+        # Workers of the same run share the parent of their base temp dirs
+        root = root.parent
+    return SetupCoordinator(root / "e2e-setup")
+
+
+@pytest.fixture(scope="session")
+def bootstrap_cache(
+    pytestconfig: pytest.Config, setup_coordinator: SetupCoordinator
+) -> BootstrapCache:
+    if pytestconfig.getoption("e2e_no_bootstrap_cache") or not hasattr(
+        pytestconfig, "cache"
+    ):
+        # Still dedupe bootstrap between workers of this run
+        root = setup_coordinator.root / "bootstrap"
+    else:
+        root = pytestconfig.cache.mkdir("e2e-bootstrap")
+    cache = BootstrapCache(root)
+    pytestconfig.stash[bootstrap_cache_key] = cache
+    return cache
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from apolo_sdk import JobDescription, ResourceNotFound, Resources
+
+if TYPE_CHECKING:
+    from . import Helper
+
+log = logging.getLogger(__name__)
+
+POOL_JOB_COMMAND = "tail -f /dev/null"
+POOL_CHECK_INTERVAL = 30
+POOL_MAX_USES = 100
+
+
+@dataclass(frozen=True)
+class ExecResult:
+    exit_code: int
+    stdout: str
+    stderr: str
+
+
+class PooledJob:
+    def __init__(self, helper: "Helper", job: JobDescription) -> None:
+        self._helper = helper
+        self._job = job
+        self._uses = 0
+        self._checked_at = time.monotonic()
+        self.broken = False
+
+    @property
+    def id(self) -> str:
+        return self._job.id
+
+    @property
+    def job(self) -> JobDescription:
+        return self._job
+
+    @property
+    def uses(self) -> int:
+        return self._uses
+
+    async def exec(self, cmd: str, *, timeout: float = 60) -> ExecResult:
+        self._uses += 1
+        try:
+            result = await self._helper.exec(self.id, cmd, timeout=timeout)
+        except Exception:
+            # Transport errors and timeouts leave the job in unknown state
+            self.broken = True
+            raise
+        self._checked_at = time.monotonic()
+        return result
+
+    async def check(self) -> bool:
+        if time.monotonic() - self._checked_at < POOL_CHECK_INTERVAL:
+            return True
+        try:
+            result = await self.exec("true", timeout=15)
+        except Exception as exc:
+            log.warning("Pooled job %s health check failed: %s", self.id, exc)
+            return False
+        return result.exit_code == 0
+
+
+class JobPool:
+    """
+    Warm pool of long-lived utility jobs leased to tests for exec calls.
+
+    The pool starts min_size jobs upfront and grows on demand up to max_size.
+    Jobs that break, fail a health check or served max_uses leases are killed
+    and replaced. Every xdist worker owns its pool, so the number of jobs
+    follows the number of workers.
+    """
+
+    def __init__(
+        self,
+        helper: "Helper",
+        image: str,
+        *,
+        init_command: str | None = None,
+        resources: Resources | None = None,
+        min_size: int = 1,
+        max_size: int = 4,
+        max_uses: int = POOL_MAX_USES,
+    ) -> None:
+        self._helper = helper
+        self._image = image
+        self._init_command = init_command
+        self._resources = resources
+        self._min_size = min_size
+        self._max_size = max_size
+        self._max_uses = max_uses
+        self._idle: list[PooledJob] = []
+        self._jobs: dict[str, PooledJob] = {}
+        self._size = 0
+        self._cond = asyncio.Condition()
+
+    async def start(self) -> None:
+        async with self._cond:
+            count = max(self._min_size - self._size, 0)
+            self._size += count
+        jobs = await asyncio.gather(
+            *(self._spawn() for _ in range(count)), return_exceptions=True
+        )
+        async with self._cond:
+            for job in jobs:
+                if isinstance(job, PooledJob):
+                    self._idle.append(job)
+                else:
+                    log.warning("Cannot start pooled job: %s", job)
+                    self._size -= 1
+            self._cond.notify_all()
+
+    async def close(self) -> None:
+        jobs = list(self._jobs.values())
+        self._idle.clear()
+        self._jobs.clear()
+        self._size = 0
+        await asyncio.gather(*(self._kill(job) for job in jobs))
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[PooledJob]:
+        job = await self._acquire()
+        try:
+            yield job
+        finally:
+            await self._release(job)
+
+    async def _acquire(self) -> PooledJob:
+        while True:
+            spawn = False
+            async with self._cond:
+                while not self._idle and self._size >= self._max_size:
+                    await self._cond.wait()
+                if self._idle:
+                    job = self._idle.pop()
+                else:
+                    self._size += 1
+                    spawn = True
+            if spawn:
+                try:
+                    return await self._spawn()
+                except BaseException:
+                    async with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            if await job.check():
+                return job
+            await self._recycle(job)
+
+    async def _release(self, job: PooledJob) -> None:
+        if job.broken or job.uses >= self._max_uses:
+            await self._recycle(job)
+            return
+        async with self._cond:
+            self._idle.append(job)
+            self._cond.notify()
+
+    async def _recycle(self, job: PooledJob) -> None:
+        log.info("Recycle pooled job %s", job.id)
+        async with self._cond:
+            self._jobs.pop(job.id, None)
+            self._size -= 1
+            self._cond.notify()
+        await self._kill(job)
+
+    async def _spawn(self) -> PooledJob:
+        job = await self._helper.run_job(
+            self._image,
+            POOL_JOB_COMMAND,
+            description="e2e tests: pooled utility job",
+            resources=self._resources,
+        )
+        pooled = PooledJob(self._helper, job)
+        self._jobs[job.id] = pooled
+        if self._init_command:
+            result = await pooled.exec(self._init_command, timeout=180)
+            if result.exit_code != 0:
+                self._jobs.pop(job.id, None)
+                await self._kill(pooled)
+                raise AssertionError(
+                    f"Pooled job init failed with {result.exit_code}: "
+                    f"{result.stderr}"
+                )
+        return pooled
+
+    async def _kill(self, job: PooledJob) -> None:
+        try:
+            await self._helper.kill_job(job.id)
+        except ResourceNotFound:
+            pass
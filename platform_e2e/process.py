@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import signal
+from collections.abc import Mapping
+
+log = logging.getLogger(__name__)
+
+SHELL_TIMEOUT = 300
+SHELL_MAX_OUTPUT = 1024 * 1024
+SHELL_KILL_GRACE = 5.0
+SHELL_READ_SIZE = 64 * 1024
+
+
+class _Capture:
+    """
+    Keeps the tail of a stream up to a size limit and logs it line by line,
+    lines longer than the limit in parts.
+    """
+
+    def __init__(self, name: str, limit: int) -> None:
+        self._name = name
+        self._limit = limit
+        self._chunks: list[bytes] = []
+        self._size = 0
+        self._dropped = 0
+        self._line = b""
+
+    def feed(self, data: bytes) -> None:
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size > self._limit and len(self._chunks) > 1:
+            dropped = self._chunks.pop(0)
+            self._size -= len(dropped)
+            self._dropped += len(dropped)
+        *lines, self._line = (self._line + data).split(b"\n")
+        for line in lines:
+            self._log(line)
+        limit = self._limit
+        while len(self._line) >= limit:
+            # A line without end is logged in parts of the limit
+            self._log(self._line[:limit])
+            self._line = self._line[limit:]
+
+    def close(self) -> None:
+        if self._line:
+            self._log(self._line)
+            self._line = b""
+
+    def text(self) -> str:
+        data = b"".join(self._chunks)
+        start = max(len(data) - self._limit, 0)
+        dropped = self._dropped + start
+        text = data[start:].decode("utf-8", errors="replace")
+        if dropped:
+            text = f"[{dropped} bytes truncated]\n{text}"
+        return text
+
+    def _log(self, line: bytes) -> None:
+        log.info("%s: %s", self._name, line.decode("utf-8", errors="replace"))
+
+
+async def _pump(stream: asyncio.StreamReader | None, capture: _Capture) -> None:
+    if stream is None:
+        return
+    while data := await stream.read(SHELL_READ_SIZE):
+        capture.feed(data)
+    capture.close()
+
+
+async def _kill_group(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is not None:
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(proc.wait(), SHELL_KILL_GRACE)
+            return
+        except TimeoutError:
+            pass
+
+
+async def run_shell(
+    cmd: str,
+    timeout: float = SHELL_TIMEOUT,
+    *,
+    env: Mapping[str, str] | None = None,
+    max_output: int = SHELL_MAX_OUTPUT,
+) -> str:
+    """
+    Run a shell command without blocking the event loop, return its stdout.
+
+    Output is logged line by line while the command runs and only the last
+    max_output bytes of every stream are kept. The command runs in its own
+    process group, which is killed on timeout or cancellation.
+    """
+    log.info(f"Run {cmd}")
+    proc = await asyncio.create_subprocess_shell(
+        cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+        env=None if env is None else {**os.environ, **env},
+    )
+    stdout = _Capture(f"[{proc.pid}] out", max_output)
+    stderr = _Capture(f"[{proc.pid}] err", max_output)
+    try:
+        async with asyncio.timeout(timeout):
+            await asyncio.gather(
+                _pump(proc.stdout, stdout), _pump(proc.stderr, stderr), proc.wait()
+            )
+    except TimeoutError:
+        await _kill_group(proc)
+        raise TimeoutError(
+            f"Command `{cmd}` timed out after {timeout}s, "
+            f"Stderr: {stderr.text()},"
+            f"Stdout: {stdout.text()}"
+        )
+    except BaseException:
+        await _kill_group(proc)
+        raise
+    if proc.returncode != os.EX_OK:
+        raise SystemError(
+            f"Command `{cmd}` exits with code {proc.returncode}, "
+            f"Stderr: {stderr.text()},"
+            f"Stdout: {stdout.text()}"
+        )
+    return stdout.text()
@@ -0,0 +1,462 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Generator, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+import pytest
+
+log = logging.getLogger(__name__)
+
+# Period of event loop pings, each one measures the loop lag
+LAG_INTERVAL = 0.1
+# A ping late by this long means the loop is blocked, its stack is sampled
+BLOCK_THRESHOLD = 0.05
+SAMPLE_INTERVAL = 0.01
+
+# Synchronous calls which block the event loop of the test calling them
+BLOCKING_CALLS = ("Helper.hash_hex",)
+
+SESSION = "<session>"
+
+
+@dataclass
+class CallStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict[str, float]:
+        return {"count": self.count, "total": self.total, "max": self.max}
+
+
+@dataclass
+class TestProfile:
+    """
+    Where the time of one test went, as seen from the harness.
+
+    helper is the wall time with at least one Helper call in flight, mostly
+    spent waiting for the platform. fixtures and blocking are harness time.
+    """
+
+    nodeid: str
+    phases: dict[str, float] = field(default_factory=dict)
+    fixtures: dict[str, CallStats] = field(default_factory=dict)
+    calls: dict[str, CallStats] = field(default_factory=dict)
+    blocking: dict[str, CallStats] = field(default_factory=dict)
+    helper: float = 0.0
+    loop_lag: CallStats = field(default_factory=CallStats)
+    loop_blocked: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return sum(self.phases.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        def _stats(stats: dict[str, CallStats]) -> dict[str, dict[str, float]]:
+            return {name: item.as_dict() for name, item in sorted(stats.items())}
+
+        return {
+            "nodeid": self.nodeid,
+            "duration": self.duration,
+            "phases": self.phases,
+            "fixtures": _stats(self.fixtures),
+            "fixtures_total": sum(item.total for item in self.fixtures.values()),
+            "helper": self.helper,
+            "calls": _stats(self.calls),
+            "blocking": _stats(self.blocking),
+            "blocking_total": sum(item.total for item in self.blocking.values()),
+            "loop_lag": self.loop_lag.as_dict(),
+            "loop_blocked": self.loop_blocked,
+        }
+
+
+class _Span:
+    __slots__ = ("name", "parent", "prefix", "started", "children", "closed")
+
+    def __init__(self, name: str, parent: "_Span | None", prefix: str) -> None:
+        self.name = name
+        self.parent = parent
+        self.prefix = prefix
+        self.started = time.perf_counter()
+        self.children = 0.0
+        self.closed = False
+
+    @property
+    def stack(self) -> str:
+        names = []
+        span: _Span | None = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return ";".join([self.prefix, *reversed(names)])
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{Path(code.co_filename).stem}.{code.co_qualname}"
+
+
+def _loop_stack(frame: FrameType | None) -> list[str]:
+    """
+    Frames of the blocking callback, root first, without the event loop ones.
+    """
+    frames = []
+    while frame is not None:
+        if frame.f_code.co_name == "_run" and frame.f_code.co_filename.endswith(
+            os.path.join("asyncio", "events.py")
+        ):
+            break
+        frames.append(_frame_name(frame))
+        frame = frame.f_back
+    return frames[::-1]
+
+
+class HarnessProfiler:
+    """
+    Measures how much of a run the harness itself takes.
+
+    Records fixture setup and teardown, every Helper call, synchronous calls
+    blocking the event loop and the event loop lag, per test. A monitor
+    thread pings the loop of the Helper calls and samples its stack while a
+    ping is late. Time is written per test as JSON and as collapsed stacks
+    of test, phase, fixture and call spans for flamegraph tools.
+    """
+
+    def __init__(
+        self,
+        prefix: Path,
+        *,
+        lag_interval: float = LAG_INTERVAL,
+        block_threshold: float = BLOCK_THRESHOLD,
+        sample_interval: float = SAMPLE_INTERVAL,
+    ) -> None:
+        self._prefix = prefix
+        self._lag_interval = lag_interval
+        self._block_threshold = block_threshold
+        self._sample_interval = sample_interval
+        self.tests: dict[str, TestProfile] = {}
+        # Collapsed stacks to microseconds of self time
+        self.stacks: Counter[str] = Counter()
+        self._test = self._profile(SESSION)
+        self._phase = "session"
+        self._phase_blocked = 0.0
+        self._phase_span: _Span | None = None
+        self._current_span: ContextVar[_Span | None] = ContextVar(
+            f"e2e_span_{id(self)}", default=None
+        )
+        self._lock = threading.Lock()
+        self._patched: list[tuple[Any, str, Any]] = []
+        self._teardowns: dict[Any, tuple[_Span, Any]] = {}
+        self._in_flight = 0
+        self._busy_since = 0.0
+        self._loop: tuple[asyncio.AbstractEventLoop, int] | None = None
+        self._stop = threading.Event()
+        self._monitor: threading.Thread | None = None
+
+    # Instrumentation
+
+    def install(self) -> None:
+        """
+        Wrap the Helper methods and run_shell, and start the loop monitor.
+        """
+        import platform_e2e
+        from platform_e2e import Helper
+
+        for name, value in list(vars(Helper).items()):
+            if name.startswith("_") or not inspect.isfunction(value):
+                continue
+            wrapped = getattr(value, "__wrapped__", None)
+            if wrapped is not None and inspect.isasyncgenfunction(wrapped):
+                # Context managers span the caller's block, not a call
+                continue
+            self._patch(Helper, name, f"Helper.{name}")
+        # Modules importing it later, like test modules, get the wrapper
+        self._patch(platform_e2e, "run_shell", "run_shell")
+        self._stop.clear()
+        self._monitor = threading.Thread(
+            target=self._monitor_loop, name="e2e-profiler", daemon=True
+        )
+        self._monitor.start()
+
+    def uninstall(self) -> None:
+        while self._patched:
+            owner, name, original = self._patched.pop()
+            setattr(owner, name, original)
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+
+    def _patch(self, owner: Any, name: str, span_name: str) -> None:
+        original = getattr(owner, name)
+        self._patched.append((owner, name, original))
+        setattr(owner, name, self._wrap(original, span_name))
+
+    def _wrap(self, func: Callable[..., Any], name: str) -> Callable[..., Any]:
+        blocking = name in BLOCKING_CALLS
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def _async_call(*args: Any, **kwargs: Any) -> Any:
+                self.watch_loop()
+                with self._call(name, blocking):
+                    return await func(*args, **kwargs)
+
+            return _async_call
+
+        @functools.wraps(func)
+        def _call(*args: Any, **kwargs: Any) -> Any:
+            self.watch_loop()
+            with self._call(name, blocking):
+                return func(*args, **kwargs)
+
+        return _call
+
+    @contextmanager
+    def _call(self, name: str, blocking: bool) -> Iterator[None]:
+        test = self._test
+        now = time.perf_counter()
+        if self._in_flight == 0:
+            self._busy_since = now
+        self._in_flight += 1
+        try:
+            with self.span(name) as span:
+                yield
+        finally:
+            elapsed = time.perf_counter() - span.started
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                test.helper += time.perf_counter() - self._busy_since
+            stats = test.blocking if blocking else test.calls
+            stats.setdefault(name, CallStats()).add(elapsed)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[_Span]:
+        """
+        Time a block as a child of the current span.
+        """
+        parent = self._parent()
+        prefix = parent.prefix if parent is not None else self._stack_prefix()
+        span = _Span(name, parent, prefix)
+        token = self._current_span.set(span)
+        try:
+            yield span
+        finally:
+            self._current_span.reset(token)
+            self._close(span)
+
+    def _parent(self) -> _Span | None:
+        parent = self._current_span.get()
+        if parent is None or not parent.closed:
+            return parent
+        # Async fixtures tear down in the context copied at their setup
+        if self._teardowns:
+            return next(reversed(self._teardowns.values()))[0]
+        return self._phase_span
+
+    def _close(self, span: _Span) -> float:
+        span.closed = True
+        elapsed = time.perf_counter() - span.started
+        if span.parent is not None:
+            span.parent.children += elapsed
+        # Concurrent children may add up to more than their parent
+        own = max(elapsed - span.children, 0.0)
+        with self._lock:
+            self.stacks[span.stack] += round(own * 10**6)
+        return elapsed
+
+    def _stack_prefix(self) -> str:
+        return self._test.nodeid.replace(";", ",")
+
+    def _profile(self, nodeid: str) -> TestProfile:
+        return self.tests.setdefault(nodeid, TestProfile(nodeid))
+
+    @contextmanager
+    def phase(self, nodeid: str, phase: str) -> Iterator[None]:
+        """
+        Attribute everything recorded in the block to a test phase.
+        """
+        self._test = self._profile(nodeid)
+        self._phase = phase
+        self._phase_blocked = 0.0
+        started = time.perf_counter()
+        try:
+            with self.span(phase) as span:
+                self._phase_span = span
+                try:
+                    yield
+                finally:
+                    # Sampled blocked loop stacks are under the phase too
+                    span.children += self._phase_blocked
+        finally:
+            phases = self._test.phases
+            phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+            self._test = self._profile(SESSION)
+            self._phase = "session"
+            self._phase_span = None
+
+    # Event loop monitor
+
+    def watch_loop(self) -> None:
+        """
+        Monitor the running event loop of the caller, if any.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is None or self._loop[0] is not loop:
+            self._loop = (loop, threading.get_ident())
+
+    def _monitor_loop(self) -> None:
+        while not self._stop.wait(self._lag_interval):
+            if self._loop is None:
+                continue
+            loop, thread_id = self._loop
+            # The loop is idle between async tests and fixtures
+            if loop.is_closed() or not loop.is_running():
+                continue
+            pong = threading.Event()
+            sent = time.perf_counter()
+            try:
+                loop.call_soon_threadsafe(pong.set)
+            except RuntimeError:
+                continue
+            samples: list[str] = []
+            while not pong.wait(self._sample_interval):
+                if self._stop.is_set() or not loop.is_running():
+                    break
+                if time.perf_counter() - sent >= self._block_threshold:
+                    frame = sys._current_frames().get(thread_id)
+                    samples.append(";".join(_loop_stack(frame)))
+            else:
+                self._record_lag(time.perf_counter() - sent, samples)
+
+    def _record_lag(self, lag: float, samples: list[str]) -> None:
+        test = self._test
+        prefix = f"{self._stack_prefix()};{self._phase};loop blocked"
+        with self._lock:
+            test.loop_lag.add(lag)
+            test.loop_blocked += len(samples) * self._sample_interval
+            self._phase_blocked += len(samples) * self._sample_interval
+            for stack in samples:
+                self.stacks[f"{prefix};{stack}"] += round(self._sample_interval * 10**6)
+
+    # Hooks
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_setup(self, item: pytest.Item) -> Generator[None, None, None]:
+        with self.phase(item.nodeid, "setup"):
+            return (yield)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item) -> Generator[None, None, None]:
+        with self.phase(item.nodeid, "call"):
+            return (yield)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_teardown(self, item: pytest.Item) -> Generator[None, None, None]:
+        with self.phase(item.nodeid, "teardown"):
+            return (yield)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_fixture_setup(
+        self, fixturedef: pytest.FixtureDef[Any]
+    ) -> Generator[None, object, object]:
+        name = f"fixture {fixturedef.argname}"
+        with self.span(name) as span:
+            result = yield
+        stats = self._test.fixtures.setdefault(f"{name} setup", CallStats())
+        stats.add(time.perf_counter() - span.started)
+        # Finalizers run last in first out, this one right before the teardown
+        fixturedef.addfinalizer(functools.partial(self._teardown_started, fixturedef))
+        return result
+
+    def _teardown_started(self, fixturedef: pytest.FixtureDef[Any]) -> None:
+        parent = self._parent()
+        span = _Span(
+            f"fixture {fixturedef.argname}",
+            parent,
+            parent.prefix if parent is not None else self._stack_prefix(),
+        )
+        self._teardowns[fixturedef] = (span, self._current_span.set(span))
+
+    def pytest_fixture_post_finalizer(self, fixturedef: pytest.FixtureDef[Any]) -> None:
+        started = self._teardowns.pop(fixturedef, None)
+        if started is None:
+            return
+        span, token = started
+        self._current_span.reset(token)
+        elapsed = self._close(span)
+        name = f"{span.name} teardown"
+        self._test.fixtures.setdefault(name, CallStats()).add(elapsed)
+
+    def pytest_sessionfinish(self) -> None:
+        # The xdist controller runs no tests, its workers write their own
+        if any(profile.phases for profile in self.tests.values()):
+            self.write()
+
+    def pytest_unconfigure(self) -> None:
+        self.uninstall()
+
+    def pytest_terminal_summary(self, terminalreporter: Any) -> None:
+        summary = self.summary()
+        if not summary["duration"]:
+            return
+        terminalreporter.write_line(
+            "e2e profile: {duration:.1f}s in tests, fixtures {fixtures:.1f}s, "
+            "helper calls {helper:.1f}s, blocking calls {blocking:.1f}s, "
+            "loop blocked {loop_blocked:.1f}s, max loop lag {max_loop_lag:.2f}s; "
+            "written to {path}".format(**summary, path=self._prefix)
+        )
+
+    # Reports
+
+    def summary(self) -> dict[str, float]:
+        tests = [self.tests[nodeid].as_dict() for nodeid in self.tests]
+        return {
+            "duration": sum(test["duration"] for test in tests),
+            "fixtures": sum(test["fixtures_total"] for test in tests),
+            "helper": sum(test["helper"] for test in tests),
+            "blocking": sum(test["blocking_total"] for test in tests),
+            "loop_blocked": sum(test["loop_blocked"] for test in tests),
+            "max_loop_lag": max(
+                (test["loop_lag"]["max"] for test in tests), default=0.0
+            ),
+        }
+
+    def write(self) -> None:
+        data = {
+            "session": self.summary(),
+            "tests": [profile.as_dict() for profile in self.tests.values()],
+        }
+        self._prefix.with_name(f"{self._prefix.name}.json").write_text(
+            json.dumps(data, indent=2)
+        )
+        with self._lock:
+            lines = [
+                f"{stack} {value}"
+                for stack, value in sorted(self.stacks.items())
+                if value > 0
+            ]
+        self._prefix.with_name(f"{self._prefix.name}.collapsed").write_text(
+            "\n".join(lines) + "\n"
+        )
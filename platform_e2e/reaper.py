@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Collection
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from apolo_sdk import JobDescription
+
+from .watcher import (
+    ACTIVE_STATUSES,
+    POLL_BACKOFF,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+)
+
+if TYPE_CHECKING:
+    from . import Helper
+
+log = logging.getLogger(__name__)
+
+REAP_CONCURRENCY = 32
+REAP_TIMEOUT = 180
+
+
+async def reap_jobs(
+    helper: "Helper",
+    tag: str,
+    *,
+    concurrency: int = REAP_CONCURRENCY,
+    timeout: float = REAP_TIMEOUT,
+    until: datetime | None = None,
+    keep_tags: Collection[str] = (),
+) -> int:
+    """
+    Kill all active jobs with tag and wait until they are finished.
+
+    Jobs are found by one list query, optionally only those created before
+    until and without any of keep_tags, killed concurrently and awaited by
+    repeating the list query until none of them is active.
+    """
+    jobs = [
+        job
+        async for job in _active(helper, tag, until)
+        if not set(job.tags) & set(keep_tags)
+    ]
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _kill(job_id: str) -> None:
+        async with sem:
+            await helper.kill_job(job_id)
+
+    killed = await asyncio.gather(
+        *(_kill(job.id) for job in jobs), return_exceptions=True
+    )
+    for job, exc in zip(jobs, killed):
+        if isinstance(exc, Exception):
+            log.warning("Cannot kill job %s: %s", job.id, exc)
+    # Swept jobs are not watched by the watcher of this run, one list query
+    # per tick confirms all of them instead of a status query per job
+    remaining = {job.id for job in jobs}
+    interval = POLL_MIN_INTERVAL
+    try:
+        async with asyncio.timeout(timeout):
+            while remaining:
+                await asyncio.sleep(interval)
+                remaining &= {job.id async for job in _active(helper, tag, until)}
+                interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+    except TimeoutError:
+        log.warning("Jobs are not finished: %s", ", ".join(sorted(remaining)))
+    return len(jobs)
+
+
+async def _active(
+    helper: "Helper", tag: str, until: datetime | None
+) -> AsyncIterator[JobDescription]:
+    client = helper.client
+    async with client.jobs.list(
+        statuses=ACTIVE_STATUSES,
+        tags=[tag],
+        project_names=[client.config.project_name_or_raise],
+        until=until,
+    ) as it:
+        async for job in it:
+            yield job
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import warnings
+from collections.abc import Iterable
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+# Private API: runtestprotocol runs the phases with call_and_report and sets up
+# the request with Function._initrequest in pytest >=8.0,<9.1, as does
+# pytest-rerunfailures. Recheck _run_once against it when bumping the pin.
+from _pytest.runner import call_and_report
+from filelock import FileLock
+
+from .http import RetryPolicy
+from .ordering import history_key
+
+log = logging.getLogger(__name__)
+
+HISTORY_SIZE = 20
+QUARANTINE_MIN_RUNS = 5
+QUARANTINE_FLAKY_RATE = 0.2
+RETRY_MAX_DELAY = 60.0
+
+# Per run outcomes kept in the history
+PASSED = "P"
+RETRIED = "R"
+FAILED = "F"
+
+
+class FlakyHistory:
+    """
+    Recent outcomes of every test, kept on disk between runs.
+
+    A test that needed a retry to pass is flaky; one that failed every
+    attempt is not, it is broken. Outcomes of this run are merged into the
+    file under a lock, so concurrent runs do not lose each other's updates.
+    """
+
+    def __init__(self, root: Path, size: int = HISTORY_SIZE) -> None:
+        self._root = root
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._path = root / "history.json"
+        self._lock = FileLock(root / "history.lock")
+        self._size = size
+        self._runs = self._read()
+        self._pending: dict[str, str] = {}
+
+    def outcomes(self, nodeid: str) -> str:
+        return self._runs.get(history_key(nodeid), "")
+
+    def flaky_rate(self, nodeid: str) -> float:
+        outcomes = self.outcomes(nodeid)
+        if not outcomes:
+            return 0.0
+        return outcomes.count(RETRIED) / len(outcomes)
+
+    def is_flaky(self, nodeid: str) -> bool:
+        return (
+            len(self.outcomes(nodeid)) >= QUARANTINE_MIN_RUNS
+            and self.flaky_rate(nodeid) >= QUARANTINE_FLAKY_RATE
+        )
+
+    def record(self, nodeid: str, outcome: str) -> None:
+        self._pending[history_key(nodeid)] = outcome
+
+    def save(self) -> None:
+        if not self._pending:
+            return
+        with self._lock:
+            runs = self._read()
+            for nodeid, outcome in self._pending.items():
+                start = max(len(runs.get(nodeid, "")) + 1 - self._size, 0)
+                runs[nodeid] = (runs.get(nodeid, "") + outcome)[start:]
+            tmp = self._path.with_suffix(f".{uuid4().hex}.tmp")
+            tmp.write_text(json.dumps(runs, indent=2, sort_keys=True))
+            os.replace(tmp, self._path)
+        self._runs = runs
+        self._pending = {}
+
+    def _read(self) -> dict[str, str]:
+        try:
+            return json.loads(self._path.read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+def retries_for(item: pytest.Item, default: int) -> int:
+    marker = item.get_closest_marker("retries")
+    if marker is None:
+        return default
+    return int(marker.args[0] if marker.args else marker.kwargs["count"])
+
+
+def _retryable(reports: Iterable[pytest.TestReport]) -> bool:
+    return any(
+        report.failed and report.when != "teardown" and not hasattr(report, "wasxfail")
+        for report in reports
+    )
+
+
+def _forget_errors(item: pytest.Item) -> None:
+    # Higher scoped fixtures cache their setup error, so a retry would raise
+    # it again without running the fixture
+    fixtureinfo = getattr(item, "_fixtureinfo", None)
+    if fixtureinfo is None:
+        return
+    for fixturedefs in fixtureinfo.name2fixturedefs.values():
+        for fixturedef in fixturedefs:
+            cached = fixturedef.cached_result
+            if cached is not None and cached[2] is not None:
+                fixturedef.cached_result = None
+
+
+def _run_once(
+    item: pytest.Item, nextitem: pytest.Item | None, final: bool
+) -> tuple[list[pytest.TestReport], bool]:
+    """
+    Run setup, call and teardown of item like runtestprotocol does.
+
+    Unless this is the final attempt a failure is reported as rerun and
+    teardown keeps everything above the test function, so the retry reuses
+    module and session fixtures.
+    """
+    if hasattr(item, "_request") and not item._request:
+        item._initrequest()  # type: ignore[attr-defined]
+    reports = [call_and_report(item, "setup", log=False)]
+    if reports[0].passed:
+        reports.append(call_and_report(item, "call", log=False))
+    retry = not final and _retryable(reports)
+    if item.session.shouldfail or item.session.shouldstop:
+        nextitem = None
+        retry = False
+    # The parent collector as next item tears down function scoped fixtures only
+    teardown_next = item.parent if retry else nextitem
+    reports.append(call_and_report(item, "teardown", log=False, nextitem=teardown_next))
+    if hasattr(item, "_request"):
+        item._request = False
+        item.funcargs = None  # type: ignore[attr-defined]
+    for report in reports:
+        if retry:
+            # Survives xdist report serialization, unlike the attempt itself
+            report.e2e_retried = True  # type: ignore[attr-defined]
+            if report.failed:
+                report.outcome = "rerun"  # type: ignore[assignment]
+        item.ihook.pytest_runtest_logreport(report=report)
+    return reports, retry
+
+
+def _wait(delay: float) -> None:
+    """
+    Sleep between attempts without stalling the current event loop.
+
+    Between tests the session loop of pytest-asyncio is current but idle, so
+    it is run for the delay and its background tasks, like job watchers and
+    server reapers, keep going.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            loop = asyncio.get_event_loop()
+        except RuntimeError:
+            loop = None
+    if loop is None or loop.is_closed() or loop.is_running():
+        time.sleep(delay)
+    else:
+        loop.run_until_complete(asyncio.sleep(delay))
+
+
+def run_with_retries(
+    item: pytest.Item, nextitem: pytest.Item | None, retries: int, base_delay: float
+) -> None:
+    policy = RetryPolicy(base_delay=base_delay, max_delay=RETRY_MAX_DELAY)
+    item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+    for attempt in range(retries + 1):
+        reports, retry = _run_once(item, nextitem, final=attempt == retries)
+        if not retry:
+            break
+        failed = next(report for report in reports if report.outcome == "rerun")
+        delay = policy.delay(attempt)
+        log.warning(
+            "Retry %s in %.1fs after %s failure, attempt %d of %d",
+            item.nodeid,
+            delay,
+            failed.when,
+            attempt + 1,
+            retries,
+        )
+        _forget_errors(item)
+        _wait(delay)
+    item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+
+class RetryPlugin:
+    """
+    Retries failed tests in process and keeps their flakiness history.
+
+    Reports of failed attempts get the rerun outcome, so they neither fail
+    the session nor trip --exitfirst, and are shown as R.
+    """
+
+    def __init__(
+        self,
+        history: FlakyHistory,
+        *,
+        retries: int = 0,
+        base_delay: float = 5.0,
+        quarantine: bool = False,
+        flaky_first: bool = False,
+    ) -> None:
+        self.history = history
+        self._retries = retries
+        self._base_delay = base_delay
+        self._quarantine = quarantine
+        self._flaky_first = flaky_first
+        self._retried: set[str] = set()
+        self._failed: set[str] = set()
+        self._skipped: set[str] = set()
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, items: list[pytest.Item]) -> None:
+        # Runs after the history based ordering, flaky first takes precedence
+        flaky = [item for item in items if self.history.is_flaky(item.nodeid)]
+        if not flaky:
+            return
+        if self._quarantine:
+            for item in flaky:
+                rate = self.history.flaky_rate(item.nodeid)
+                item.add_marker(
+                    pytest.mark.xfail(
+                        reason=f"quarantined, needed a retry in {rate:.0%} of runs",
+                        strict=False,
+                    )
+                )
+        elif self._flaky_first:
+            first = set(flaky)
+            items[:] = flaky + [item for item in items if item not in first]
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(
+        self, item: pytest.Item, nextitem: pytest.Item | None
+    ) -> bool | None:
+        config = item.config
+        retries = retries_for(item, self._retries)
+        if retries <= 0 or config.option.setuponly or config.option.setupplan:
+            return None
+        run_with_retries(item, nextitem, retries, self._base_delay)
+        return True
+
+    def pytest_report_teststatus(
+        self, report: pytest.TestReport
+    ) -> tuple[str, str, tuple[str, dict[str, bool]]] | None:
+        if report.outcome == "rerun":
+            return "rerun", "R", ("RERUN", {"yellow": True})
+        return None
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        if report.outcome == "rerun":
+            self._retried.add(report.nodeid)
+        elif report.failed and not hasattr(report, "wasxfail"):
+            self._failed.add(report.nodeid)
+        elif report.skipped:
+            # Skipped and xfailed runs, quarantined ones included, say nothing
+            self._skipped.add(report.nodeid)
+        if report.when != "teardown" or getattr(report, "e2e_retried", False):
+            return
+        if report.nodeid in self._failed:
+            outcome = FAILED
+        elif report.nodeid in self._skipped:
+            outcome = ""
+        elif report.nodeid in self._retried:
+            outcome = RETRIED
+        else:
+            outcome = PASSED
+        for seen in (self._retried, self._failed, self._skipped):
+            seen.discard(report.nodeid)
+        if outcome:
+            self.history.record(report.nodeid, outcome)
+
+    def pytest_sessionfinish(self, session: pytest.Session) -> None:
+        # The controller sees reports of all xdist workers and saves for them
+        if not hasattr(session.config, "workerinput"):
+            self.history.save()
@@ -0,0 +1,67 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import aiobotocore.session
+from aiobotocore.config import AioConfig
+from apolo_sdk import Bucket, Client
+
+S3_CHUNK_SIZE = 1024 * 1024
+
+S3_PROVIDERS = frozenset(
+    {Bucket.Provider.AWS, Bucket.Provider.MINIO, Bucket.Provider.OPEN_STACK}
+)
+
+
+async def s3_credentials(
+    client: Client, bucket_name_or_id: str
+) -> dict[str, str] | None:
+    """
+    Temporary S3 credentials of a bucket, None unless it is S3-compatible.
+    """
+    bucket = await client.buckets.get(bucket_name_or_id)
+    if bucket.provider not in S3_PROVIDERS:
+        return None
+    creds = await client.buckets.request_tmp_credentials(bucket.id)
+    credentials = dict(creds.credentials)
+    if not {"access_key_id", "secret_access_key", "bucket_name"} <= set(credentials):
+        return None
+    return credentials
+
+
+@asynccontextmanager
+async def s3_client(
+    credentials: dict[str, str], *, max_connections: int
+) -> AsyncIterator[Any]:
+    session = aiobotocore.session.get_session()
+    # Checksums are computed when required, DeleteObjects needs one
+    config = AioConfig(
+        max_pool_connections=max_connections,
+        request_checksum_calculation="when_required",
+        response_checksum_validation="when_required",
+    )
+    async with session.create_client(
+        "s3",
+        endpoint_url=credentials.get("endpoint_url"),
+        region_name=credentials.get("region_name"),
+        aws_access_key_id=credentials["access_key_id"],
+        aws_secret_access_key=credentials["secret_access_key"],
+        aws_session_token=credentials.get("session_token"),
+        config=config,
+    ) as s3:
+        yield s3
+
+
+@asynccontextmanager
+async def read_range(
+    s3: Any, bucket_name: str, key: str, offset: int, size: int
+) -> AsyncIterator[AsyncIterator[bytes]]:
+    """
+    Stream size bytes of an object from offset with an end-bounded Range GET.
+    """
+    resp = await s3.get_object(
+        Bucket=bucket_name, Key=key, Range=f"bytes={offset}-{offset + size - 1}"
+    )
+    body = resp["Body"]
+    async with body:
+        yield body.iter_chunks(S3_CHUNK_SIZE)
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import secrets
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+from apolo_sdk import HTTPPort, JobDescription, JobStatus, ResourceNotFound, Resources
+
+if TYPE_CHECKING:
+    from . import Helper
+
+log = logging.getLogger(__name__)
+
+# An idle server is killed after this many seconds unless leased again
+SERVER_LINGER = 600
+
+
+@dataclass(frozen=True)
+class ServerSpec:
+    """
+    Server job shared by tests with equal specs.
+
+    command starts the server and rotate_command replaces its secret in
+    place, both are formatted with the secret. Servers get a random job name
+    unless name is set.
+    """
+
+    image: str
+    command: str
+    rotate_command: str
+    http_port: int | None = None
+    http_auth: bool = False
+    resources: Resources | None = None
+    name: str | None = None
+    description: str | None = field(default=None, compare=False)
+
+
+@dataclass
+class SharedServer:
+    spec: ServerSpec
+    job: JobDescription
+    secret: str
+    refs: int = 0
+
+    @property
+    def id(self) -> str:
+        return self.job.id
+
+
+class ServerCache:
+    """
+    Long-lived server jobs memoized by spec and reference counted by leases.
+
+    Every lease that is not concurrent with another one rotates the secret,
+    so tests never see the secret of a previous test. A server nobody leases
+    lingers for a while to serve the next test, and is replaced when its
+    job is no longer running. Every xdist worker owns its cache.
+    """
+
+    def __init__(self, helper: "Helper", *, linger: float = SERVER_LINGER) -> None:
+        self._helper = helper
+        self._linger = linger
+        self._servers: dict[ServerSpec, SharedServer] = {}
+        self._locks: dict[ServerSpec, asyncio.Lock] = {}
+        self._reapers: dict[ServerSpec, asyncio.Task[None]] = {}
+        self.started = 0
+
+    async def close(self) -> None:
+        for reaper in self._reapers.values():
+            reaper.cancel()
+        self._reapers.clear()
+        servers = list(self._servers.values())
+        self._servers.clear()
+        await asyncio.gather(*(self._kill(server) for server in servers))
+
+    @asynccontextmanager
+    async def lease(self, spec: ServerSpec) -> AsyncIterator[SharedServer]:
+        server = await self._acquire(spec)
+        try:
+            yield server
+        finally:
+            self._release(server)
+
+    async def _acquire(self, spec: ServerSpec) -> SharedServer:
+        async with self._locks.setdefault(spec, asyncio.Lock()):
+            reaper = self._reapers.pop(spec, None)
+            if reaper is not None:
+                reaper.cancel()
+            server = self._servers.get(spec)
+            if server is not None and server.refs == 0:
+                if not await self._reuse(server):
+                    self._servers.pop(spec, None)
+                    await self._kill(server)
+                    server = None
+            if server is None:
+                server = await self._start(spec)
+                self._servers[spec] = server
+            server.refs += 1
+            return server
+
+    def _release(self, server: SharedServer) -> None:
+        server.refs -= 1
+        if server.refs == 0 and self._servers.get(server.spec) is server:
+            self._reapers[server.spec] = asyncio.create_task(self._reap(server))
+
+    async def _reap(self, server: SharedServer) -> None:
+        await asyncio.sleep(self._linger)
+        async with self._locks[server.spec]:
+            if server.refs or self._servers.get(server.spec) is not server:
+                return
+            self._reapers.pop(server.spec, None)
+            del self._servers[server.spec]
+        log.info("Kill idle server job %s", server.id)
+        await self._kill(server)
+
+    async def _start(self, spec: ServerSpec) -> SharedServer:
+        secret = str(uuid4())
+        http = HTTPPort(spec.http_port, spec.http_auth) if spec.http_port else None
+        job = await self._helper.run_job(
+            spec.image,
+            spec.command.format(secret=secret),
+            # Named, so that tests can reach it by its named hostname too
+            name=spec.name or f"e2e-server-{secrets.token_hex(4)}",
+            description=spec.description or "e2e tests: shared server",
+            http=http,
+            resources=spec.resources,
+        )
+        self.started += 1
+        log.info("Started server job %s for %s", job.id, spec.image)
+        return SharedServer(spec, job, secret)
+
+    async def _reuse(self, server: SharedServer) -> bool:
+        """
+        Rotate secret of a running server, False if it cannot serve anymore.
+        """
+        try:
+            job = await self._helper.client.jobs.status(server.id)
+            if job.status != JobStatus.RUNNING:
+                log.warning("Server job %s is %s", server.id, job.status)
+                return False
+            secret = str(uuid4())
+            result = await self._helper.exec(
+                server.id, server.spec.rotate_command.format(secret=secret)
+            )
+        except Exception as exc:
+            log.warning("Cannot reuse server job %s: %s", server.id, exc)
+            return False
+        if result.exit_code != 0:
+            log.warning(
+                "Secret rotation in %s failed with %d: %s",
+                server.id,
+                result.exit_code,
+                result.stderr,
+            )
+            return False
+        server.secret = secret
+        return True
+
+    async def _kill(self, server: SharedServer) -> None:
+        try:
+            await self._helper.kill_job(server.id)
+        except ResourceNotFound:
+            pass
@@ -0,0 +1,286 @@
+import json
+import re
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from apolo_sdk import JobDescription, JobStatus
+
+from .bench import percentile
+
+TIMELINE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+
+# Platform reasons of pending transitions grouped into phases
+PENDING_PHASES = {
+    "creating": "schedule",
+    "collected": "schedule",
+    "scheduling": "schedule",
+    "pulling": "image_pull",
+    "pullingimage": "image_pull",
+    "containercreating": "container_start",
+}
+
+
+def _seconds(start: datetime | None, end: datetime | None) -> float | None:
+    if start is None or end is None:
+        return None
+    return max((end - start).total_seconds(), 0.0)
+
+
+@dataclass
+class JobTimeline:
+    """
+    Timestamps of one job, as seen by the harness and by the platform.
+    """
+
+    job_id: str
+    image: str
+    test: str | None = None
+    submitted_at: datetime | None = None
+    accepted_at: datetime | None = None
+    pending_at: datetime | None = None
+    running_at: datetime | None = None
+    finished_at: datetime | None = None
+    kill_requested_at: datetime | None = None
+    killed_at: datetime | None = None
+    status: JobStatus | None = None
+    job: JobDescription | None = field(default=None, repr=False)
+
+    def observe(self, job: JobDescription, now: datetime) -> None:
+        self.job = job
+        self.status = job.status
+        if job.status == JobStatus.PENDING and self.pending_at is None:
+            self.pending_at = now
+        if job.status == JobStatus.RUNNING and self.running_at is None:
+            self.running_at = now
+        if job.status.is_finished and self.finished_at is None:
+            self.finished_at = now
+
+    def pending_transitions(self) -> list[tuple[str, float]]:
+        """
+        Durations of pending sub-states reported by the platform.
+        """
+        if self.job is None:
+            return []
+        transitions = list(self.job.history.transitions)
+        result = []
+        for item, following in zip(transitions, transitions[1:]):
+            if item.status != JobStatus.PENDING:
+                continue
+            duration = _seconds(item.transition_time, following.transition_time)
+            if duration is not None:
+                result.append((item.reason or "unknown", duration))
+        return result
+
+    def phases(self) -> dict[str, float]:
+        """
+        Phase durations in seconds, only phases with both ends known.
+        """
+        history = self.job.history if self.job is not None else None
+        phases: dict[str, float | None] = {
+            "submit": _seconds(self.submitted_at, self.accepted_at),
+            "to_running": _seconds(self.submitted_at, self.running_at),
+            "to_finished": _seconds(self.submitted_at, self.finished_at),
+            "kill_ack": _seconds(self.kill_requested_at, self.killed_at),
+        }
+        if history is not None:
+            phases["pending"] = _seconds(history.created_at, history.started_at)
+            phases["run"] = _seconds(history.started_at, history.finished_at)
+            # Polling delay between the platform transition and our observation
+            phases["observe_lag"] = _seconds(history.started_at, self.running_at)
+            if self.kill_requested_at is not None:
+                phases["kill_to_finished"] = _seconds(
+                    self.kill_requested_at, history.finished_at
+                )
+        for reason, duration in self.pending_transitions():
+            key = re.sub(r"[^a-z]", "", reason.lower())
+            phase = PENDING_PHASES.get(key, "pending_other")
+            phases[phase] = (phases.get(phase) or 0.0) + duration
+        return {name: value for name, value in phases.items() if value is not None}
+
+    def as_dict(self) -> dict[str, Any]:
+        def _iso(value: datetime | None) -> str | None:
+            return value.isoformat() if value is not None else None
+
+        history = self.job.history if self.job is not None else None
+        return {
+            "job_id": self.job_id,
+            "image": self.image,
+            "test": self.test,
+            "status": str(self.status) if self.status is not None else None,
+            "submitted_at": _iso(self.submitted_at),
+            "accepted_at": _iso(self.accepted_at),
+            "pending_at": _iso(self.pending_at),
+            "running_at": _iso(self.running_at),
+            "finished_at": _iso(self.finished_at),
+            "kill_requested_at": _iso(self.kill_requested_at),
+            "killed_at": _iso(self.killed_at),
+            "platform": (
+                {
+                    "created_at": _iso(history.created_at),
+                    "started_at": _iso(history.started_at),
+                    "finished_at": _iso(history.finished_at),
+                    "transitions": [
+                        {
+                            "status": str(item.status),
+                            "reason": item.reason,
+                            "at": _iso(item.transition_time),
+                        }
+                        for item in history.transitions
+                    ],
+                }
+                if history is not None
+                else None
+            ),
+            "phases": self.phases(),
+        }
+
+
+def _buckets(values: list[float]) -> dict[str, int]:
+    """
+    Cumulative counts of values up to every bucket bound, like Prometheus.
+    """
+    buckets = {
+        str(bound): sum(1 for value in values if value <= bound)
+        for bound in TIMELINE_BUCKETS
+    }
+    buckets["+Inf"] = len(values)
+    return buckets
+
+
+def _summary(values: list[float]) -> dict[str, Any]:
+    return {
+        "count": len(values),
+        "sum": sum(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+        "buckets": _buckets(values),
+    }
+
+
+def _histogram(metric: str, labels: str, values: list[float]) -> list[str]:
+    lines = [
+        f'{metric}_bucket{{{labels},le="{bound}"}} {count}'
+        for bound, count in _buckets(values).items()
+    ]
+    lines.append(f"{metric}_sum{{{labels}}} {sum(values)}")
+    lines.append(f"{metric}_count{{{labels}}} {len(values)}")
+    return lines
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TimelineRecorder:
+    """
+    Collects lifecycle timelines of jobs started by the harness.
+
+    Jobs are attributed to current_test, which the pytest plugin sets around
+    every test. Per-test and per-session phase histograms over
+    TIMELINE_BUCKETS and percentiles are written as JSON and as a Prometheus
+    textfile.
+    """
+
+    def __init__(self) -> None:
+        self._timelines: dict[str, JobTimeline] = {}
+        self.current_test: str | None = None
+
+    @property
+    def timelines(self) -> list[JobTimeline]:
+        return list(self._timelines.values())
+
+    def get(self, job_id: str) -> JobTimeline | None:
+        return self._timelines.get(job_id)
+
+    def submitted(
+        self, job: JobDescription, image: str, submitted_at: datetime
+    ) -> JobTimeline:
+        now = datetime.now(UTC)
+        timeline = JobTimeline(
+            job.id,
+            image,
+            test=self.current_test,
+            submitted_at=submitted_at,
+            accepted_at=now,
+        )
+        self._timelines[job.id] = timeline
+        timeline.observe(job, now)
+        return timeline
+
+    def observe(self, job: JobDescription) -> None:
+        timeline = self._timelines.get(job.id)
+        if timeline is not None:
+            timeline.observe(job, datetime.now(UTC))
+
+    def kill_requested(self, job_id: str) -> None:
+        timeline = self._timelines.get(job_id)
+        if timeline is not None and timeline.kill_requested_at is None:
+            timeline.kill_requested_at = datetime.now(UTC)
+
+    def killed(self, job_id: str) -> None:
+        timeline = self._timelines.get(job_id)
+        if timeline is not None and timeline.killed_at is None:
+            timeline.killed_at = datetime.now(UTC)
+
+    def unfinished(self) -> list[str]:
+        return [
+            timeline.job_id
+            for timeline in self._timelines.values()
+            if timeline.status is None or not timeline.status.is_finished
+        ]
+
+    def _phases(self, timelines: Iterable[JobTimeline]) -> dict[str, list[float]]:
+        phases: dict[str, list[float]] = defaultdict(list)
+        for timeline in timelines:
+            for name, value in timeline.phases().items():
+                phases[name].append(value)
+        return phases
+
+    def _by_test(self) -> dict[str, list[JobTimeline]]:
+        by_test: dict[str, list[JobTimeline]] = defaultdict(list)
+        for timeline in self._timelines.values():
+            by_test[timeline.test or "<session>"].append(timeline)
+        return by_test
+
+    def write_json(self, path: Path) -> None:
+        data = {
+            "session": {
+                name: _summary(values)
+                for name, values in sorted(self._phases(self.timelines).items())
+            },
+            "tests": {
+                test: {
+                    name: _summary(values)
+                    for name, values in sorted(self._phases(timelines).items())
+                }
+                for test, timelines in sorted(self._by_test().items())
+            },
+            "jobs": [timeline.as_dict() for timeline in self.timelines],
+        }
+        path.write_text(json.dumps(data, indent=2))
+
+    def write_prometheus(self, path: Path) -> None:
+        lines = [
+            "# HELP e2e_job_phase_seconds Job lifecycle phase durations.",
+            "# TYPE e2e_job_phase_seconds histogram",
+        ]
+        for name, values in sorted(self._phases(self.timelines).items()):
+            lines += _histogram("e2e_job_phase_seconds", f'phase="{name}"', values)
+        lines += [
+            "# HELP e2e_test_job_phase_seconds Job phase durations per test.",
+            "# TYPE e2e_test_job_phase_seconds histogram",
+        ]
+        for test, timelines in sorted(self._by_test().items()):
+            for name, values in sorted(self._phases(timelines).items()):
+                labels = f'test="{_label(test)}",phase="{name}"'
+                lines += _histogram("e2e_test_job_phase_seconds", labels, values)
+        # Textfile collectors may read the file at any time
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n")
+        tmp.replace(path)
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+from collections.abc import Callable, Iterable, Sequence
+from datetime import datetime
+
+from apolo_sdk import Client, JobDescription, JobStatus, ResourceNotFound
+
+log = logging.getLogger(__name__)
+
+POLL_MIN_INTERVAL = 0.25
+POLL_MAX_INTERVAL = 2.0
+POLL_BACKOFF = 1.25
+ACTIVE_STATUSES = frozenset({JobStatus.PENDING, JobStatus.RUNNING, JobStatus.SUSPENDED})
+
+
+def check_job_state(job: JobDescription, wait_state: JobStatus) -> bool:
+    """
+    Return True if job reached wait_state, raise if it never will.
+    """
+    if job.status == wait_state:
+        return True
+    if (wait_state != JobStatus.FAILED and job.status == JobStatus.FAILED) or (
+        wait_state == JobStatus.FAILED and job.status == JobStatus.SUCCEEDED
+    ):
+        raise AssertionError(f"Wait for {wait_state} is failed: {job.status}")
+    if wait_state == JobStatus.PENDING and job.status in (
+        JobStatus.RUNNING,
+        JobStatus.SUCCEEDED,
+        JobStatus.FAILED,
+    ):
+        return True
+    if job.status.is_finished:
+        raise AssertionError(f"Cannot start job to {wait_state}: {job.status}")
+    return False
+
+
+class JobHandle:
+    def __init__(self, watcher: "JobWatcher", job: JobDescription) -> None:
+        self._watcher = watcher
+        self._job = job
+        self._waiters: list[
+            tuple[Callable[[JobDescription], bool], asyncio.Future[JobDescription]]
+        ] = []
+
+    @property
+    def id(self) -> str:
+        return self._job.id
+
+    @property
+    def job(self) -> JobDescription:
+        return self._job
+
+    @property
+    def is_waited(self) -> bool:
+        return any(not fut.done() for _, fut in self._waiters)
+
+    async def wait(self, wait_state: JobStatus, timeout: float = 180) -> JobDescription:
+        return await self.wait_for(
+            lambda job: check_job_state(job, wait_state),
+            timeout,
+            f"Cannot start job to {wait_state}",
+        )
+
+    async def wait_for(
+        self,
+        predicate: Callable[[JobDescription], bool],
+        timeout: float = 180,
+        message: str = "Job state wait timed out",
+    ) -> JobDescription:
+        if predicate(self._job):
+            return self._job
+        fut: asyncio.Future[JobDescription] = asyncio.get_running_loop().create_future()
+        waiter = (predicate, fut)
+        self._waiters.append(waiter)
+        self._watcher._watch(self)
+        self._watcher._wakeup()
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except TimeoutError:
+            raise AssertionError(f"{message}: {self._job.status}")
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._watcher._release(self)
+
+    async def pending(self, timeout: float = 180) -> JobDescription:
+        return await self.wait(JobStatus.PENDING, timeout)
+
+    async def running(self, timeout: float = 180) -> JobDescription:
+        return await self.wait(JobStatus.RUNNING, timeout)
+
+    async def succeeded(self, timeout: float = 180) -> JobDescription:
+        return await self.wait(JobStatus.SUCCEEDED, timeout)
+
+    async def failed(self, timeout: float = 180) -> JobDescription:
+        return await self.wait(JobStatus.FAILED, timeout)
+
+    async def cancelled(self, timeout: float = 180) -> JobDescription:
+        return await self.wait(JobStatus.CANCELLED, timeout)
+
+    async def finished(self, timeout: float = 180) -> JobDescription:
+        return await self.wait_for(
+            lambda job: job.status.is_finished, timeout, "Job is not finished"
+        )
+
+    def _update(self, job: JobDescription) -> bool:
+        changed = job.status != self._job.status
+        if changed:
+            log.info("Job %s: %s -> %s", job.id, self._job.status, job.status)
+        self._job = job
+        if self._watcher._on_update is not None:
+            self._watcher._on_update(job)
+        for predicate, fut in list(self._waiters):
+            if fut.done():
+                continue
+            try:
+                if predicate(job):
+                    fut.set_result(job)
+            except BaseException as exc:
+                fut.set_exception(exc)
+        return changed
+
+    def _fail(self, exc: BaseException) -> None:
+        for _, fut in self._waiters:
+            if not fut.done():
+                fut.set_exception(exc)
+
+
+class JobWatcher:
+    """
+    Session-wide poller resolving state waits of all tracked jobs.
+
+    Every tick issues a single jobs.list query for the active jobs with tags
+    created since the oldest waited job. Waited jobs missing from it, because
+    they finished or were not tagged, are asked for one by one. The interval
+    grows while nothing changes and drops back to the minimum on any
+    transition or newly tracked job. Finished jobs nobody waits on are
+    dropped.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        *,
+        min_interval: float = POLL_MIN_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        on_update: Callable[[JobDescription], None] | None = None,
+        tags: Sequence[str] = (),
+    ) -> None:
+        self._client = client
+        self._tags = tags
+        self._on_update = on_update
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._interval = min_interval
+        self._handles: dict[str, JobHandle] = {}
+        self._event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def track(self, job: JobDescription) -> JobHandle:
+        handle = self._handles.get(job.id)
+        if handle is None:
+            handle = JobHandle(self, job)
+        else:
+            handle._update(job)
+        self._watch(handle)
+        return handle
+
+    def get(self, job_id: str) -> JobHandle | None:
+        return self._handles.get(job_id)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self, job_ids: Iterable[str]) -> None:
+        """
+        Poll the given tracked jobs once, whether anybody waits on them or not.
+        """
+        handles = [h for h in map(self._handles.get, job_ids) if h is not None]
+        if handles:
+            await self._poll(handles)
+
+    def _watch(self, handle: JobHandle) -> None:
+        # A handle kept by the caller may have been dropped after it finished
+        self._handles.setdefault(handle.id, handle)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _release(self, handle: JobHandle) -> None:
+        if handle.job.status.is_finished and not handle.is_waited:
+            self._handles.pop(handle.id, None)
+
+    def _prune(self) -> None:
+        for handle in list(self._handles.values()):
+            self._release(handle)
+
+    def _wakeup(self) -> None:
+        self._interval = self._min_interval
+        self._event.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._prune()
+            waited = [h for h in self._handles.values() if h.is_waited]
+            if not waited:
+                self._event.clear()
+                await self._event.wait()
+                continue
+            try:
+                changed = await self._poll(waited)
+            except Exception as exc:
+                log.warning("Jobs polling failed: %s", exc)
+                changed = False
+            if changed:
+                self._interval = self._min_interval
+            else:
+                self._interval = min(self._interval * POLL_BACKOFF, self._max_interval)
+            self._event.clear()
+            try:
+                await asyncio.wait_for(self._event.wait(), self._interval)
+            except TimeoutError:
+                pass
+
+    async def _poll(self, handles: list[JobHandle]) -> bool:
+        wanted = {h.id: h for h in handles}
+        created = [
+            h.job.history.created_at
+            for h in handles
+            if h.job.history.created_at is not None
+        ]
+        since: datetime | None = None
+        if len(created) == len(handles):
+            since = min(created)
+        changed = False
+        async with self._client.jobs.list(
+            statuses=ACTIVE_STATUSES,
+            tags=self._tags,
+            since=since,
+            project_names=[self._client.config.project_name_or_raise],
+        ) as it:
+            async for job in it:
+                handle = wanted.pop(job.id, None)
+                if handle is not None:
+                    changed |= handle._update(job)
+        # Finished, untagged or not yet listed jobs are asked for directly
+        for job_id, handle in wanted.items():
+            try:
+                job = await self._client.jobs.status(job_id)
+            except ResourceNotFound as exc:
+                handle._fail(exc)
+                continue
+            changed |= handle._update(job)
+        return changed
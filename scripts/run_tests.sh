@@ -1,17 +1,15 @@
 #!/usr/bin/env bash
 
-export PYTEST_OPTS="$PYTEST_OPTS --exitfirst --stepwise"
-
+if [ -n "$E2E_WORKERS" ]
+then
+    # --stepwise state is not shared between xdist workers
+    export PYTEST_OPTS="$PYTEST_OPTS --exitfirst"
+else
+    export PYTEST_OPTS="$PYTEST_OPTS --exitfirst --stepwise"
+fi
+
+# Failed tests are retried in process, session fixtures are kept
 RETRIES=${CLIENT_TEST_E2E_RETRIES:-1}
+export PYTEST_OPTS="$PYTEST_OPTS --e2e-retries $RETRIES"
 
-for ((i=0; i<=$RETRIES; i++))
-do
-    make test
-
-    if [ $? == 0 ]
-    then
-        exit 0
-    fi
-done
-
-exit 1
+make test
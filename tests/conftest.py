@@ -1,17 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import logging
 import os
+import re
 from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import AsyncExitStack
 from pathlib import Path
 from typing import Any, Protocol
-from uuid import uuid4
 
 import pytest
 from apolo_sdk import (
     DEFAULT_CONFIG_PATH,
-    HTTPPort,
+    AuthenticationError,
+    AuthError,
     JobStatus,
     ResourceNotFound,
     Resources,
@@ -22,10 +25,21 @@ from neuro_admin_client import AdminClient, ClusterUserRoleType
 from neuro_auth_client import AuthClient
 from yarl import URL
 
-from platform_e2e import Helper, ensure_config
+from platform_e2e import (
+    BootstrapCache,
+    Helper,
+    ServerCache,
+    ServerSpec,
+    SetupCoordinator,
+    TimelineRecorder,
+    ensure_config,
+)
+from platform_e2e.cache import EXISTS_TTL, TOKEN_TTL
 
 LOGGER = logging.getLogger(__name__)
 
+REJECTED_CONFIG = re.compile(r"Unable to get server configuration: 40[13]$")
+
 
 @pytest.fixture(scope="session")
 def url() -> URL:
@@ -80,17 +94,33 @@ class UserFactory(Protocol):
 
 
 @pytest.fixture(scope="session")
-def user_factory(admin_client: AdminClient, auth_client: AuthClient) -> UserFactory:
+def user_factory(
+    admin_client: AdminClient,
+    auth_client: AuthClient,
+    setup_coordinator: SetupCoordinator,
+    bootstrap_cache: BootstrapCache,
+    api_url: URL,
+    cluster_name: str,
+) -> UserFactory:
     async def _add_user(name: str) -> str:
-        try:
-            await admin_client.create_user(
-                name, f"{name}@neu.ro", skip_auto_add_to_clusters=True
-            )
-        except Exception as ex:
-            LOGGER.info("User %s creation failed: %s", name, ex)
-            # Check user exists
-            await admin_client.get_user(name)
+        scope = BootstrapCache.scope(api_url, cluster_name, name)
+        token = bootstrap_cache.get(scope, "token")
+        if token is not None:
+            return token
+
+        async def _create() -> None:
+            try:
+                await admin_client.create_user(
+                    name, f"{name}@neu.ro", skip_auto_add_to_clusters=True
+                )
+            except Exception as ex:
+                LOGGER.info("User %s creation failed: %s", name, ex)
+                # Check user exists
+                await admin_client.get_user(name)
+
+        await setup_coordinator.once(f"user:{name}", _create)
         token = await auth_client.get_user_token(name)
+        bootstrap_cache.set(scope, "token", token, TOKEN_TTL)
         return token
 
     return _add_user
@@ -103,21 +133,35 @@ class ClusterUserFactory(Protocol):
 
 @pytest.fixture(scope="session")
 def cluster_user_factory(
-    admin_client: AdminClient, cluster_name: str
+    admin_client: AdminClient,
+    cluster_name: str,
+    setup_coordinator: SetupCoordinator,
+    bootstrap_cache: BootstrapCache,
+    api_url: URL,
 ) -> ClusterUserFactory:
     async def _add_cluster_user(user_name: str) -> None:
-        try:
-            await admin_client.create_cluster_user(
-                cluster_name=cluster_name,
-                user_name=user_name,
-                role=ClusterUserRoleType.USER,
-            )
-        except Exception as ex:
-            LOGGER.info("Cluster user %s creation failed: %s", user_name, ex)
-            # Check cluster user exists
-            await admin_client.get_cluster_user(
-                cluster_name=cluster_name, user_name=user_name
-            )
+        scope = BootstrapCache.scope(api_url, cluster_name, user_name)
+        if bootstrap_cache.get(scope, "cluster_user"):
+            return
+
+        async def _create() -> None:
+            try:
+                await admin_client.create_cluster_user(
+                    cluster_name=cluster_name,
+                    user_name=user_name,
+                    role=ClusterUserRoleType.USER,
+                )
+            except Exception as ex:
+                LOGGER.info("Cluster user %s creation failed: %s", user_name, ex)
+                # Check cluster user exists
+                await admin_client.get_cluster_user(
+                    cluster_name=cluster_name, user_name=user_name
+                )
+
+        await setup_coordinator.once(
+            f"cluster-user:{cluster_name}:{user_name}", _create
+        )
+        bootstrap_cache.set(scope, "cluster_user", True, EXISTS_TTL)
 
     return _add_cluster_user
 
@@ -146,15 +190,21 @@ def user_name(cluster_name: str) -> str:
     return f"neuro-{_hash(cluster_name)}-1"
 
 
+async def _bootstrap_user(
+    user_factory: UserFactory, cluster_user_factory: ClusterUserFactory, name: str
+) -> str:
+    user_token = await user_factory(name)
+    await cluster_user_factory(name)
+    return user_token
+
+
 @pytest.fixture(scope="session")
 async def user_token(
     user_factory: UserFactory, cluster_user_factory: ClusterUserFactory, user_name: str
 ) -> str:
     if "CLIENT_TEST_E2E_USER_TOKEN" in os.environ:
         return os.environ["CLIENT_TEST_E2E_USER_TOKEN"]
-    user_token = await user_factory(user_name)
-    await cluster_user_factory(user_name)
-    return user_token
+    return await _bootstrap_user(user_factory, cluster_user_factory, user_name)
 
 
 @pytest.fixture(scope="session")
@@ -173,20 +223,78 @@ async def user_token_alt(
 ) -> str:
     if "CLIENT_TEST_E2E_USER_TOKEN_ALT" in os.environ:
         return os.environ["CLIENT_TEST_E2E_USER_TOKEN_ALT"]
-    user_token = await user_factory(user_name_alt)
-    await cluster_user_factory(user_name_alt)
-    return user_token
+    return await _bootstrap_user(user_factory, cluster_user_factory, user_name_alt)
+
+
+async def _login(
+    bootstrap_cache: BootstrapCache,
+    scope: str,
+    token: str,
+    api_url: URL,
+    make_dir: Callable[[], Path],
+) -> Path | None:
+    try:
+        path = bootstrap_cache.get_config(scope, token, make_dir() / ".nmrc")
+        if path is None:
+            return await ensure_config(token, api_url, make_dir)
+        # Unlike the login, a cached config has not been checked by the platform
+        async with get(path=path) as client:
+            await client.config.fetch()
+        return path
+    except RuntimeError as ex:
+        # The SDK reports a rejected token of the config call as a plain error
+        if not REJECTED_CONFIG.search(str(ex)):
+            raise
+        raise AuthenticationError(str(ex)) from ex
+
+
+async def _user_config(
+    bootstrap_cache: BootstrapCache,
+    scope: str,
+    token: str,
+    api_url: URL,
+    make_dir: Callable[[], Path],
+    renew_token: Callable[[], Awaitable[str]] | None,
+) -> Path | None:
+    """
+    Log in with a cached or a new client config for token.
+
+    If the platform rejects the token, the cached scope of the user is
+    dropped and the user is bootstrapped again once.
+    """
+    try:
+        return await _login(bootstrap_cache, scope, token, api_url, make_dir)
+    except AuthError as ex:
+        if renew_token is None:
+            raise
+        LOGGER.warning("Bootstrap of %s was rejected: %s", scope, ex)
+    bootstrap_cache.invalidate(scope)
+    token = await renew_token()
+    return await _login(bootstrap_cache, scope, token, api_url, make_dir)
 
 
 @pytest.fixture(scope="session")
 async def config_path(
     tmp_path_factory: Any,
     api_url: URL,
+    cluster_name: str,
     user_name: str,
     user_token: str,
+    user_factory: UserFactory,
+    cluster_user_factory: ClusterUserFactory,
+    bootstrap_cache: BootstrapCache,
 ) -> Path:
-    path = await ensure_config(
-        user_token, api_url, lambda: tmp_path_factory.mktemp(user_name)
+    path = await _user_config(
+        bootstrap_cache,
+        BootstrapCache.scope(api_url, cluster_name, user_name),
+        user_token,
+        api_url,
+        lambda: tmp_path_factory.mktemp(user_name),
+        (
+            None
+            if "CLIENT_TEST_E2E_USER_TOKEN" in os.environ
+            else lambda: _bootstrap_user(user_factory, cluster_user_factory, user_name)
+        ),
     )
     if not path:
         LOGGER.info("User %s config file was not created", user_name)
@@ -199,10 +307,28 @@ async def config_path(
 
 @pytest.fixture(scope="session")
 async def config_path_alt(
-    tmp_path_factory: Any, api_url: URL, user_name_alt: str, user_token_alt: str
+    tmp_path_factory: Any,
+    api_url: URL,
+    cluster_name: str,
+    user_name_alt: str,
+    user_token_alt: str,
+    user_factory: UserFactory,
+    cluster_user_factory: ClusterUserFactory,
+    bootstrap_cache: BootstrapCache,
 ) -> Path:
-    path = await ensure_config(
-        user_token_alt, api_url, lambda: tmp_path_factory.mktemp(user_name_alt)
+    path = await _user_config(
+        bootstrap_cache,
+        BootstrapCache.scope(api_url, cluster_name, user_name_alt),
+        user_token_alt,
+        api_url,
+        lambda: tmp_path_factory.mktemp(user_name_alt),
+        (
+            None
+            if "CLIENT_TEST_E2E_USER_TOKEN_ALT" in os.environ
+            else lambda: _bootstrap_user(
+                user_factory, cluster_user_factory, user_name_alt
+            )
+        ),
     )
     if path is None:
         # pytest.skip() actually raises an exception itself
@@ -212,33 +338,86 @@ async def config_path_alt(
         return path
 
 
+async def _sweep_jobs(
+    helper: Helper, setup_coordinator: SetupCoordinator, sweep_age: float
+) -> None:
+    if not sweep_age:
+        return
+
+    async def _sweep() -> None:
+        swept = await helper.sweep_jobs(sweep_age)
+        if swept:
+            LOGGER.warning("Killed %d jobs left by earlier runs", swept)
+
+    await setup_coordinator.once(
+        f"sweep:{helper.cluster_name}:{helper.project_name}", _sweep
+    )
+
+
+async def _reap_run_jobs(helper: Helper) -> None:
+    try:
+        reaped = await helper.reap_run_jobs()
+    except Exception as ex:
+        LOGGER.warning("Cannot reap jobs of run %s: %s", helper.run_id, ex)
+        return
+    if reaped:
+        LOGGER.info("Killed %d jobs left by tests of run %s", reaped, helper.run_id)
+
+
 @pytest.fixture(scope="session")
 async def helper(
     config_path: Path,
     tmp_path_factory: Any,
     cluster_name: str,
     user_name: str,
+    api_url: URL,
+    setup_coordinator: SetupCoordinator,
+    bootstrap_cache: BootstrapCache,
+    job_timeline: TimelineRecorder,
+    run_id: str,
+    sweep_age: float,
 ) -> AsyncIterator[Helper]:
     client = await get(path=config_path)
     print("API URL", client.config.api_url)
     await client.config.switch_cluster(cluster_name)
     project_name = f"{user_name}-default"
-    try:
-        await client._admin.create_project(
-            project_name, cluster_name=cluster_name, org_name=None
+    scope = BootstrapCache.scope(api_url, cluster_name, user_name)
+
+    async def _create_project() -> None:
+        try:
+            await client._admin.create_project(
+                project_name, cluster_name=cluster_name, org_name=None
+            )
+        except Exception as ex:
+            LOGGER.info("Project creation failed: %s", ex)
+            # Check project exists
+            await client._admin.get_project(
+                project_name=project_name,
+                cluster_name=cluster_name,
+                org_name=None,
+            )
+
+    if not bootstrap_cache.get(scope, f"project:{project_name}"):
+        await setup_coordinator.once(
+            f"project:{cluster_name}:{project_name}", _create_project
         )
+        # The project could be created by another worker after the login
         await client.config.fetch()
-    except Exception as ex:
-        LOGGER.info("Project creation failed: %s", ex)
-        # Check project exists
-        await client._admin.get_project(
-            project_name=project_name,
-            cluster_name=cluster_name,
-            org_name=None,
-        )
+        bootstrap_cache.set(scope, f"project:{project_name}", True, EXISTS_TTL)
     await client.config.switch_project(project_name)
-    yield Helper(client, tmp_path_factory.mktemp("helper"), config_path)
-    await client.close()
+    # The token may have been renewed since the fixture
+    bootstrap_cache.set_config(scope, await client.config.token(), config_path)
+    helper = Helper(
+        client,
+        tmp_path_factory.mktemp("helper"),
+        config_path,
+        timeline=job_timeline,
+        run_id=run_id,
+    )
+    await _sweep_jobs(helper, setup_coordinator, sweep_age)
+    yield helper
+    await _reap_run_jobs(helper)
+    await helper.close()
 
 
 @pytest.fixture(scope="session")
@@ -247,27 +426,54 @@ async def helper_alt(
     tmp_path_factory: Any,
     cluster_name: str,
     user_name_alt: str,
+    api_url: URL,
+    setup_coordinator: SetupCoordinator,
+    bootstrap_cache: BootstrapCache,
+    job_timeline: TimelineRecorder,
+    run_id: str,
+    sweep_age: float,
 ) -> AsyncIterator[Helper]:
     client = await get(path=config_path_alt)
     print("Alt API URL", client.config.api_url)
     await client.config.switch_cluster(cluster_name)
     project_name = f"{user_name_alt}-default"
-    try:
-        await client._admin.create_project(
-            project_name, cluster_name=cluster_name, org_name=None
+    scope = BootstrapCache.scope(api_url, cluster_name, user_name_alt)
+
+    async def _create_project() -> None:
+        try:
+            await client._admin.create_project(
+                project_name, cluster_name=cluster_name, org_name=None
+            )
+        except Exception as ex:
+            LOGGER.info("Project user %s creation failed: %s", user_name, ex)
+            # Check project user exists
+            await client._admin.get_project(
+                project_name=project_name,
+                cluster_name=cluster_name,
+                org_name=None,
+            )
+
+    if not bootstrap_cache.get(scope, f"project:{project_name}"):
+        await setup_coordinator.once(
+            f"project:{cluster_name}:{project_name}", _create_project
         )
+        # The project could be created by another worker after the login
         await client.config.fetch()
-    except Exception as ex:
-        LOGGER.info("Project user %s creation failed: %s", user_name, ex)
-        # Check project user exists
-        await client._admin.get_project(
-            project_name=project_name,
-            cluster_name=cluster_name,
-            org_name=None,
-        )
+        bootstrap_cache.set(scope, f"project:{project_name}", True, EXISTS_TTL)
     await client.config.switch_project(project_name)
-    yield Helper(client, tmp_path_factory.mktemp("helper_alt"), config_path_alt)
-    await client.close()
+    # The token may have been renewed since the fixture
+    bootstrap_cache.set_config(scope, await client.config.token(), config_path_alt)
+    helper = Helper(
+        client,
+        tmp_path_factory.mktemp("helper_alt"),
+        config_path_alt,
+        timeline=job_timeline,
+        run_id=run_id,
+    )
+    await _sweep_jobs(helper, setup_coordinator, sweep_age)
+    yield helper
+    await _reap_run_jobs(helper)
+    await helper.close()
 
 
 @pytest.fixture
@@ -279,61 +485,77 @@ async def kill_later(helper: Helper) -> AsyncIterator[Callable[[str], None]]:
 
     yield _kill_later
 
-    for job_id in job_ids:
+    async def _kill(job_id: str) -> None:
         try:
-            await helper.client.jobs.kill(job_id)
+            await helper.kill_job(job_id)
         except ResourceNotFound:
             pass
 
-    for job_id in job_ids:
-        await helper.wait_job_state(job_id, JobStatus.CANCELLED)
+    await asyncio.gather(*(_kill(job_id) for job_id in job_ids))
+    await asyncio.gather(
+        *(helper.wait_job_state(job_id, JobStatus.CANCELLED) for job_id in job_ids)
+    )
+
+
+SECRET_SERVER_IMAGE = "ghcr.io/neuro-inc/nginx:latest"
+SECRET_SERVER_COMMAND = (
+    "bash -c \"echo -n '{secret}' > /usr/share/nginx/html/secret.txt; "
+    "timeout 1h /usr/sbin/nginx -g 'daemon off;'\""
+)
+SECRET_ROTATE_COMMAND = (
+    "bash -c \"echo -n '{secret}' > /usr/share/nginx/html/secret.txt\""
+)
+
+
+@pytest.fixture(scope="session")
+async def server_cache(helper: Helper) -> AsyncIterator[ServerCache]:
+    cache = ServerCache(helper)
+    yield cache
+    await cache.close()
 
 
 @pytest.fixture
-def secret_job(
-    helper: Helper, kill_later: Callable[[str], None]
-) -> Callable[..., Awaitable[dict[str, Any]]]:
-    async def _run(
-        http_port: bool,
-        http_auth: bool = False,
-        name: str | None = None,
-        description: str | None = None,
-    ) -> dict[str, Any]:
-        secret = str(uuid4())
-        # Run http job
-        command = (
-            f"bash -c \"echo -n '{secret}' > /usr/share/nginx/html/secret.txt; "
-            f"timeout 15m /usr/sbin/nginx -g 'daemon off;'\""
-        )
-        if http_port:
-            http: HTTPPort | None = HTTPPort(80, http_auth)
-        else:
-            http = None
-        if not description:
-            description = "nginx with secret file"
-            if http_port:
-                description += " and forwarded http port"
-                if http_auth:
-                    description += " with authentication"
-        job = await helper.run_job(
-            "ghcr.io/neuro-inc/nginx:latest",
-            command,
-            name=name,
-            description=description,
-            http=http,
-            resources=Resources(
-                cpu=0.1,
-                memory=256 * 10**6,
-                shm=True,
-            ),
-        )
-        kill_later(job.id)
-        return {
-            "id": job.id,
-            "secret": secret,
-            "ingress_url": job.http_url,
-            "internal_hostname": job.internal_hostname,
-            "internal_hostname_named": job.internal_hostname_named,
-        }
-
-    return _run
+async def secret_job(
+    server_cache: ServerCache,
+) -> AsyncIterator[Callable[..., Awaitable[dict[str, Any]]]]:
+    async with AsyncExitStack() as stack:
+
+        async def _run(
+            http_port: bool,
+            http_auth: bool = False,
+            name: str | None = None,
+            description: str | None = None,
+        ) -> dict[str, Any]:
+            if not description:
+                description = "nginx with secret file"
+                if http_port:
+                    description += " and forwarded http port"
+                    if http_auth:
+                        description += " with authentication"
+            spec = ServerSpec(
+                SECRET_SERVER_IMAGE,
+                SECRET_SERVER_COMMAND,
+                SECRET_ROTATE_COMMAND,
+                http_port=80 if http_port else None,
+                http_auth=http_auth,
+                # A named server is only shared with leases of the same name
+                name=name,
+                resources=Resources(
+                    cpu=0.1,
+                    memory=256 * 10**6,
+                    shm=True,
+                ),
+                description=description,
+            )
+            # Shared with other tests, the secret is fresh for this one
+            server = await stack.enter_async_context(server_cache.lease(spec))
+            job = server.job
+            return {
+                "id": job.id,
+                "secret": server.secret,
+                "ingress_url": job.http_url,
+                "internal_hostname": job.internal_hostname,
+                "internal_hostname_named": job.internal_hostname_named,
+            }
+
+        yield _run
@@ -0,0 +1,166 @@
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+
+import pytest
+from yarl import URL
+
+from platform_e2e import BenchmarkReport, BenchmarkResult, Helper, run_benchmark
+from platform_e2e.bench import GB, KB, MB, format_size
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.blob_storage]
+
+SIZES = [4 * KB, MB, 64 * MB, GB]
+CONCURRENCY = [1, 8]
+MAX_CELL_BYTES = 4 * GB
+MIN_CELL_BYTES = 64 * MB
+MAX_CELL_OPS = 256
+LISTING_STAGES = [1_000, 10_000, 100_000]
+PUT_CONCURRENCY = 64
+HEAD_OPS = 500
+
+
+async def _list_keys(helper: Helper, bucket: str) -> tuple[int, float]:
+    """
+    List the whole bucket, return the number of keys and time to the first one.
+    """
+    count = 0
+    first = 0.0
+    started_at = time.monotonic()
+    async with helper.client.buckets.list_blobs(
+        URL(f"blob:{bucket}"), recursive=True
+    ) as it:
+        async for _ in it:
+            if not count:
+                first = time.monotonic() - started_at
+            count += 1
+    return count, first
+
+
+def _put(helper: Helper, bucket: str, key: str) -> Callable[[], Awaitable[int]]:
+    async def _op() -> int:
+        await helper.client.buckets.put_blob(bucket, key, key.encode())
+        return len(key)
+
+    return _op
+
+
+def _head(helper: Helper, bucket: str, key: str) -> Callable[[], Awaitable[int]]:
+    async def _op() -> int:
+        await helper.client.buckets.head_blob(bucket, key)
+        return 0
+
+    return _op
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+@pytest.mark.parametrize("size", SIZES, ids=format_size)
+async def test_blob_transfer(
+    helper: Helper,
+    benchmark_report: BenchmarkReport,
+    benchmark_max_size: int,
+    size: int,
+    concurrency: int,
+) -> None:
+    if size > benchmark_max_size:
+        pytest.skip(f"{format_size(size)} is above --e2e-benchmark-max-size")
+    if size * concurrency > MAX_CELL_BYTES:
+        pytest.skip(f"{format_size(size)} x {concurrency} is above the cell limit")
+    count = max(concurrency, min(MAX_CELL_OPS, MIN_CELL_BYTES // size))
+    params = {"size": size, "concurrency": concurrency}
+
+    def _upload(key: str) -> Callable[[], Awaitable[int]]:
+        async def _op() -> int:
+            await helper.upload_random_blob(bucket, key, size, seed=size)
+            return size
+
+        return _op
+
+    def _download(key: str) -> Callable[[], Awaitable[int]]:
+        async def _op() -> int:
+            result = await helper.blob_checksum(bucket, key)
+            return result.size
+
+        return _op
+
+    async with helper.create_tmp_bucket() as bucket:
+        keys = [f"bench/{i}" for i in range(count)]
+        benchmark_report.add(
+            await run_benchmark(
+                "blob.upload",
+                params,
+                [_upload(key) for key in keys],
+                concurrency=concurrency,
+            )
+        )
+        benchmark_report.add(
+            await run_benchmark(
+                "blob.download",
+                params,
+                [_download(key) for key in keys],
+                concurrency=concurrency,
+            )
+        )
+
+
+async def test_blob_listing_scaling(
+    helper: Helper, benchmark_report: BenchmarkReport
+) -> None:
+    bucket = f"neuro-e2e-{secrets.token_hex(10)}"
+    await helper.create_bucket(bucket, wait=True)
+    try:
+        populated = 0
+        for stage in LISTING_STAGES:
+            # Grow the bucket up to the next stage
+            put = await run_benchmark(
+                "blob.put_small",
+                {"keys": stage},
+                [_put(helper, bucket, f"k/{i:07d}") for i in range(populated, stage)],
+                concurrency=PUT_CONCURRENCY,
+            )
+            benchmark_report.add(put)
+            populated = stage
+
+            started_at = time.monotonic()
+            count, first = await _list_keys(helper, bucket)
+            elapsed = time.monotonic() - started_at
+            assert count == stage
+            benchmark_report.add(
+                BenchmarkResult(
+                    "blob.list",
+                    {"keys": stage},
+                    elapsed=elapsed,
+                    latencies=[elapsed],
+                    extra={"keys_per_s": count / elapsed, "first_key": first},
+                )
+            )
+
+            keys = [f"k/{i * stage // HEAD_OPS:07d}" for i in range(HEAD_OPS)]
+            benchmark_report.add(
+                await run_benchmark(
+                    "blob.head",
+                    {"keys": stage},
+                    [_head(helper, bucket, key) for key in keys],
+                    concurrency=8,
+                )
+            )
+
+        cleanup = await helper.cleanup_bucket(bucket)
+        benchmark_report.add(
+            BenchmarkResult(
+                "blob.cleanup_bucket",
+                {"keys": populated, "batched": cleanup.batched},
+                elapsed=cleanup.elapsed,
+                latencies=[cleanup.elapsed],
+                extra={"keys_per_s": cleanup.keys_per_s},
+            )
+        )
+    finally:
+        started_at = time.monotonic()
+        await helper.delete_bucket(bucket)
+        elapsed = time.monotonic() - started_at
+        benchmark_report.add(
+            BenchmarkResult(
+                "blob.delete_bucket", {}, elapsed=elapsed, latencies=[elapsed]
+            )
+        )
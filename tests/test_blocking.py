@@ -0,0 +1,64 @@
+import asyncio
+import hashlib
+import time
+from pathlib import Path
+
+import pytest
+
+from platform_e2e import (
+    BenchmarkReport,
+    BenchmarkResult,
+    RandomData,
+    loop_lag_guard,
+)
+from platform_e2e.checksum import file_checksum, local_checksum
+
+
+def test_file_checksum(tmp_path: Path) -> None:
+    path = tmp_path / "data"
+    content = b"".join(RandomData(1_000_003, seed=3).blocks())
+    path.write_bytes(content)
+    expected = hashlib.sha1(content).hexdigest()
+    assert file_checksum(path, chunk_size=64 * 1024) == expected
+    assert file_checksum(path) == expected
+    path.write_bytes(b"")
+    assert file_checksum(path) == hashlib.sha1().hexdigest()
+
+
+async def test_loop_lag_guard_flags_blocking() -> None:
+    with pytest.raises(AssertionError, match="Event loop lagged"):
+        async with loop_lag_guard(0.05):
+            await asyncio.sleep(0.02)
+            time.sleep(0.2)
+    async with loop_lag_guard(0.05) as monitor:
+        await asyncio.sleep(0.1)
+    assert monitor.lags
+
+
+async def test_hashing_keeps_loop_responsive(tmp_path: Path) -> None:
+    path = tmp_path / "data"
+    checksum = await RandomData(64 * 1024 * 1024, seed=5).write_to(path)
+    async with loop_lag_guard(0.1):
+        results = await asyncio.gather(*(local_checksum(path) for _ in range(4)))
+    assert results == [checksum] * 4
+
+
+@pytest.mark.benchmark
+async def test_hash_large_file(
+    tmp_path: Path, benchmark_max_size: int, benchmark_report: BenchmarkReport
+) -> None:
+    size = min(4 * 1024**3, benchmark_max_size)
+    path = tmp_path / "data"
+    checksum = await RandomData(size, seed=size).write_to(path)
+    started = time.monotonic()
+    async with loop_lag_guard() as monitor:
+        assert await local_checksum(path) == checksum
+    benchmark_report.add(
+        BenchmarkResult(
+            "local.hash",
+            {"size": size},
+            elapsed=time.monotonic() - started,
+            bytes=size,
+            extra={"max_loop_lag": monitor.max_lag},
+        )
+    )
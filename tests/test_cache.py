@@ -0,0 +1,94 @@
+import time
+from pathlib import Path
+
+import pytest
+from yarl import URL
+
+from platform_e2e import BootstrapCache
+
+SCOPE = BootstrapCache.scope(URL("https://api.example/api/v1"), "cluster", "user")
+OTHER = BootstrapCache.scope(URL("https://api.example/api/v1"), "cluster", "other")
+
+
+def _mode(path: Path) -> int:
+    return path.stat().st_mode & 0o777
+
+
+def test_bootstrap_cache_expires_entries(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache = BootstrapCache(tmp_path / "cache")
+    cache.set(SCOPE, "token", "secret", ttl=60)
+    cache.set(SCOPE, "cluster_user", True, ttl=3600)
+    # Another process sees the entries until they expire
+    cache = BootstrapCache(tmp_path / "cache")
+    assert cache.get(SCOPE, "token") == "secret"
+    assert cache.get(SCOPE, "missing") is None
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get(SCOPE, "token") is None
+    assert cache.get(SCOPE, "cluster_user") is True
+
+
+def test_bootstrap_cache_config_of_token(tmp_path: Path) -> None:
+    cache = BootstrapCache(tmp_path / "cache")
+    src = tmp_path / "src" / ".nmrc"
+    src.mkdir(parents=True)
+    (src / "db").write_text("config")
+    cache.set_config(SCOPE, "token-1", src)
+
+    dst = cache.get_config(SCOPE, "token-1", tmp_path / "dst" / ".nmrc")
+    assert dst is not None
+    assert (dst / "db").read_text() == "config"
+    # A config made for another token is not handed out
+    assert cache.get_config(SCOPE, "token-2", tmp_path / "dst2" / ".nmrc") is None
+    assert not (tmp_path / "dst2").exists()
+    assert cache.get_config(OTHER, "token-1", tmp_path / "dst3" / ".nmrc") is None
+
+
+def test_bootstrap_cache_invalidates_used_scopes(tmp_path: Path) -> None:
+    other = BootstrapCache(tmp_path / "cache")
+    other.set(OTHER, "token", "other", ttl=60)
+    cache = BootstrapCache(tmp_path / "cache")
+    cache.set(SCOPE, "token", "secret", ttl=60)
+    cache.invalidate()
+    assert cache.get(SCOPE, "token") is None
+    # Scopes only another process used survive
+    assert cache.get(OTHER, "token") == "other"
+
+    # Reading a scope uses it too
+    cache = BootstrapCache(tmp_path / "cache")
+    assert cache.get(OTHER, "token") == "other"
+    cache.invalidate()
+    assert other.get(OTHER, "token") is None
+
+    other.set(OTHER, "token", "other", ttl=60)
+    other.set(SCOPE, "token", "secret", ttl=60)
+    other.invalidate(SCOPE)
+    assert other.get(SCOPE, "token") is None
+    assert other.get(OTHER, "token") == "other"
+
+
+def test_bootstrap_cache_is_private(tmp_path: Path) -> None:
+    root = tmp_path / "cache"
+    root.mkdir(mode=0o755)
+    cache = BootstrapCache(root)
+    assert _mode(root) == 0o700
+
+    cache.set(SCOPE, "token", "secret", ttl=60)
+    assert _mode(root / "index.json") == 0o600
+    assert _mode(root / "index.lock") == 0o600
+
+    src = tmp_path / "src" / ".nmrc"
+    (src / "nested").mkdir(parents=True, mode=0o755)
+    (src / "db").write_text("config")
+    (src / "nested" / "file").write_text("config")
+    (src / "db").chmod(0o644)
+    cache.set_config(SCOPE, "token", src)
+    copied = [path for path in root.iterdir() if path.name.startswith("config-")]
+    assert len(copied) == 1
+    assert _mode(copied[0]) == 0o700
+    assert _mode(copied[0] / "nested") == 0o700
+    assert _mode(copied[0] / "db") == 0o600
+    assert _mode(copied[0] / "nested" / "file") == 0o600
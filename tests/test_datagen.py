@@ -0,0 +1,44 @@
+import hashlib
+from unittest import mock
+
+import pytest
+
+from platform_e2e import RandomData, datagen
+from platform_e2e.datagen import CHECKSUM_CACHE_SIZE
+
+
+def test_random_data_is_reproducible() -> None:
+    first = b"".join(RandomData(3_000_000, seed=42).blocks())
+    second = b"".join(RandomData(3_000_000, seed=42).blocks())
+    other = b"".join(RandomData(3_000_000, seed=43).blocks())
+    assert len(first) == 3_000_000
+    assert first == second
+    assert first != other
+
+
+async def test_random_data_checksum_matches_content() -> None:
+    data = RandomData(2_500_000, seed=7, block_size=64 * 1024)
+    content = b"".join([chunk async for chunk in data.chunks()])
+    assert data.checksum == hashlib.sha1(content).hexdigest()
+    same = RandomData(2_500_000, seed=7, block_size=64 * 1024)
+    assert await same.get_checksum() == data.checksum
+
+
+async def test_random_data_checksum_needs_no_second_pass(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    data = RandomData(1_000_000, seed=8, block_size=64 * 1024)
+    content = b"".join(data.blocks())
+    blocks = mock.Mock(side_effect=AssertionError("generated twice"))
+    monkeypatch.setattr(data, "blocks", blocks)
+    assert await data.get_checksum() == hashlib.sha1(content).hexdigest()
+
+
+def test_random_data_checksums_are_bounded() -> None:
+    first = RandomData(1000, seed=0)
+    b"".join(first.blocks())
+    for seed in range(1, CHECKSUM_CACHE_SIZE + 1):
+        b"".join(RandomData(1000, seed=seed).blocks())
+    assert len(datagen._checksums) <= CHECKSUM_CACHE_SIZE
+    assert RandomData(1000, seed=0).checksum is None
+    assert first.checksum is not None
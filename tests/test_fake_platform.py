@@ -0,0 +1,438 @@
+import asyncio
+import itertools
+import logging
+import re
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+from apolo_sdk import (
+    AuthError,
+    Container,
+    JobStatus,
+    RemoteImage,
+    Resources,
+    ServerNotAvailable,
+    get,
+)
+from conftest import _user_config
+from neuro_admin_client import AdminClient, ClusterUserRoleType
+from neuro_auth_client import AuthClient
+
+import platform_e2e
+import platform_e2e.fake
+from platform_e2e import (
+    RUN_TAG,
+    BenchmarkReport,
+    BenchmarkResult,
+    BootstrapCache,
+    BucketCleaner,
+    FakeDelays,
+    FakePlatform,
+    Helper,
+    JobPool,
+    JobSpec,
+    RetryPolicy,
+    ServerCache,
+    ServerSpec,
+    ensure_config,
+    reap_jobs,
+)
+from platform_e2e.cache import TOKEN_TTL
+from platform_e2e.fake import parse_script
+from platform_e2e.load import UNSCHEDULABLE_REASON
+
+USER = "fake-user"
+
+
+@pytest.fixture
+async def fake() -> AsyncIterator[FakePlatform]:
+    delays = FakeDelays(scheduling=0.1, pulling=0.1, creating=0.05)
+    async with FakePlatform(delays=delays, seed=0) as fake:
+        yield fake
+
+
+@pytest.fixture
+async def fake_helper(fake: FakePlatform, tmp_path: Path) -> AsyncIterator[Helper]:
+    # The same bootstrap as the user, cluster user and project fixtures
+    async with AdminClient(base_url=fake.admin_url, service_token=None) as admin:
+        await admin.create_user(USER, f"{USER}@neu.ro", skip_auto_add_to_clusters=True)
+        await admin.create_cluster_user(
+            cluster_name=fake.cluster_name,
+            user_name=USER,
+            role=ClusterUserRoleType.USER,
+        )
+    async with AuthClient(fake.url, "") as auth:
+        token = await auth.get_user_token(USER)
+    config_path = await ensure_config(token, fake.api_url, lambda: tmp_path)
+    assert config_path is not None
+    client = await get(path=config_path)
+    await client.config.switch_cluster(fake.cluster_name)
+    await client._admin.create_project(
+        f"{USER}-default", cluster_name=fake.cluster_name, org_name=None
+    )
+    await client.config.fetch()
+    await client.config.switch_project(f"{USER}-default")
+    helper = Helper(client, tmp_path, config_path)
+    yield helper
+    await helper.close()
+
+
+def test_parse_script() -> None:
+    script = parse_script("bash -c 'echo a; sleep 2 && echo b > /tmp/b; exit 3'")
+    assert script.output == ((0.0, b"a\n"),)
+    assert (script.duration, script.exit_code) == (2.0, 3)
+    assert not parse_script("nginx -g 'daemon off;'").finite
+    server = parse_script("timeout 1h nginx -g 'daemon off;'")
+    assert (server.duration, server.exit_code) == (3600.0, 124)
+    assert not parse_script(None).finite
+
+
+async def test_job_lifecycle(fake_helper: Helper) -> None:
+    job = await fake_helper.run_job(
+        "ubuntu",
+        "bash -c 'echo first; sleep 0.2; echo second'",
+        wait_state=JobStatus.SUCCEEDED,
+    )
+    assert job.history.exit_code == 0
+    await fake_helper.check_job_output(job.id, ["first", "second"])
+
+    server = await fake_helper.run_job("nginx", "timeout 1h nginx", name="server")
+    result = await fake_helper.exec(server.id, "bash -c 'echo -n s > f; echo done'")
+    assert (result.exit_code, result.stdout) == (0, "done\n")
+    await fake_helper.kill_job(server.id)
+    killed = await fake_helper.wait_job_state(server.id, JobStatus.CANCELLED)
+    assert [item.reason for item in killed.history.transitions][:5] == [
+        "Creating",
+        "Scheduling",
+        "PullingImage",
+        "ContainerCreating",
+        "",
+    ]
+
+
+async def test_job_output_resumes_log_stream(
+    fake: FakePlatform, fake_helper: Helper, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(platform_e2e, "JOB_OUTPUT_SLEEP_SECONDS", 0.1)
+    fake.faults.log_stream_lifetime = 0.3
+    job = await fake_helper.run_job(
+        "ubuntu", "bash -c 'echo a; echo b; sleep 0.5; echo c; sleep 0.5; echo d'"
+    )
+    fake.requests.clear()
+    # Lost or repeated lines would break the literal match
+    await fake_helper.check_job_output(job.id, re.escape("a\nb\nc\nd\n"))
+    assert fake.requests["GET /api/v1/jobs/{id}/log_ws"] > 1
+
+
+async def test_job_output_matches_unterminated_line(fake_helper: Helper) -> None:
+    job = await fake_helper.run_job("ubuntu", "bash -c 'echo -n ready; sleep 3600'")
+    async with asyncio.timeout(10):
+        await fake_helper.check_job_output(job.id, "ready")
+    status = await fake_helper.client.jobs.status(job.id)
+    assert status.status == JobStatus.RUNNING
+    await fake_helper.kill_job(job.id)
+
+
+async def test_rejected_bootstrap_is_renewed_once(
+    fake: FakePlatform, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache = BootstrapCache(tmp_path / "cache")
+    scope = BootstrapCache.scope(fake.api_url, fake.cluster_name, USER)
+    token = fake.add_user(USER)
+    cache.set(scope, "token", token, TOKEN_TTL)
+    dirs = itertools.count()
+
+    def make_dir() -> Path:
+        path = tmp_path / f"login-{next(dirs)}"
+        path.mkdir()
+        return path
+
+    path = await _user_config(cache, scope, token, fake.api_url, make_dir, None)
+    assert path is not None
+    cache.set_config(scope, token, path)
+
+    # The platform no longer accepts tokens of the cached scope
+    monkeypatch.setattr(platform_e2e.fake, "FAKE_SIGNING_KEY", "rotated")
+    renewed: list[str] = []
+
+    async def renew_token() -> str:
+        renewed.append(fake.token(USER))
+        return renewed[-1]
+
+    path = await _user_config(cache, scope, token, fake.api_url, make_dir, renew_token)
+    assert len(renewed) == 1
+    assert cache.get(scope, "token") is None
+    async with get(path=path) as client:
+        assert client.config.username == USER
+
+    # A rejected renewal is not retried again, nor is an unrenewable token
+    async def stale_token() -> str:
+        renewed.append(token)
+        return token
+
+    with pytest.raises(AuthError):
+        await _user_config(cache, scope, token, fake.api_url, make_dir, stale_token)
+    assert len(renewed) == 2
+    with pytest.raises(AuthError):
+        await _user_config(cache, scope, token, fake.api_url, make_dir, None)
+    assert len(renewed) == 2
+
+
+async def test_storage_and_buckets(fake: FakePlatform, fake_helper: Helper) -> None:
+    await fake_helper.mkdir("data")
+    checksum = await fake_helper.upload_random("data/file", 3_000_000, seed=1)
+    result = await fake_helper.storage_checksum(
+        "data/file", parallel=3, range_size=1_000_000
+    )
+    assert result.hexdigest == checksum
+
+    async with fake_helper.create_tmp_bucket() as bucket:
+        checksum = await fake_helper.upload_random_blob(bucket, "blob", 100_000)
+        await fake_helper.check_blob_checksum(bucket, "blob", checksum)
+        blob = await fake_helper.upload_random_blob(bucket, "large", 3_000_000)
+        route = "GET /s3/{bucket}/{key}"
+        sent = fake.sent[route]
+        result = await fake_helper.blob_checksum(
+            bucket, "large", parallel=3, range_size=1_000_000
+        )
+        assert result.hexdigest == blob
+        # Every range stops at its end instead of streaming the tail
+        assert fake.sent[route] - sent == 3_000_000
+        for i in range(2500):
+            fake.put_blob(bucket, f"many/{i}")
+        cleaned = await fake_helper.cleanup_bucket(bucket)
+    assert cleaned.batched
+    assert cleaned.deleted == 2502
+
+
+async def test_cleanup_resumes_failed_listing(
+    fake: FakePlatform, fake_helper: Helper, caplog: pytest.LogCaptureFixture
+) -> None:
+    caplog.set_level(logging.INFO, "platform_e2e.cleanup")
+    async with fake_helper.create_tmp_bucket() as bucket:
+        for i in range(10_000):
+            fake.put_blob(bucket, f"many/{i:05d}")
+        # Listing and batched deletes share the bucket path
+        fake.faults.error_rate = 0.5
+        fake.faults.error_status = 400
+        fake.faults.routes = r"^/s3/[^/]+$"
+        retry = RetryPolicy(attempts=20, base_delay=0.01, max_delay=0.05)
+        cleaned = await BucketCleaner(fake_helper.client, retry=retry).cleanup(bucket)
+        fake.faults.error_rate = 0.0
+    assert "Retry listing" in caplog.text
+    assert (cleaned.deleted, cleaned.failed) == (10_000, {})
+
+
+async def test_injected_faults(fake: FakePlatform, fake_helper: Helper) -> None:
+    fake.faults.unschedulable_rate = 1.0
+    job = await fake_helper.run_job(
+        "ubuntu", "true", schedule_timeout=0.2, wait_state=JobStatus.FAILED
+    )
+    assert job.history.reason == UNSCHEDULABLE_REASON
+
+    fake.faults.unschedulable_rate = 0.0
+    fake.faults.error_rate = 1.0
+    fake.faults.routes = r"/jobs$"
+    with pytest.raises(ServerNotAvailable):
+        await fake_helper.run_job("ubuntu", "true")
+
+
+async def test_reap_and_sweep_run_jobs(fake: FakePlatform, fake_helper: Helper) -> None:
+    fake.delays.killing = 1.0
+    specs = [JobSpec("ubuntu", "sleep 3600") for _ in range(10)]
+    jobs = await fake_helper.run_jobs(specs)
+    assert all(fake_helper.run_tag in job.tags for job in jobs)
+    assert await fake_helper.sweep_jobs(3600) == 0
+
+    started = time.monotonic()
+    assert await fake_helper.reap_run_jobs() == 10
+    # Killed together, not one after another
+    assert time.monotonic() - started < 5
+    for job in jobs:
+        status = await fake_helper.client.jobs.status(job.id)
+        assert status.status == JobStatus.CANCELLED
+
+    # Jobs of this run are never swept, whatever their age
+    await fake_helper.run_job("ubuntu", "sleep 3600")
+    container = Container(
+        RemoteImage("ubuntu"), Resources(cpu=0.1, memory=10**8), command="sleep 3600"
+    )
+    await fake_helper.client.jobs.run(container, tags=[RUN_TAG, f"{RUN_TAG}:other"])
+    fake.requests.clear()
+    assert await fake_helper.sweep_jobs(0) == 1
+    # Confirmed by listing, the watcher of this run does not poll swept jobs
+    assert fake.requests["GET /api/v1/jobs/{id}"] == 0
+    assert fake.requests["GET /api/v1/jobs"] > 1
+    assert await fake_helper.reap_run_jobs() == 1
+
+
+async def test_watcher_polls_active_run_jobs(
+    fake: FakePlatform, fake_helper: Helper
+) -> None:
+    client = fake_helper.client
+    jobs = await fake_helper.run_jobs([JobSpec("ubuntu", "sleep 1") for _ in range(5)])
+    container = Container(
+        RemoteImage("ubuntu"), Resources(cpu=0.1, memory=10**8), command="sleep 1"
+    )
+    other = await client.jobs.run(container)
+    untagged = fake_helper.watch_job(other)
+    fake.requests.clear()
+
+    await asyncio.gather(
+        untagged.succeeded(), *(fake_helper.watch_job(j).succeeded() for j in jobs)
+    )
+    # Finished jobs drop out of the listing and are asked for once each, only
+    # the untagged job is asked for on every tick
+    listed = fake.requests["GET /api/v1/jobs"]
+    assert listed > 1
+    assert fake.requests["GET /api/v1/jobs/{id}"] <= len(jobs) + listed
+    for job in [*jobs, other]:
+        assert fake_helper.watcher.get(job.id) is None
+
+    # A handle kept after it was dropped is watched again
+    job = await fake_helper.run_job("ubuntu", "sleep 3600")
+    handle = fake_helper.watch_job(job)
+    await fake_helper.kill_job(job.id)
+    await handle.cancelled()
+    assert fake_helper.watcher.get(job.id) is None
+    with pytest.raises(AssertionError, match="Cannot start job"):
+        await handle.running()
+
+
+async def _cancelled(helper: Helper, job_id: str) -> bool:
+    status = await helper.client.jobs.status(job_id)
+    return status.status == JobStatus.CANCELLED
+
+
+async def test_job_pool_recycles_jobs(fake_helper: Helper) -> None:
+    pool = JobPool(fake_helper, "ubuntu", min_size=0, max_size=1, max_uses=2)
+    async with pool.lease() as job:
+        job.broken = True
+    broken = job.id
+    assert await _cancelled(fake_helper, broken)
+
+    async with pool.lease() as job:
+        assert job.id != broken
+        assert (await job.exec("echo ok")).stdout == "ok\n"
+    async with pool.lease() as same:
+        assert same is job
+        await job.exec("echo ok")
+    # The second exec used it up
+    assert await _cancelled(fake_helper, job.id)
+    async with pool.lease() as job:
+        assert job.id not in (broken, same.id)
+    await pool.close()
+
+
+async def test_job_pool_waits_at_max_size(fake_helper: Helper) -> None:
+    pool = JobPool(fake_helper, "ubuntu", min_size=0, max_size=1)
+    async with pool.lease() as job:
+        waiter = asyncio.create_task(pool._acquire())
+        await asyncio.sleep(0.5)
+        assert not waiter.done()
+    # The released job goes to the waiter instead of a new one
+    assert await asyncio.wait_for(waiter, 5) is job
+    await pool._release(job)
+    await pool.close()
+
+
+async def test_job_pool_spawn_failure(fake: FakePlatform, fake_helper: Helper) -> None:
+    pool = JobPool(fake_helper, "ubuntu", min_size=1, max_size=1)
+    fake.faults.error_rate = 1.0
+    fake.faults.routes = r"/jobs$"
+    await pool.start()
+    with pytest.raises(ServerNotAvailable):
+        async with pool.lease():
+            pass
+    # Failed spawns give their slots back, a later lease does not wait forever
+    fake.faults.error_rate = 0.0
+    async with asyncio.timeout(10):
+        async with pool.lease() as job:
+            assert not job.broken
+    await pool.close()
+
+
+async def test_job_pool_close_kills_jobs(fake_helper: Helper) -> None:
+    pool = JobPool(fake_helper, "ubuntu", min_size=2, max_size=3)
+    await pool.start()
+    async with pool.lease() as first:
+        async with pool.lease() as second:
+            async with pool.lease() as third:
+                pass
+    await pool.close()
+    for job in (first, second, third):
+        assert await _cancelled(fake_helper, job.id)
+
+
+SERVER_SPEC = ServerSpec("ubuntu", "sleep 3600", "echo {secret}")
+
+
+async def test_server_cache_shares_leases(fake_helper: Helper) -> None:
+    cache = ServerCache(fake_helper, linger=60)
+    async with cache.lease(SERVER_SPEC) as first:
+        async with cache.lease(SERVER_SPEC) as second:
+            assert second is first
+            # Concurrent leases see the same secret
+            secret = first.secret
+            assert first.refs == 2
+    assert first.refs == 0
+    async with cache.lease(SERVER_SPEC) as third:
+        assert third is first
+        assert third.secret != secret
+    named = ServerSpec("ubuntu", "sleep 3600", "echo {secret}", name="e2e-named")
+    async with cache.lease(named) as other:
+        assert other.id != first.id
+        assert other.job.name == "e2e-named"
+    assert cache.started == 2
+
+    # A server which is not running anymore is replaced
+    await fake_helper.kill_job(first.id)
+    async with cache.lease(SERVER_SPEC) as fourth:
+        assert fourth.id != first.id
+    await cache.close()
+    assert await _cancelled(fake_helper, fourth.id)
+    assert await _cancelled(fake_helper, other.id)
+
+
+async def test_server_cache_kills_idle_servers(fake_helper: Helper) -> None:
+    cache = ServerCache(fake_helper, linger=0.5)
+    async with cache.lease(SERVER_SPEC) as server:
+        await asyncio.sleep(1)
+    assert not await _cancelled(fake_helper, server.id)
+    # A lease within the linger keeps the server
+    await asyncio.sleep(0.2)
+    async with cache.lease(SERVER_SPEC) as same:
+        assert same is server
+    await asyncio.sleep(1)
+    assert await _cancelled(fake_helper, server.id)
+    async with cache.lease(SERVER_SPEC) as new:
+        assert new.id != server.id
+    assert cache.started == 2
+    await cache.close()
+
+
+@pytest.mark.benchmark
+async def test_watcher_load(
+    fake: FakePlatform, fake_helper: Helper, benchmark_report: BenchmarkReport
+) -> None:
+    count = 2000
+    specs = [JobSpec("ubuntu", "sleep 3600", tags=("fake-load",)) for _ in range(count)]
+    started = time.monotonic()
+    await fake_helper.run_jobs(specs, concurrency=64)
+    running = time.monotonic() - started
+    polls = fake.requests["GET /api/v1/jobs"]
+    assert await reap_jobs(fake_helper, "fake-load") == count
+    benchmark_report.add(
+        BenchmarkResult(
+            "fake.watcher",
+            {"jobs": count},
+            elapsed=time.monotonic() - started,
+            extra={
+                "running": running,
+                "polls": polls,
+                "requests": sum(fake.requests.values()),
+            },
+        )
+    )
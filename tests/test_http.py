@@ -0,0 +1,129 @@
+import asyncio
+import dataclasses
+import logging
+import socket
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from yarl import URL
+
+from platform_e2e import HTTPClient, RetryPolicy
+from platform_e2e.http import INGRESS_RETRY
+
+FAST = RetryPolicy(base_delay=0.01, max_delay=0.01)
+
+
+def _app(hits: Counter[str]) -> web.Application:
+    async def ingress(request: web.Request) -> web.Response:
+        # Answers 404 until the route is set up on the third request
+        hits[request.path] += 1
+        if hits[request.path] < 3:
+            return web.Response(status=404)
+        return web.Response(text="ok")
+
+    async def ok(request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def unavailable(request: web.Request) -> web.Response:
+        hits[request.path] += 1
+        return web.Response(status=503)
+
+    async def hang(request: web.Request) -> web.Response:
+        hits[request.path] += 1
+        await asyncio.sleep(10)
+        return web.Response(text="late")
+
+    app = web.Application()
+    app.router.add_get("/ingress", ingress)
+    app.router.add_get("/unavailable", unavailable)
+    app.router.add_get("/hang", hang)
+    app.router.add_get("/ok", ok)
+    return app
+
+
+@pytest.fixture
+async def server() -> AsyncIterator[tuple[URL, Counter[str]]]:
+    hits: Counter[str] = Counter()
+    async with TestServer(_app(hits), host="127.0.0.1") as server:
+        yield server.make_url("/"), hits
+
+
+@pytest.fixture
+async def http() -> AsyncIterator[HTTPClient]:
+    client = HTTPClient()
+    yield client
+    await client.close()
+
+
+async def test_http_retries_ingress_statuses(
+    server: tuple[URL, Counter[str]], http: HTTPClient
+) -> None:
+    url, hits = server
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        await http.get(url / "ingress", policy=FAST)
+    # 404 is final unless the policy retries it
+    assert exc_info.value.status == 404
+    assert hits["/ingress"] == 1
+
+    policy = dataclasses.replace(INGRESS_RETRY, base_delay=0.01, max_delay=0.01)
+    hits.clear()
+    probe = await http.get(url / "ingress", policy=policy)
+    assert (probe.status, probe.body, probe.attempts) == (200, "ok", 3)
+    assert len(probe.history) == 3
+    assert probe.history[-1] == probe.timings
+
+
+async def test_http_deadline_cuts_retries(
+    server: tuple[URL, Counter[str]], http: HTTPClient
+) -> None:
+    url, hits = server
+    policy = RetryPolicy(attempts=100, base_delay=0.2, max_delay=0.2, deadline=1)
+    started = time.monotonic()
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        await http.get(url / "unavailable", policy=policy)
+    assert exc_info.value.status == 503
+    assert time.monotonic() - started < 1.5
+    assert 1 < hits["/unavailable"] < 100
+
+    # A hanging attempt is cut by the deadline of the whole probe too
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        await http.get(url / "hang", policy=dataclasses.replace(policy, deadline=0.5))
+    assert time.monotonic() - started < 1.5
+    assert hits["/hang"] == 1
+
+
+async def test_http_raises_connection_error(
+    http: HTTPClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    caplog.set_level(logging.INFO, "platform_e2e.http")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    url = URL(f"http://127.0.0.1:{port}/")
+    with pytest.raises(aiohttp.ClientConnectionError):
+        await http.get(url, policy=dataclasses.replace(FAST, attempts=3))
+    attempts = [r for r in caplog.records if r.getMessage().startswith(f"Probe {url}:")]
+    assert len(attempts) == 3
+
+
+async def test_http_timings(server: tuple[URL, Counter[str]], http: HTTPClient) -> None:
+    url, _ = server
+    # A host name is resolved and connected on the first request
+    url = url.with_host("localhost")
+    first = await http.get(url / "ok", policy=FAST)
+    assert first.timings.dns is not None
+    assert first.timings.connect is not None
+    assert first.timings.ttfb is not None
+    assert 0 < first.timings.ttfb <= first.timings.total
+
+    # The next one reuses the pooled connection and the cached address
+    second = await http.get(url / "ok", policy=FAST)
+    assert second.timings.connect is None
+    assert second.timings.dns is None
+    assert second.timings.ttfb is not None
@@ -7,7 +7,7 @@ from uuid import uuid4
 from apolo_sdk import JobStatus, Resources, Volume
 from yarl import URL
 
-from platform_e2e import Helper
+from platform_e2e import Helper, JobSpec
 
 
 async def test_unschedulable_job_lifecycle(helper: Helper) -> None:
@@ -61,11 +61,15 @@ async def test_unschedulable_job_lifecycle(helper: Helper) -> None:
 async def test_two_jobs_at_once(helper: Helper) -> None:
     # Run a new job
     command = 'bash -c "sleep 10m; false"'
-    first_job = await helper.run_job(
-        "ghcr.io/neuro-inc/ubuntu:latest", command, wait_state=JobStatus.PENDING
-    )
-    second_job = await helper.run_job(
-        "ghcr.io/neuro-inc/ubuntu:latest", command, wait_state=JobStatus.PENDING
+    first_job, second_job = await helper.run_jobs(
+        [
+            JobSpec(
+                "ghcr.io/neuro-inc/ubuntu:latest",
+                command,
+                wait_state=JobStatus.PENDING,
+            )
+        ]
+        * 2
     )
 
     # Check it is in a running,pending job list now
@@ -81,14 +85,16 @@ async def test_two_jobs_at_once(helper: Helper) -> None:
     assert second_job.id in job_ids
 
     # Kill the job
-    await helper.client.jobs.kill(first_job.id)
-    await helper.client.jobs.kill(second_job.id)
+    await helper.kill_job(first_job.id)
+    await helper.kill_job(second_job.id)
 
     # Currently we check that the job is not running anymore
     # TODO(adavydow): replace to succeeded check when racecon in
     # platform-api fixed.
-    await helper.wait_job_state(first_job.id, JobStatus.CANCELLED)
-    await helper.wait_job_state(second_job.id, JobStatus.CANCELLED)
+    await asyncio.gather(
+        helper.wait_job_state(first_job.id, JobStatus.CANCELLED),
+        helper.wait_job_state(second_job.id, JobStatus.CANCELLED),
+    )
 
     # Check that it is not in a running job list anymore
     jobs = [
@@ -109,17 +115,12 @@ async def test_job_list_filtered_by_status(
     N_JOBS = 5
 
     # submit N jobs
-    jobs = set()
-    for _ in range(N_JOBS):
-        command = "sleep 10m"
-        job = await helper.run_job(
-            "ghcr.io/neuro-inc/ubuntu:latest", command, wait_state=JobStatus.PENDING
-        )
-        kill_later(job.id)
-        jobs.add(job.id)
-
-    for job_id in jobs:
-        await helper.wait_job_state(job_id, JobStatus.RUNNING)
+    command = "sleep 10m"
+    submitted = await helper.run_jobs(
+        [JobSpec("ghcr.io/neuro-inc/ubuntu:latest", command)] * N_JOBS,
+        on_submit=kill_later,
+    )
+    jobs = {job.id for job in submitted}
 
     # test no status filters (same as pending+running)
     ret = [
@@ -172,26 +173,17 @@ async def test_job_list_filtered_by_status_and_name(
     helper: Helper, kill_later: Callable[[str], None]
 ) -> None:
     N_JOBS = 5
-    jobs_name_map = dict()
-    name_0 = None
     command = "sleep 10m"
-    for i in range(N_JOBS):
-        name = f"test-job-{uuid4().hex[:5]}"
-        if not name_0:
-            name_0 = name
-        job = await helper.run_job(
-            "ghcr.io/neuro-inc/ubuntu:latest",
-            command,
-            name=name,
-            wait_state=JobStatus.PENDING,
-        )
-        kill_later(job.id)
-        jobs_name_map[name] = job.id
-
-    assert name_0 is not None
-
-    for job_id in jobs_name_map.values():
-        await helper.wait_job_state(job_id, JobStatus.RUNNING)
+    names = [f"test-job-{uuid4().hex[:5]}" for _ in range(N_JOBS)]
+    submitted = await helper.run_jobs(
+        [
+            JobSpec("ghcr.io/neuro-inc/ubuntu:latest", command, name=name)
+            for name in names
+        ],
+        on_submit=kill_later,
+    )
+    jobs_name_map = {name: job.id for name, job in zip(names, submitted)}
+    name_0 = names[0]
 
     # test filtering by name only
     ret = [job async for job in helper.client.jobs.list(name=name_0)]
@@ -250,7 +242,7 @@ async def test_job_storage_interaction(helper: Helper, tmp_path: Path) -> None:
         wait_state=JobStatus.SUCCEEDED,
     )
 
-    # Download into local dir and confirm checksum
+    # Stream the result and confirm checksum
     assert checksum == await helper.calc_storage_checksum("result/foo")
 
 
@@ -276,7 +268,7 @@ async def test_job_logs(helper: Helper) -> None:
     await helper.check_job_output(job.id, expected_output)
 
     # If running job is killed it's pod will be deleted
-    await helper.client.jobs.kill(job.id)
+    await helper.kill_job(job.id)
     await asyncio.sleep(10)  # Give time kubernetes to delete pod
 
     # Pod doesn't exist, check logs saved to logs storage
@@ -0,0 +1,17 @@
+import pytest
+
+from platform_e2e import LoadProfile
+
+
+def test_load_profile_parse() -> None:
+    assert LoadProfile.parse("burst:3").offsets == (0.0, 0.0, 0.0)
+    assert LoadProfile.parse("rate:2:2").offsets == (0.0, 0.5, 1.0, 1.5)
+    step = LoadProfile.parse("step:1:1:2:2")
+    assert step.offsets == (0.0, 1.0, 2.0, 2.5, 3.0, 3.5)
+    assert step.name == "step:1:1:2:2"
+
+
+@pytest.mark.parametrize("spec", ["burst", "rate:0:10", "step:1:1:2", "ramp:1"])
+def test_load_profile_parse_invalid(spec: str) -> None:
+    with pytest.raises(ValueError):
+        LoadProfile.parse(spec)
@@ -0,0 +1,85 @@
+import re
+from datetime import UTC, datetime
+
+from platform_e2e import LogCursor, LogMatcher
+
+
+def test_log_matcher_split_utf8() -> None:
+    data = "привет, мир\n".encode()
+    matcher = LogMatcher(["мир"])
+    for byte in data:
+        matcher.feed(bytes([byte]))
+    assert matcher.matched
+    assert matcher.consumed == len(data)
+
+
+def test_log_matcher_literal_across_chunks() -> None:
+    matcher = LogMatcher([re.escape("1\n2\n3\n")], window=16)
+    assert not matcher.feed(b"x" * 100 + b"1\n2")
+    assert matcher.feed(b"\n3\n")
+
+
+def test_log_matcher_all_patterns_required() -> None:
+    matcher = LogMatcher([r"done in \d+s", "ready"])
+    assert not matcher.feed(b"ready\n")
+    assert matcher.pending == [r"done in \d+s"]
+    assert matcher.feed(b"done in 15s\n")
+
+
+def test_log_matcher_window_is_bounded() -> None:
+    matcher = LogMatcher(["never", r"start.*end", r"a{2}b"], window=1024)
+    assert not matcher.feed(b"start")
+    for _ in range(1000):
+        matcher.feed(b"a" * 4096)
+    assert not matcher.feed(b"b end")
+    # Only the window is searched, the start went out of it
+    assert matcher.pending == ["never", r"start.*end"]
+    assert matcher.consumed == 4096 * 1000 + 10
+
+
+def test_log_cursor_strips_timestamps() -> None:
+    cursor = LogCursor()
+    assert cursor.since is None
+    assert cursor.feed(b"2024-01-01T00:00:01.5Z a\n2024-01-01T00:00:0") == b"a\n"
+    assert cursor.feed(b"2Z b\n2024-01-01T00:00:03Z c") == b"b\nc"
+    assert cursor.flush() == b""
+    assert cursor.since == datetime(2024, 1, 1, 0, 0, 3, tzinfo=UTC)
+    # Lines without a timestamp are passed as is
+    assert cursor.feed(b"plain\n") == b"plain\n"
+
+
+def test_log_cursor_skips_resent_lines() -> None:
+    cursor = LogCursor()
+    cursor.feed(b"2024-01-01T00:00:01Z a\n2024-01-01T00:00:02Z b\n")
+    cursor.feed(b"2024-01-01T00:00:02Z c\n")
+    cursor.resume()
+    # The stream is resumed at the second, earlier lines of it are resent
+    resent = (
+        b"2024-01-01T00:00:01Z a\n"
+        b"2024-01-01T00:00:02Z b\n"
+        b"2024-01-01T00:00:02Z c\n"
+        b"2024-01-01T00:00:02Z d\n"
+        b"2024-01-01T00:00:03Z e\n"
+    )
+    assert cursor.feed(resent) == b"d\ne\n"
+
+
+def test_log_cursor_matches_unterminated_line() -> None:
+    cursor = LogCursor()
+    matcher = LogMatcher(["Password: "])
+    assert not matcher.feed(cursor.feed(b"2024-01-01T00:00:01Z login\n"))
+    assert not matcher.feed(cursor.feed(b"2024-01-01T00:00:02Z Pass"))
+    # The stream is still open, the prompt has no line end
+    assert matcher.feed(cursor.feed(b"word: "))
+
+
+def test_log_cursor_resumes_unterminated_line() -> None:
+    cursor = LogCursor()
+    assert cursor.feed(b"2024-01-01T00:00:01Z a\n2024-01-01T00:00:01Z 12") == b"a\n12"
+    cursor.resume()
+    assert cursor.since == datetime(2024, 1, 1, 0, 0, 1, tzinfo=UTC)
+    # The cut line is resent whole, only its rest is new
+    assert cursor.feed(b"2024-01-01T00:00:01Z a\n2024-01-01T00:00:01Z 1") == b""
+    assert cursor.feed(b"234\n2024-01-01T00:00:02Z b\n") == b"34\nb\n"
+    cursor.resume()
+    assert cursor.feed(b"2024-01-01T00:00:02Z b\n2024-01-01T00:00:03Z c\n") == b"c\n"
@@ -1,11 +1,15 @@
-import re
 import uuid
+from collections.abc import AsyncIterator
 from typing import Any
 
 import pytest
-from apolo_sdk import JobStatus, Resources
+from apolo_sdk import Resources
 
-from platform_e2e import Helper
+from platform_e2e import Helper, JobPool
+from platform_e2e.http import INGRESS_RETRY
+
+# Server jobs are shared by the tests of a worker, keep them on one
+pytestmark = pytest.mark.xdist_group("network")
 
 # Clusters created during Platform Infra CI are configured with
 # letsencrypt staging certificates. So we need to install them into
@@ -32,53 +36,77 @@ JOB_RESOURCES = Resources(
 )
 
 
-async def run_fetch_secret_job(
-    helper: Helper,
-    secret_job_url: str,
-    fetch_output: str,
-    fetch_wait_state: JobStatus = JobStatus.SUCCEEDED,
-) -> None:
-    secret_job_url = f"{secret_job_url}/secret.txt"
-    command = (
-        f"sh -c '{INSTALL_CERTIFICATE_COMMAND} "
-        f"&& wget -q -T 15 {secret_job_url} -O -'"
+@pytest.fixture(scope="session")
+async def fetch_pool(helper: Helper) -> AsyncIterator[JobPool]:
+    pool = JobPool(
+        helper,
+        "ghcr.io/neuro-inc/alpine:latest",
+        init_command=f"sh -c '{INSTALL_CERTIFICATE_COMMAND}'",
+        resources=JOB_RESOURCES,
     )
-    fetch_job = await helper.run_job(
+    await pool.start()
+    yield pool
+    await pool.close()
+
+
+@pytest.fixture(scope="session")
+async def fetch_pool_alt(helper_alt: Helper) -> AsyncIterator[JobPool]:
+    pool = JobPool(
+        helper_alt,
         "ghcr.io/neuro-inc/alpine:latest",
-        command,
-        description="e2e tests: fetch secret job",
-        wait_state=fetch_wait_state,
+        init_command=f"sh -c '{INSTALL_CERTIFICATE_COMMAND}'",
         resources=JOB_RESOURCES,
     )
+    await pool.start()
+    yield pool
+    await pool.close()
 
-    await helper.check_job_output(fetch_job.id, re.escape(fetch_output))
 
+async def fetch_secret(
+    pool: JobPool,
+    secret_job_url: str,
+    fetch_output: str,
+    *,
+    should_fail: bool = False,
+) -> None:
+    secret_job_url = f"{secret_job_url}/secret.txt"
+    async with pool.lease() as job:
+        result = await job.exec(f"wget -q -T 15 {secret_job_url} -O -")
+    output = result.stdout + result.stderr
+    if should_fail:
+        assert result.exit_code != 0, f"Fetch unexpectedly succeeded: {output}"
+    else:
+        assert result.exit_code == 0, f"Fetch failed: {output}"
+    assert fetch_output in output
 
-async def test_job_internal_connectivity(secret_job: Any, helper: Helper) -> None:
+
+async def test_job_internal_connectivity(secret_job: Any, fetch_pool: JobPool) -> None:
     http_job = await secret_job(False, name=f"secret-{str(uuid.uuid4())[:8]}")
 
-    await run_fetch_secret_job(
-        helper, f"http://{http_job['internal_hostname']}", http_job["secret"]
+    await fetch_secret(
+        fetch_pool, f"http://{http_job['internal_hostname']}", http_job["secret"]
     )
-    await run_fetch_secret_job(
-        helper, f"http://{http_job['internal_hostname_named']}", http_job["secret"]
+    await fetch_secret(
+        fetch_pool,
+        f"http://{http_job['internal_hostname_named']}",
+        http_job["secret"],
     )
 
 
 async def test_job_with_http_port_external_connectivity(
-    secret_job: Any, helper: Helper
+    secret_job: Any, helper: Helper, fetch_pool: JobPool
 ) -> None:
     http_job = await secret_job(True)
 
     ingress_secret_url = http_job["ingress_url"].with_path("/secret.txt")
 
     # external ingress test
-    probe = await helper.http_get(ingress_secret_url)
+    probe = await helper.http_get(ingress_secret_url, policy=INGRESS_RETRY)
     assert probe
     assert probe.strip() == http_job["secret"]
 
     # internal ingress test
-    await run_fetch_secret_job(helper, http_job["ingress_url"], http_job["secret"])
+    await fetch_secret(fetch_pool, http_job["ingress_url"], http_job["secret"])
 
 
 async def test_job_without_http_port_external_connectivity(
@@ -86,7 +114,7 @@ async def test_job_without_http_port_external_connectivity(
 ) -> None:
     # run http job for getting url
     http_job = await secret_job(True)
-    await helper.client.jobs.kill(http_job["id"])
+    await helper.kill_job(http_job["id"])
     ingress_secret_url = http_job["ingress_url"].with_path("/secret.txt")
     internal_secret_url = f"http://{http_job['internal_hostname']}/secret.txt"
 
@@ -109,16 +137,16 @@ async def test_job_without_http_port_external_connectivity(
 
 
 @pytest.mark.network_isolation
-async def test_job_isolation(secret_job: Any, helper_alt: Helper) -> None:
+async def test_job_isolation(secret_job: Any, fetch_pool_alt: JobPool) -> None:
     http_job = await secret_job(True)
 
     # internal ingress test
-    await run_fetch_secret_job(helper_alt, http_job["ingress_url"], http_job["secret"])
+    await fetch_secret(fetch_pool_alt, http_job["ingress_url"], http_job["secret"])
 
     # internal network test
-    await run_fetch_secret_job(
-        helper_alt,
+    await fetch_secret(
+        fetch_pool_alt,
         f"http://{http_job['internal_hostname']}",
         "timed out",
-        fetch_wait_state=JobStatus.FAILED,
+        should_fail=True,
     )
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from yarl import URL
+
+from platform_e2e import RegistryClient, SyntheticImage
+from platform_e2e.oci import TOKEN_REFRESH_MARGIN
+
+TOKEN = "secret-token"
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+def _registry_app(
+    *, bearer: bool = False, expires_in: float = 60, issued: list[str] | None = None
+) -> web.Application:
+    """
+    Registry stand-in with the subset of the distribution API the client uses.
+
+    Bearer tokens are valid for the repositories of their scopes only.
+    """
+    blobs: dict[str, dict[str, bytes]] = {}
+    manifests: dict[str, dict[str, bytes]] = {}
+    uploads: dict[str, bytearray] = {}
+    tokens: dict[str, tuple[set[str], float]] = {}
+
+    def _authorized(request: web.Request) -> bool:
+        scheme, _, value = request.headers.get("Authorization", "").partition(" ")
+        if scheme != "Bearer" or value not in tokens:
+            return False
+        repos, expires_at = tokens[value]
+        name = re.match(r"/v2/(.+?)/(blobs|manifests)/", request.path)
+        return name is not None and name[1] in repos and time.time() < expires_at
+
+    @web.middleware
+    async def _auth(request: web.Request, handler: Handler) -> web.StreamResponse:
+        if request.path == "/token":
+            return await handler(request)
+        if bearer and not _authorized(request):
+            realm = str(request.url.with_path("/token").with_query(None))
+            return web.Response(
+                status=401,
+                headers={"WWW-Authenticate": f'Bearer realm="{realm}",service="stub"'},
+            )
+        return await handler(request)
+
+    async def token(request: web.Request) -> web.Response:
+        scopes = request.query.getall("scope")
+        value = f"{TOKEN}-{uuid.uuid4()}"
+        tokens[value] = ({scope.split(":")[1] for scope in scopes}, time.time() + 60)
+        if issued is not None:
+            issued.extend(scopes)
+        return web.json_response({"token": value, "expires_in": expires_in})
+
+    async def start_upload(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        digest = request.query.get("mount")
+        source = blobs.get(request.query.get("from", ""), {})
+        if digest and digest in source:
+            blobs.setdefault(name, {})[digest] = source[digest]
+            return web.Response(status=201)
+        upload_id = str(uuid.uuid4())
+        uploads[upload_id] = bytearray()
+        location = f"/v2/{name}/blobs/uploads/{upload_id}"
+        return web.Response(status=202, headers={"Location": location})
+
+    async def patch_upload(request: web.Request) -> web.Response:
+        upload_id = request.match_info["upload"]
+        async for chunk in request.content.iter_any():
+            uploads[upload_id] += chunk
+        return web.Response(status=202, headers={"Location": request.path})
+
+    async def put_upload(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        data = bytes(uploads.pop(request.match_info["upload"]))
+        digest = "sha256:" + hashlib.sha256(data).hexdigest()
+        if digest != request.query["digest"]:
+            return web.Response(status=400)
+        blobs.setdefault(name, {})[digest] = data
+        return web.Response(status=201)
+
+    async def get_blob(request: web.Request) -> web.Response:
+        data = blobs.get(request.match_info["name"], {}).get(
+            request.match_info["digest"]
+        )
+        if data is None:
+            return web.Response(status=404)
+        return web.Response(body=data)
+
+    async def put_manifest(request: web.Request) -> web.Response:
+        data = await request.read()
+        digest = "sha256:" + hashlib.sha256(data).hexdigest()
+        repo = manifests.setdefault(request.match_info["name"], {})
+        repo[request.match_info["reference"]] = repo[digest] = data
+        return web.Response(status=201, headers={"Docker-Content-Digest": digest})
+
+    async def get_manifest(request: web.Request) -> web.Response:
+        data = manifests.get(request.match_info["name"], {}).get(
+            request.match_info["reference"]
+        )
+        if data is None:
+            return web.Response(status=404)
+        return web.Response(body=data, content_type=json.loads(data)["mediaType"])
+
+    app = web.Application(middlewares=[_auth])
+    app.router.add_get("/token", token)
+    app.router.add_post("/v2/{name:.+}/blobs/uploads/", start_upload)
+    app.router.add_patch("/v2/{name:.+}/blobs/uploads/{upload}", patch_upload)
+    app.router.add_put("/v2/{name:.+}/blobs/uploads/{upload}", put_upload)
+    app.router.add_get("/v2/{name:.+}/blobs/{digest}", get_blob)
+    app.router.add_put("/v2/{name:.+}/manifests/{reference}", put_manifest)
+    app.router.add_get("/v2/{name:.+}/manifests/{reference}", get_manifest)
+    return app
+
+
+@pytest.fixture
+async def registry() -> AsyncIterator[URL]:
+    async with TestServer(_registry_app()) as server:
+        yield server.make_url("/")
+
+
+async def test_push_pull_roundtrip(registry: URL) -> None:
+    image = SyntheticImage(3, 300_000, seed=1)
+    client = RegistryClient(registry)
+    try:
+        pushed = await client.push("project/first", "v1", image)
+        assert [layer.mode for layer in pushed.layers] == ["upload"] * 3
+        assert pushed.transferred == image.size
+
+        pulled = await client.pull("project/first", "v1")
+        assert pulled.manifest_digest == pushed.manifest_digest
+        assert [layer.digest for layer in pulled.layers] == [
+            layer.digest for layer in image.layers
+        ]
+
+        again = await client.push("project/first", "v2", image)
+        assert [layer.mode for layer in again.layers] == ["exists"] * 3
+
+        mounted = await client.push(
+            "project/second", "v1", image, mount_from="project/first"
+        )
+        assert [layer.mode for layer in mounted.layers] == ["mount"] * 3
+        assert mounted.transferred == 0
+    finally:
+        await client.close()
+
+
+async def test_bearer_challenge() -> None:
+    async with TestServer(_registry_app(bearer=True)) as server:
+        client = RegistryClient(server.make_url("/"), auth="Basic dXNlcjpwYXNz")
+        try:
+            pushed = await client.push("project/auth", "v1", SyntheticImage(1, 1000))
+            pulled = await client.pull("project/auth", "v1")
+        finally:
+            await client.close()
+    assert pulled.manifest_digest == pushed.manifest_digest
+
+
+async def test_bearer_tokens_per_repository() -> None:
+    issued: list[str] = []
+    # Tokens about to expire are renewed before every streamed upload
+    app = _registry_app(bearer=True, expires_in=TOKEN_REFRESH_MARGIN, issued=issued)
+    async with TestServer(app) as server:
+        client = RegistryClient(server.make_url("/"), auth="Basic dXNlcjpwYXNz")
+        try:
+            # A token of one repository is rejected by the other
+            await asyncio.gather(
+                client.push("project/first", "v1", SyntheticImage(2, 1000, seed=2)),
+                client.push("project/second", "v1", SyntheticImage(2, 1000, seed=3)),
+            )
+        finally:
+            await client.close()
+    assert set(issued) == {
+        "repository:project/first:pull,push",
+        "repository:project/second:pull,push",
+    }
+    # 2 layers and the config of every image
+    assert len(issued) >= 2 + 2 * 3
@@ -0,0 +1,148 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from platform_e2e import DurationHistory
+from platform_e2e.ordering import WORKER_HISTORY, OrderingPlugin, order_items
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture(autouse=True)
+def pytester_ini(pytester: pytest.Pytester) -> None:
+    pytester.makeini("""
+        [pytest]
+        asyncio_default_fixture_loop_scope = session
+        """)
+
+
+def test_duration_history_predicts_runtime(tmp_path: Path) -> None:
+    history = DurationHistory(tmp_path)
+    for duration in (10.0, 12.0, 11.0):
+        history.record("test_a.py::test_slow", duration, failed=False)
+        history.save()
+    history.record("test_b.py::test_fast@group", 1.0, failed=True)
+    history.record("test_b.py::test_other@group", 3.0, failed=False)
+    history.save()
+
+    history = DurationHistory(tmp_path)
+    assert history.duration("test_a.py::test_slow") == 11.0
+    assert history.duration("test_b.py::test_fast") == 1.0
+    assert history.fail_rate("test_b.py::test_fast") == 2 / 3
+    assert history.fail_rate("test_c.py::test_new") == 0.5
+
+    nodeids = [
+        "test_a.py::test_slow",
+        "test_b.py::test_fast@group",
+        "test_b.py::test_other@group",
+        "test_c.py::test_new",
+    ]
+    prediction = history.predict(nodeids, workers=2)
+    # A test without history costs the median of known ones
+    assert prediction.total == 11 + 1 + 3 + 3
+    assert prediction.wall == 11
+    assert (prediction.known, prediction.unknown) == (3, 1)
+
+
+ORDERING_TESTS = """
+import pytest
+
+def test_fast():
+    pass
+
+def test_slow():
+    pass
+
+@pytest.mark.xdist_group("group")
+def test_first_of_group():
+    pass
+
+def test_failing():
+    pass
+
+@pytest.mark.xdist_group("group")
+def test_second_of_group():
+    pass
+"""
+
+
+def _ordering_history(path: Path) -> DurationHistory:
+    history = DurationHistory(path)
+    for name, duration, failed in (
+        ("test_fast", 1.0, False),
+        ("test_slow", 8.0, False),
+        ("test_first_of_group", 3.0, False),
+        ("test_second_of_group", 4.0, False),
+        ("test_failing", 1.5, True),
+    ):
+        history.record(f"test_order.py::{name}", duration, failed)
+    history.save()
+    return history
+
+
+def test_order_items(pytester: pytest.Pytester) -> None:
+    items = pytester.getitems(pytester.makepyfile(test_order=ORDERING_TESTS))
+    history = _ordering_history(pytester.path / "history")
+
+    def names(mode: str) -> list[str]:
+        return [item.name for item in order_items(items, history, mode)]
+
+    # Members of a group are always together, in the order of collection
+    assert names("none") == [
+        "test_fast",
+        "test_slow",
+        "test_first_of_group",
+        "test_second_of_group",
+        "test_failing",
+    ]
+    # The group costs 7s and moves as a whole in its own order
+    assert names("duration") == [
+        "test_slow",
+        "test_first_of_group",
+        "test_second_of_group",
+        "test_failing",
+        "test_fast",
+    ]
+    assert names("failfast") == [
+        "test_failing",
+        "test_fast",
+        "test_first_of_group",
+        "test_second_of_group",
+        "test_slow",
+    ]
+
+
+@pytest.mark.parametrize(
+    "mode,args,expected",
+    [
+        ("auto", [], "none"),
+        ("auto", ["--exitfirst"], "failfast"),
+        ("auto", ["-n", "2"], "duration"),
+        ("auto", ["-n", "2", "--exitfirst"], "duration"),
+        ("auto", ["--stepwise", "--exitfirst"], "none"),
+        ("failfast", ["-n", "2"], "failfast"),
+        ("none", ["--exitfirst"], "none"),
+    ],
+)
+def test_resolve_mode(
+    pytester: pytest.Pytester, mode: str, args: list[str], expected: str
+) -> None:
+    config = pytester.parseconfig(*args)
+    plugin = OrderingPlugin(DurationHistory(pytester.path / "history"), mode)
+    assert plugin.resolve_mode(config) == expected
+
+
+def test_workers_order_from_controller_history(pytester: pytest.Pytester) -> None:
+    history = _ordering_history(pytester.path / "history")
+    node = SimpleNamespace(workerinput={})
+    OrderingPlugin(history).pytest_configure_node(node)
+    # Another run saves before the worker starts, its file differs now
+    other = DurationHistory(pytester.path / "history")
+    other.record("test_order.py::test_slow", 0.5, failed=False)
+    other.save()
+
+    worker = DurationHistory(
+        pytester.path / "history", snapshot=node.workerinput[WORKER_HISTORY]
+    )
+    assert worker.duration("test_order.py::test_slow") == 8.0
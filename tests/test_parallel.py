@@ -0,0 +1,42 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from platform_e2e import SetupCoordinator
+
+
+async def test_setup_runs_once(tmp_path: Path) -> None:
+    # Every worker has its coordinator over the same directory
+    coordinators = [SetupCoordinator(tmp_path) for _ in range(4)]
+    calls: list[str] = []
+
+    async def setup() -> None:
+        calls.append("setup")
+        await asyncio.sleep(0.1)
+
+    ran = await asyncio.gather(
+        *(coordinator.once("user:a", setup) for coordinator in coordinators * 2)
+    )
+    assert calls == ["setup"]
+    assert sorted(ran) == [False] * 7 + [True]
+    assert await coordinators[0].once("user:b", setup)
+    assert calls == ["setup", "setup"]
+
+
+async def test_failed_setup_is_retried(tmp_path: Path) -> None:
+    coordinator = SetupCoordinator(tmp_path)
+    calls = 0
+
+    async def setup() -> None:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError, match="failed"):
+        await coordinator.once("project:a", setup)
+    assert not list(tmp_path.glob("*.done"))
+    assert await SetupCoordinator(tmp_path).once("project:a", setup)
+    assert calls == 2
+    assert len(list(tmp_path.glob("*.done"))) == 1
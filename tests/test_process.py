@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+import pytest
+
+from platform_e2e import run_shell
+
+
+def _alive(pid: int) -> bool:
+    # Orphans may stay zombies for a while when nobody reaps them
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except FileNotFoundError:
+        return False
+    return stat.rpartition(")")[2].split()[0] != "Z"
+
+
+async def _wait_dead(pid: int, timeout: float = 5) -> None:
+    async with asyncio.timeout(timeout):
+        while _alive(pid):
+            await asyncio.sleep(0.05)
+
+
+async def _wait_pid(path: Path) -> int:
+    async with asyncio.timeout(5):
+        while not path.exists() or not path.read_text().strip():
+            await asyncio.sleep(0.05)
+    return int(path.read_text())
+
+
+async def test_run_shell_output() -> None:
+    assert await run_shell("echo out; echo err >&2") == "out\n"
+    with pytest.raises(SystemError, match="exits with code 3.*Stderr: err"):
+        await run_shell("echo err >&2; exit 3")
+
+
+async def test_run_shell_timeout_kills_process_group(tmp_path: Path) -> None:
+    pidfile = tmp_path / "pid"
+    with pytest.raises(TimeoutError, match="timed out after 0.5s"):
+        await run_shell(f"sleep 30 & echo $! > {pidfile}; wait", timeout=0.5)
+    # The grandchild in the background is killed with the shell
+    await _wait_dead(int(pidfile.read_text()))
+
+
+async def test_run_shell_cancel_kills_process_group(tmp_path: Path) -> None:
+    pidfile = tmp_path / "pid"
+    task = asyncio.create_task(run_shell(f"sleep 30 & echo $! > {pidfile}; wait"))
+    pid = await _wait_pid(pidfile)
+    assert _alive(pid)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await _wait_dead(pid)
+
+
+async def test_run_shell_caps_output(caplog: pytest.LogCaptureFixture) -> None:
+    caplog.set_level(logging.INFO, "platform_e2e.process")
+    out = await run_shell("yes | head -c 30000", max_output=1000)
+    assert out.startswith("[29000 bytes truncated]\n")
+    assert out.endswith("y\n" * 500)
+
+    # A line without end is logged in parts
+    caplog.clear()
+    out = await run_shell("head -c 300000 /dev/zero | tr '\\0' x", max_output=1000)
+    assert out.endswith("x" * 1000)
+    messages = [r.getMessage() for r in caplog.records if "out: " in r.getMessage()]
+    assert len(messages) == 300
+    assert all(message.endswith(" out: " + "x" * 1000) for message in messages)
+
+
+async def test_run_shell_env() -> None:
+    out = await run_shell("echo $E2E_VALUE $HOME", env={"E2E_VALUE": "x"})
+    assert out == f"x {os.environ['HOME']}\n"
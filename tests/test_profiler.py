@@ -0,0 +1,57 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import platform_e2e
+from platform_e2e import HarnessProfiler, Helper
+
+
+async def test_profiler_records_calls_and_blocked_loop(tmp_path: Path) -> None:
+    data = tmp_path / "data"
+    data.write_bytes(b"x" * 1000)
+    profiler = HarnessProfiler(
+        tmp_path / "profile", lag_interval=0.01, block_threshold=0.02
+    )
+    hash_hex = Helper.hash_hex
+    run_shell = platform_e2e.run_shell
+    profiler.install()
+    try:
+        helper = object.__new__(Helper)
+        with profiler.phase("test_x", "call"):
+            helper.hash_hex(data)
+            await platform_e2e.run_shell("true")
+            with profiler.span("wait"):
+                await asyncio.sleep(0.1)
+            # Blocks the loop long enough for the monitor to sample it
+            time.sleep(0.3)
+            await asyncio.sleep(0.05)
+        await helper.calc_local_checksum(data)
+    finally:
+        profiler.uninstall()
+    assert Helper.hash_hex is hash_hex
+    assert platform_e2e.run_shell is run_shell
+
+    profile = profiler.tests["test_x"]
+    assert profile.phases["call"] >= 0.45
+    assert profile.blocking["Helper.hash_hex"].count == 1
+    assert profile.calls["run_shell"].count == 1
+    assert profile.loop_lag.max >= 0.2
+    assert profile.loop_blocked > 0
+    assert profiler.tests["<session>"].calls["Helper.calc_local_checksum"].count == 1
+
+    profiler.write()
+    stacks = dict(
+        line.rsplit(" ", 1)
+        for line in (tmp_path / "profile.collapsed").read_text().splitlines()
+    )
+    assert int(stacks["test_x;call;wait"]) >= 100_000
+    assert "test_x;call;Helper.hash_hex" in stacks
+    assert any(
+        stack.startswith("test_x;call;loop blocked;")
+        and stack.endswith("test_profiler_records_calls_and_blocked_loop")
+        for stack in stacks
+    )
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert report["session"]["blocking"] > 0
+    assert [test["nodeid"] for test in report["tests"]] == ["<session>", "test_x"]
@@ -1,7 +1,9 @@
+import hashlib
 import logging
 import re
+import time
 from collections.abc import AsyncIterator, Iterator
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
 from typing import Any
 from uuid import uuid4 as uuid
@@ -9,31 +11,88 @@ from uuid import uuid4 as uuid
 import pytest
 from apolo_sdk import JobStatus, RemoteImage, ResourceNotFound
 
-from platform_e2e import Helper, shell
+from platform_e2e import BenchmarkReport, BenchmarkResult, Helper, run_shell
 
 log = logging.getLogger(__name__)
 
+# Tests depend on each other and on the session image, keep them on one worker
+pytestmark = pytest.mark.xdist_group("registry")
+
+
+DOCKERFILE = Path(__file__).parent / "assets/Dockerfile.echo"
+# Local repository of built images keyed by their build context
+BUILD_CACHE_REPO = "platform-e2e-build-cache"
+# A metadata-only layer over the cached image, which makes the pushed manifest
+# and the echoed output unique to the session
+SESSION_DOCKERFILE = """\
+ARG BASE
+FROM ${BASE}
+ARG TAG
+ENV TAG=${TAG}
+"""
+
+
+def _build_key(dockerfile: Path, build_args: dict[str, str]) -> str:
+    hasher = hashlib.sha256()
+    context = dockerfile.parent
+    hasher.update(f"{dockerfile.relative_to(context)}\0".encode())
+    for path in sorted(p for p in context.rglob("*") if p.is_file()):
+        hasher.update(f"{path.relative_to(context)}\0".encode())
+        hasher.update(path.read_bytes())
+    for name, value in sorted(build_args.items()):
+        hasher.update(f"{name}={value}\0".encode())
+    return hasher.hexdigest()[:32]
+
 
 @contextmanager
-def _build_image(image: RemoteImage) -> Iterator[None]:
-    dockerfile = Path(__file__).parent / "assets/Dockerfile.echo"
+def _timed(report: BenchmarkReport, name: str, **params: Any) -> Iterator[None]:
+    started_at = time.monotonic()
+    yield
+    elapsed = time.monotonic() - started_at
+    report.add(BenchmarkResult(name, params, elapsed=elapsed, latencies=[elapsed]))
+
+
+@asynccontextmanager
+async def _build_image(
+    image: RemoteImage, context: Path, report: BenchmarkReport
+) -> AsyncIterator[None]:
+    key = _build_key(DOCKERFILE, {})
+    cached = f"{BUILD_CACHE_REPO}:{key}"
     image_url = image.as_docker_url()
-    log.info(f"Build image {image_url}")
-    # build can be failed with error like  next:
-    #   error creating read-write layer with ID "xxx": operation not permitted
-    # if node has docker engine with aufs storage driver
-    # In this case platform-e2e image must be runned with --privileged switch
-    shell(
-        f"docker build -f {dockerfile} -t {image_url} --build-arg TAG={image.tag} "
-        f"{dockerfile.parent}"
+    started_at = time.monotonic()
+    try:
+        await run_shell(f"docker image inspect {cached}")
+        hit = True
+        log.info(f"Reuse image {cached}")
+    except SystemError:
+        hit = False
+        log.info(f"Build image {cached}")
+        # build can be failed with error like  next:
+        #   error creating read-write layer with ID "xxx": operation not permitted
+        # if node has docker engine with aufs storage driver
+        # In this case platform-e2e image must be runned with --privileged switch
+        await run_shell(f"docker build -f {DOCKERFILE} -t {cached} {DOCKERFILE.parent}")
+    (context / "Dockerfile").write_text(SESSION_DOCKERFILE)
+    await run_shell(
+        f"docker build -t {image_url} --build-arg BASE={cached} "
+        f"--build-arg TAG={image.tag} {context}"
+    )
+    elapsed = time.monotonic() - started_at
+    report.add(
+        BenchmarkResult(
+            "registry.build", {"cached": hit}, elapsed=elapsed, latencies=[elapsed]
+        )
     )
     yield
     log.info(f"Remove image {image_url}")
-    shell(f"docker rmi {image_url}")
+    # Removes the session layer only, the cached image stays for the next session
+    await run_shell(f"docker rmi {image_url}")
 
 
 @pytest.fixture(scope="session")
-async def image(helper: Helper) -> AsyncIterator[RemoteImage]:
+async def image(
+    helper: Helper, benchmark_report: BenchmarkReport, tmp_path_factory: Any
+) -> AsyncIterator[RemoteImage]:
     image = RemoteImage(
         name="platform-e2e",
         tag=str(uuid()),
@@ -41,7 +100,8 @@ async def image(helper: Helper) -> AsyncIterator[RemoteImage]:
         cluster_name=helper.cluster_name,
         project_name=helper.project_name,
     )
-    with _build_image(image):
+    context = tmp_path_factory.mktemp("image")
+    async with _build_image(image, context, benchmark_report):
         yield image
         try:
             digest = await helper.client.images.digest(image)
@@ -50,25 +110,34 @@ async def image(helper: Helper) -> AsyncIterator[RemoteImage]:
             pass
 
 
+@pytest.fixture(scope="session")
+def image_content(image: RemoteImage) -> str:
+    """Output of the echo image, unique to the session."""
+    assert image.tag is not None
+    return image.tag
+
+
 @pytest.mark.dependency(name="image_pushed")
-def test_user_can_push_image(
-    helper: Helper, image: RemoteImage, monkeypatch: Any
+async def test_user_can_push_image(
+    helper: Helper, image: RemoteImage, benchmark_report: BenchmarkReport
 ) -> None:
-    with helper.docker_context(monkeypatch):
-        shell(f"docker push {image.as_docker_url()}")
+    async with helper.docker_context() as env:
+        with _timed(benchmark_report, "registry.push"):
+            await run_shell(f"docker push {image.as_docker_url()}", env=env)
 
 
 @pytest.mark.dependency(name="pull_tested", depends=["image_pushed"])
-def test_user_can_pull_image(
-    helper: Helper, image: RemoteImage, monkeypatch: Any
+async def test_user_can_pull_image(
+    helper: Helper, image: RemoteImage, benchmark_report: BenchmarkReport
 ) -> None:
-    with helper.docker_context(monkeypatch):
-        shell(f"docker pull {image.as_docker_url()}")
+    async with helper.docker_context() as env:
+        with _timed(benchmark_report, "registry.pull"):
+            await run_shell(f"docker pull {image.as_docker_url()}", env=env)
 
 
 @pytest.mark.dependency(name="k8s_access_tested", depends=["image_pushed"])
 async def test_registry_is_accessible_by_k8s(
-    helper: Helper, image: RemoteImage
+    helper: Helper, image: RemoteImage, image_content: str
 ) -> None:
     job = await helper.run_job(
         str(image),
@@ -76,8 +145,7 @@ async def test_registry_is_accessible_by_k8s(
         schedule_timeout=240,
         wait_timeout=270,
     )
-    assert image.tag
-    await helper.check_job_output(job.id, re.escape(image.tag))
+    await helper.check_job_output(job.id, re.escape(image_content))
 
 
 @pytest.mark.dependency(depends=["pull_tested", "k8s_access_tested"])
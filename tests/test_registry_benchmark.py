@@ -0,0 +1,78 @@
+from collections import Counter
+from uuid import uuid4
+
+import pytest
+
+from platform_e2e import (
+    BenchmarkReport,
+    BenchmarkResult,
+    Helper,
+    RegistryTransfer,
+    SyntheticImage,
+)
+from platform_e2e.bench import GB, MB, format_size
+
+pytestmark = pytest.mark.benchmark
+
+LAYER_SIZES = [16 * MB, 256 * MB, GB]
+LAYERS = [1, 4, 16]
+MAX_IMAGE_BYTES = 8 * GB
+
+
+def _result(
+    name: str, params: dict[str, int], transfer: RegistryTransfer
+) -> BenchmarkResult:
+    return BenchmarkResult(
+        name,
+        params,
+        elapsed=transfer.elapsed,
+        latencies=[layer.elapsed for layer in transfer.layers],
+        bytes=transfer.transferred,
+        extra={
+            "modes": Counter(layer.mode for layer in transfer.layers),
+            "layer_mb_per_s": [layer.throughput / MB for layer in transfer.layers],
+        },
+    )
+
+
+@pytest.mark.parametrize("layers", LAYERS)
+@pytest.mark.parametrize("layer_size", LAYER_SIZES, ids=format_size)
+async def test_registry_push_pull(
+    helper: Helper,
+    benchmark_report: BenchmarkReport,
+    benchmark_max_size: int,
+    layer_size: int,
+    layers: int,
+) -> None:
+    if layer_size > benchmark_max_size:
+        pytest.skip(f"{format_size(layer_size)} is above --e2e-benchmark-max-size")
+    if layer_size * layers > MAX_IMAGE_BYTES:
+        pytest.skip(f"{layers} x {format_size(layer_size)} is above the image limit")
+    image = SyntheticImage(layers, layer_size, seed=layer_size)
+    repo = f"{helper.project_name}/e2e-bench-{uuid4().hex[:12]}"
+    mirror = f"{repo}-mount"
+    params = {"layers": layers, "layer_size": layer_size}
+    pushed: list[tuple[str, str]] = []
+    async with helper.registry_client() as registry:
+        try:
+            push = await registry.push(repo, "v1", image)
+            assert push.manifest_digest
+            pushed.append((repo, push.manifest_digest))
+            benchmark_report.add(_result("registry.push", params, push))
+
+            # All layers are in the repository already, only HEAD requests
+            dedupe = await registry.push(repo, "v2", image)
+            assert {layer.mode for layer in dedupe.layers} == {"exists"}
+            benchmark_report.add(_result("registry.push_existing", params, dedupe))
+
+            mount = await registry.push(mirror, "v1", image, mount_from=repo)
+            assert mount.manifest_digest
+            pushed.append((mirror, mount.manifest_digest))
+            benchmark_report.add(_result("registry.mount", params, mount))
+
+            pull = await registry.pull(repo, "v1")
+            assert pull.manifest_digest == push.manifest_digest
+            benchmark_report.add(_result("registry.pull", params, pull))
+        finally:
+            for name, digest in pushed:
+                await registry.delete_manifest(name, digest)
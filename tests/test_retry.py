@@ -0,0 +1,199 @@
+from pathlib import Path
+
+import pytest
+
+from platform_e2e import FlakyHistory
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture(autouse=True)
+def pytester_ini(pytester: pytest.Pytester) -> None:
+    pytester.makeini("""
+        [pytest]
+        asyncio_default_fixture_loop_scope = session
+        """)
+
+
+def test_flaky_history_merges_runs(tmp_path: Path) -> None:
+    first = FlakyHistory(tmp_path, size=6)
+    second = FlakyHistory(tmp_path, size=6)
+    for _ in range(5):
+        first.record("test_a", "P")
+        first.save()
+    second.record("test_a", "R")
+    second.record("test_b", "F")
+    second.save()
+
+    history = FlakyHistory(tmp_path, size=6)
+    assert history.outcomes("test_a") == "PPPPPR"
+    assert history.outcomes("test_b") == "F"
+    assert not history.is_flaky("test_a")
+
+    for outcome in "RR":
+        history.record("test_a", outcome)
+        history.save()
+    assert history.outcomes("test_a") == "PPPRRR"
+    assert history.is_flaky("test_a")
+    assert not history.is_flaky("test_b")
+
+
+def _history(pytester: pytest.Pytester) -> FlakyHistory:
+    return FlakyHistory(pytester.path / ".pytest_cache" / "d" / "e2e-flaky")
+
+
+def _outcomes(result: pytest.RunResult) -> dict[str, int]:
+    outcomes = result.parseoutcomes()
+    outcomes.pop("warnings", None)
+    return outcomes
+
+
+def test_retry_reports_rerun_and_pass(pytester: pytest.Pytester) -> None:
+    pytester.makepyfile("""
+        attempts = []
+
+        def test_flaky():
+            attempts.append(1)
+            assert len(attempts) > 1
+        """)
+    result = pytester.runpytest("--e2e-retries=2", "--e2e-retry-delay=0", "-v")
+    result.stdout.fnmatch_lines(["*::test_flaky RERUN*", "*::test_flaky PASSED*"])
+    assert _outcomes(result) == {"passed": 1, "rerun": 1}
+    assert result.ret == pytest.ExitCode.OK
+    assert (
+        _history(pytester).outcomes("test_retry_reports_rerun_and_pass.py::test_flaky")
+        == "R"
+    )
+
+
+def test_retry_reuses_session_fixtures(pytester: pytest.Pytester) -> None:
+    pytester.makepyfile("""
+        import pytest
+
+        setups = {"session": 0, "function": 0}
+
+        @pytest.fixture(scope="session")
+        def session_value():
+            setups["session"] += 1
+
+        @pytest.fixture
+        def function_value():
+            setups["function"] += 1
+
+        def test_flaky(session_value, function_value):
+            assert setups["function"] > 1
+
+        def test_setups():
+            assert setups == {"session": 1, "function": 2}
+        """)
+    result = pytester.runpytest("--e2e-retries=1", "--e2e-retry-delay=0")
+    assert _outcomes(result) == {"passed": 2, "rerun": 1}
+
+
+def test_retry_errored_module_fixture(pytester: pytest.Pytester) -> None:
+    pytester.makepyfile("""
+        import pytest
+
+        setups = []
+
+        @pytest.fixture(scope="module")
+        def module_value():
+            setups.append(1)
+            assert len(setups) > 1
+            return len(setups)
+
+        def test_module_value(module_value):
+            assert module_value == 2
+        """)
+    result = pytester.runpytest("--e2e-retries=1", "--e2e-retry-delay=0")
+    assert _outcomes(result) == {"passed": 1, "rerun": 1}
+
+
+def test_retry_does_not_trip_exitfirst(pytester: pytest.Pytester) -> None:
+    pytester.makepyfile("""
+        attempts = []
+
+        def test_flaky():
+            attempts.append(1)
+            assert len(attempts) > 1
+
+        def test_next():
+            pass
+        """)
+    result = pytester.runpytest("--e2e-retries=1", "--e2e-retry-delay=0", "--exitfirst")
+    assert _outcomes(result) == {"passed": 2, "rerun": 1}
+
+
+def test_retries_marker_overrides_budget(pytester: pytest.Pytester) -> None:
+    pytester.makepyfile("""
+        import pytest
+
+        attempts = {"more": 0, "none": 0}
+
+        @pytest.mark.retries(3)
+        def test_more():
+            attempts["more"] += 1
+            assert attempts["more"] > 3
+
+        @pytest.mark.retries(0)
+        def test_none():
+            attempts["none"] += 1
+            assert attempts["none"] > 1
+        """)
+    result = pytester.runpytest("--e2e-retries=1", "--e2e-retry-delay=0")
+    assert _outcomes(result) == {"passed": 1, "failed": 1, "rerun": 3}
+
+
+def test_quarantine_adds_xfail(pytester: pytest.Pytester) -> None:
+    pytester.makepyfile("""
+        def test_flaky():
+            assert False
+
+        def test_stable():
+            assert False
+        """)
+    history = _history(pytester)
+    for outcome in "PRPRP":
+        history.record("test_quarantine_adds_xfail.py::test_flaky", outcome)
+        history.record("test_quarantine_adds_xfail.py::test_stable", "P")
+        history.save()
+    result = pytester.runpytest("--e2e-quarantine", "-rx")
+    result.stdout.fnmatch_lines(["*quarantined, needed a retry in 40% of runs*"])
+    assert _outcomes(result) == {"failed": 1, "xfailed": 1}
+
+
+def test_retry_delay_keeps_session_loop_running(pytester: pytest.Pytester) -> None:
+    pytester.makepyfile("""
+        import asyncio
+
+        import pytest
+        import pytest_asyncio
+
+        from platform_e2e.http import RetryPolicy
+
+        attempts = []
+        ticks = []
+
+        @pytest_asyncio.fixture(scope="session", loop_scope="session")
+        async def ticker():
+            async def _tick():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(_tick())
+            with pytest.MonkeyPatch.context() as mp:
+                # No jitter, the wait is long enough for ticks
+                mp.setattr(RetryPolicy, "delay", lambda self, attempt: 0.5)
+                yield
+            task.cancel()
+
+        @pytest.mark.asyncio(loop_scope="session")
+        async def test_flaky(ticker):
+            attempts.append(len(ticks))
+            assert len(attempts) > 1
+            # Ticks went on while the retry waited outside of the test
+            assert attempts[1] - attempts[0] >= 10
+        """)
+    result = pytester.runpytest("--e2e-retries=1")
+    assert _outcomes(result) == {"passed": 1, "rerun": 1}
@@ -0,0 +1,14 @@
+import pytest
+
+from platform_e2e import BenchmarkReport, Helper, LoadProfile, run_load
+
+pytestmark = pytest.mark.benchmark
+
+
+async def test_scheduling_load(
+    helper: Helper, benchmark_report: BenchmarkReport, load_profile: LoadProfile
+) -> None:
+    result = await run_load(helper, load_profile)
+    benchmark_report.add(result.as_benchmark())
+    assert result.submitted, f"No job of {load_profile.name} was submitted"
+    assert result.running + result.unschedulable + result.timed_out > 0
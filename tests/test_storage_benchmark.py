@@ -0,0 +1,158 @@
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from yarl import URL
+
+from platform_e2e import BenchmarkReport, Helper, run_benchmark
+from platform_e2e.bench import GB, KB, MB, format_size
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = [4 * KB, 64 * KB, MB, 16 * MB, 256 * MB, GB, 4 * GB]
+CONCURRENCY = [1, 4, 16]
+# Keep a cell within a few GB of traffic and local disk
+MAX_CELL_BYTES = 4 * GB
+# Enough samples for percentiles on small objects
+MIN_CELL_BYTES = 64 * MB
+MAX_CELL_OPS = 256
+
+SourceFactory = Callable[[int], Awaitable[Path]]
+
+
+@pytest.fixture(scope="session")
+def source_file(helper: Helper, tmp_path_factory: Any) -> SourceFactory:
+    root = tmp_path_factory.mktemp("bench-source")
+    files: dict[int, Path] = {}
+
+    async def _get(size: int) -> Path:
+        if size not in files:
+            path = root / format_size(size)
+            await helper.gen_random_file(path, size, seed=size)
+            files[size] = path
+        return files[size]
+
+    return _get
+
+
+def _ops_count(size: int, concurrency: int) -> int:
+    return max(concurrency, min(MAX_CELL_OPS, MIN_CELL_BYTES // size))
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+@pytest.mark.parametrize("size", SIZES, ids=format_size)
+async def test_storage_transfer(
+    helper: Helper,
+    tmp_path: Path,
+    source_file: SourceFactory,
+    benchmark_report: BenchmarkReport,
+    benchmark_max_size: int,
+    size: int,
+    concurrency: int,
+) -> None:
+    if size > benchmark_max_size:
+        pytest.skip(f"{format_size(size)} is above --e2e-benchmark-max-size")
+    if size * concurrency > MAX_CELL_BYTES:
+        pytest.skip(f"{format_size(size)} x {concurrency} is above the cell limit")
+    src = await source_file(size)
+    count = _ops_count(size, concurrency)
+    folder = f"bench-{uuid4()}"
+    await helper.mkdir(folder)
+    params = {"size": size, "concurrency": concurrency}
+
+    def _upload(i: int) -> Callable[[], Awaitable[int]]:
+        async def _op() -> int:
+            await helper.client.storage.upload_file(
+                URL(src.as_uri()), helper.tmpstorage / folder / str(i)
+            )
+            return size
+
+        return _op
+
+    def _download(i: int) -> Callable[[], Awaitable[int]]:
+        async def _op() -> int:
+            dst = tmp_path / str(i)
+            await helper.client.storage.download_file(
+                helper.tmpstorage / folder / str(i), URL(dst.as_uri())
+            )
+            dst.unlink()
+            return size
+
+        return _op
+
+    try:
+        benchmark_report.add(
+            await run_benchmark(
+                "storage.upload",
+                params,
+                [_upload(i) for i in range(count)],
+                concurrency=concurrency,
+            )
+        )
+        benchmark_report.add(
+            await run_benchmark(
+                "storage.download",
+                params,
+                [_download(i) for i in range(count)],
+                concurrency=concurrency,
+            )
+        )
+    finally:
+        await helper.rm(folder, recursive=True)
+
+
+@pytest.mark.parametrize(
+    "size,count",
+    [(4 * KB, 4096), (64 * KB, 256), (MB, 16), (16 * MB, 1)],
+    ids=["4Kx4096", "64Kx256", "1Mx16", "16Mx1"],
+)
+async def test_storage_files_layout(
+    helper: Helper,
+    tmp_path: Path,
+    source_file: SourceFactory,
+    benchmark_report: BenchmarkReport,
+    size: int,
+    count: int,
+) -> None:
+    # The same 16M moved as many small or few large files
+    src = await source_file(size)
+    folder = f"bench-{uuid4()}"
+    await helper.mkdir(folder)
+    params = {"size": size, "files": count, "concurrency": 16}
+
+    def _upload(i: int) -> Callable[[], Awaitable[int]]:
+        async def _op() -> int:
+            await helper.client.storage.upload_file(
+                URL(src.as_uri()), helper.tmpstorage / folder / str(i)
+            )
+            return size
+
+        return _op
+
+    try:
+        benchmark_report.add(
+            await run_benchmark(
+                "storage.upload_files",
+                params,
+                [_upload(i) for i in range(count)],
+                concurrency=16,
+            )
+        )
+        result = await run_benchmark(
+            "storage.download_dir",
+            params,
+            [lambda: _download_dir(helper, folder, tmp_path / "dst", size * count)],
+        )
+        result.extra["files_per_s"] = count / result.elapsed
+        benchmark_report.add(result)
+    finally:
+        await helper.rm(folder, recursive=True)
+
+
+async def _download_dir(helper: Helper, folder: str, dst: Path, size: int) -> int:
+    await helper.client.storage.download_dir(
+        helper.tmpstorage / folder, URL(dst.as_uri())
+    )
+    return size
@@ -0,0 +1,213 @@
+import random
+import shutil
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from yarl import URL
+
+from platform_e2e import (
+    BenchmarkReport,
+    BenchmarkResult,
+    Helper,
+    run_benchmark,
+    run_blocking,
+)
+
+pytestmark = pytest.mark.benchmark
+
+CREATE_CONCURRENCY = 64
+STAT_CONCURRENCY = 16
+STAT_SAMPLES = 200
+LIST_REPEATS = 5
+# Files in the single directory of the wide tree as it grows
+WIDE_STEPS = (1000, 5000, 10_000, 20_000)
+# Levels of the deep tree as it grows, each with DEEP_FANOUT files
+DEEP_STEPS = (2, 5, 10, 20)
+DEEP_FANOUT = 500
+
+
+def _level(depth: int) -> str:
+    return "/".join(f"d{level:02d}" for level in range(depth))
+
+
+def _wide_files(start: int, stop: int) -> list[str]:
+    return [f"f{i:06d}" for i in range(start, stop)]
+
+
+def _deep_files(start: int, stop: int) -> list[str]:
+    return [
+        f"{_level(depth + 1)}/f{i:04d}"
+        for depth in range(start, stop)
+        for i in range(DEEP_FANOUT)
+    ]
+
+
+async def _grow(
+    helper: Helper,
+    root: str,
+    dirs: Sequence[str],
+    files: Sequence[str],
+    params: dict[str, int | str],
+) -> BenchmarkResult:
+    for path in dirs:
+        await helper.mkdir(f"{root}/{path}")
+    storage = helper.client.storage
+    base = helper.tmpstorage / root
+
+    def _create(path: str) -> Callable[[], Awaitable[int]]:
+        async def _op() -> int:
+            await storage.create(base / path, b"x")
+            return 1
+
+        return _op
+
+    return await run_benchmark(
+        "storage.meta.create",
+        {**params, "files": len(files)},
+        [_create(path) for path in files],
+        concurrency=CREATE_CONCURRENCY,
+    )
+
+
+async def _measure(
+    helper: Helper,
+    root: str,
+    deepest: str,
+    files: Sequence[str],
+    tmp_path: Path,
+    params: dict[str, int | str],
+) -> list[BenchmarkResult]:
+    storage = helper.client.storage
+    base = helper.tmpstorage / root
+    results = []
+
+    async def _list() -> int:
+        async with storage.list(base / deepest if deepest else base) as it:
+            async for _ in it:
+                pass
+        return 0
+
+    results.append(
+        await run_benchmark("storage.meta.list", params, [_list] * LIST_REPEATS)
+    )
+
+    def _stat(path: str) -> Callable[[], Awaitable[int]]:
+        async def _op() -> int:
+            await storage.stat(base / path)
+            return 0
+
+        return _op
+
+    sample = random.Random(len(files)).sample(files, min(STAT_SAMPLES, len(files)))
+    results.append(
+        await run_benchmark(
+            "storage.meta.stat",
+            params,
+            [_stat(path) for path in sample],
+            concurrency=STAT_CONCURRENCY,
+        )
+    )
+
+    walked = 0
+
+    async def _walk() -> int:
+        nonlocal walked
+        async with storage.glob(base / "**") as it:
+            async for _ in it:
+                walked += 1
+        return 0
+
+    walk = await run_benchmark("storage.meta.walk", params, [_walk])
+    walk.extra["walked"] = walked
+    results.append(walk)
+
+    # Storage has no server side copy, a recursive copy goes through the client
+    local = tmp_path / f"copy-{uuid4()}"
+    copy = helper.tmpstorage / f"{root}-copy"
+    started = time.monotonic()
+    await storage.download_dir(base, URL(local.as_uri()))
+    downloaded = time.monotonic() - started
+    await storage.upload_dir(URL(local.as_uri()), copy)
+    elapsed = time.monotonic() - started
+    await run_blocking(shutil.rmtree, local)
+    results.append(
+        BenchmarkResult(
+            "storage.meta.copy",
+            params,
+            elapsed=elapsed,
+            latencies=[elapsed],
+            extra={"download": downloaded, "upload": elapsed - downloaded},
+        )
+    )
+
+    results.append(
+        await run_benchmark(
+            "storage.meta.rm",
+            params,
+            [lambda: _rm(helper, f"{root}-copy")],
+        )
+    )
+    # Walk, copy and rm touch every entry of the tree
+    for result in results[2:]:
+        result.extra["per_entry_ms"] = result.elapsed * 1000 / len(files)
+    return results
+
+
+async def _rm(helper: Helper, path: str) -> int:
+    await helper.rm(path, recursive=True)
+    return 0
+
+
+async def _scaling(
+    helper: Helper,
+    tmp_path: Path,
+    benchmark_report: BenchmarkReport,
+    shape: str,
+    steps: Sequence[int],
+) -> None:
+    """
+    Grow a tree step by step and measure metadata ops at every size, so the
+    cells of an op form a curve over the entries param.
+    """
+    root = f"bench-meta-{uuid4()}"
+    await helper.mkdir(root)
+    files: list[str] = []
+    done = 0
+    try:
+        for step in steps:
+            if shape == "wide":
+                dirs, deepest = [], ""
+                new = _wide_files(done, step)
+            else:
+                dirs, deepest = [_level(step)], _level(step)
+                new = _deep_files(done, step)
+            params: dict[str, int | str] = {
+                "shape": shape,
+                "entries": len(files) + len(new),
+                "depth": step if shape == "deep" else 1,
+            }
+            benchmark_report.add(await _grow(helper, root, dirs, new, params))
+            files += new
+            done = step
+            for result in await _measure(
+                helper, root, deepest, files, tmp_path, params
+            ):
+                benchmark_report.add(result)
+    finally:
+        await helper.rm(root, recursive=True)
+
+
+@pytest.mark.parametrize(
+    "shape,steps", [("wide", WIDE_STEPS), ("deep", DEEP_STEPS)], ids=["wide", "deep"]
+)
+async def test_storage_metadata_scaling(
+    helper: Helper,
+    tmp_path: Path,
+    benchmark_report: BenchmarkReport,
+    shape: str,
+    steps: Sequence[int],
+) -> None:
+    await _scaling(helper, tmp_path, benchmark_report, shape, steps)
@@ -0,0 +1,75 @@
+import json
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from apolo_sdk import JobStatus, JobStatusHistory, JobStatusItem
+
+from platform_e2e import TimelineRecorder
+
+T0 = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def _job(status: JobStatus, transitions: list[tuple[JobStatus, int, str]]) -> Any:
+    items = [
+        JobStatusItem(state, T0 + timedelta(seconds=offset), reason)
+        for state, offset, reason in transitions
+    ]
+    history = JobStatusHistory(
+        status=status,
+        reason="",
+        description="",
+        created_at=T0,
+        started_at=T0 + timedelta(seconds=12) if status != JobStatus.PENDING else None,
+        transitions=items,
+    )
+    return SimpleNamespace(id="job-1", status=status, history=history)
+
+
+def test_timeline_pending_phases() -> None:
+    recorder = TimelineRecorder()
+    recorder.current_test = "test_x"
+    recorder.submitted(_job(JobStatus.PENDING, []), "alpine", T0)
+    recorder.observe(
+        _job(
+            JobStatus.RUNNING,
+            [
+                (JobStatus.PENDING, 0, "Creating"),
+                (JobStatus.PENDING, 1, "Scheduling"),
+                (JobStatus.PENDING, 3, "PullingImage"),
+                (JobStatus.PENDING, 10, "ContainerCreating"),
+                (JobStatus.RUNNING, 12, ""),
+            ],
+        )
+    )
+    [timeline] = recorder.timelines
+    assert timeline.test == "test_x"
+    assert timeline.running_at is not None
+    phases = timeline.phases()
+    assert phases["schedule"] == 3
+    assert phases["image_pull"] == 7
+    assert phases["container_start"] == 2
+    assert phases["pending"] == 12
+    assert recorder.unfinished() == ["job-1"]
+
+
+def test_timeline_reports(tmp_path: Path) -> None:
+    recorder = TimelineRecorder()
+    recorder.submitted(_job(JobStatus.PENDING, []), "alpine", T0)
+    recorder.kill_requested("job-1")
+    recorder.killed("job-1")
+    recorder.write_json(tmp_path / "timings.json")
+    recorder.write_prometheus(tmp_path / "timings.prom")
+    prom = (tmp_path / "timings.prom").read_text()
+    assert 'e2e_job_phase_seconds_count{phase="kill_ack"} 1' in prom
+    assert 'e2e_test_job_phase_seconds_count{test="<session>",phase="submit"}' in prom
+    assert "# TYPE e2e_test_job_phase_seconds histogram" in prom
+    labels = 'test="<session>",phase="kill_ack"'
+    assert f'e2e_test_job_phase_seconds_bucket{{{labels},le="0.5"}} 1' in prom
+    assert f'e2e_test_job_phase_seconds_bucket{{{labels},le="+Inf"}} 1' in prom
+
+    report = json.loads((tmp_path / "timings.json").read_text())
+    for stats in (report["session"], report["tests"]["<session>"]):
+        assert stats["kill_ack"]["buckets"]["0.5"] == 1
+        assert stats["kill_ack"]["buckets"]["+Inf"] == 1